@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Benchmark : appels concurrents aux routes de chat (Firebase Realtime Database).
+
+Compare, pour N requêtes simultanées sur `GET /chat/sessions/{email}` :
+  - "bloquant" : l'appel RTDB synchrone exécuté directement dans la route
+    (comportement d'avant `run_rtdb`) ;
+  - "run_rtdb" : les routes actuelles, qui passent par le pool RTDB.
+
+Le client firebase_admin est remplacé par une référence en mémoire qui
+simule la latence réseau d'un aller-retour RTDB (aucun identifiant Firebase
+nécessaire). Mesures : durée totale et retard maximal de la boucle
+d'événements (temps pendant lequel aucune autre requête ne peut avancer).
+
+Usage :
+    python benchmarks/bench_chat_rtdb.py --requests 50 --latency-ms 80
+"""
+import os
+import sys
+import time
+import asyncio
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from controller import session_chat, rtdb_client  # noqa: E402
+
+
+class _SlowReference:
+    """Référence RTDB en mémoire avec une latence fixe par aller-retour."""
+
+    def __init__(self, latency: float, path: str = ""):
+        self.latency = latency
+        self.path = path
+
+    def child(self, path: str):
+        return _SlowReference(self.latency, f"{self.path}/{path}")
+
+    def get(self):
+        time.sleep(self.latency)
+        return {
+            "user_email": "bench@example.com",
+            "subject": "Support",
+            "status": "active",
+            "updated_at": "2024-01-17T10:30:00",
+            "message_count": 42,
+        }
+
+
+class _SlowDatabase:
+    def __init__(self, latency: float):
+        self.latency = latency
+
+    def reference(self, path: str = "/"):
+        return _SlowReference(self.latency, path)
+
+
+async def _blocking_get_chat_session(user_email: str):
+    """Route telle qu'écrite avant `run_rtdb` : l'appel bloque la boucle."""
+    entry = session_chat.get_session_summary(user_email)
+    return session_chat.session_info_from_summary(user_email, entry)
+
+
+async def _measure(route, requests: int) -> dict:
+    max_lag = 0.0
+    running = True
+
+    async def ticker():
+        # Retard de la boucle : écart entre le réveil prévu et le réveil réel
+        nonlocal max_lag
+        while running:
+            expected = time.perf_counter() + 0.005
+            await asyncio.sleep(0.005)
+            max_lag = max(max_lag, time.perf_counter() - expected)
+
+    ticker_task = asyncio.create_task(ticker())
+    await asyncio.sleep(0.01)
+    started = time.perf_counter()
+    await asyncio.gather(*(route("bench@example.com") for _ in range(requests)))
+    elapsed = time.perf_counter() - started
+    running = False
+    await ticker_task
+    return {"total_ms": elapsed * 1000, "max_loop_lag_ms": max_lag * 1000}
+
+
+async def main(requests: int, latency_ms: float):
+    session_chat.db = _SlowDatabase(latency_ms / 1000)
+
+    print(f"📊 {requests} requêtes simultanées, latence RTDB simulée {latency_ms:.0f} ms, "
+          f"pool RTDB {rtdb_client.RTDB_MAX_WORKERS} threads")
+    for label, route in (("bloquant", _blocking_get_chat_session), ("run_rtdb", session_chat.get_chat_session)):
+        result = await _measure(route, requests)
+        print(f"  {label:<9} total {result['total_ms']:8.0f} ms   "
+              f"retard max de la boucle {result['max_loop_lag_ms']:8.0f} ms")
+
+    rtdb_client.shutdown_rtdb_executor()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=50, help="Nombre de requêtes simultanées")
+    parser.add_argument("--latency-ms", type=float, default=80, help="Latence simulée d'un aller-retour RTDB")
+    args = parser.parse_args()
+    asyncio.run(main(args.requests, args.latency_ms))
@@ -1,10 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional, Tuple
+from datetime import date, datetime, timedelta, timezone
 
-from databaseone import get_db
+from databaseone import get_db, rebuild_user_ticket_summary
 from models import models
 from schemas import subscription_plan_schema
+from schemas.serialization import json_list_response
+from .background_jobs import JOB_STATS
+from .token_sweeper import SWEEPER_METRICS
+from .image_reconciler import RECONCILER_METRICS, reconcile_orphan_images
+from .password_hasher import PASSWORD_HASHER_METRICS
+from .rate_limiter import RATE_LIMIT_METRICS
+from .ephemeral_store import EPHEMERAL_STORE_METRICS
+from .rtdb_client import RTDB_METRICS
+from .chat_hub import CHAT_HUB_METRICS
+from .chat_archiver import CHAT_ARCHIVER_METRICS, archive_closed_chat_sessions
+from .chat_search import CHAT_SEARCH_METRICS, backfill_chat_search_index
+from . import analytics_service
+from .session_chat import rebuild_chat_session_index
 
 router = APIRouter(
     prefix="/api/admin",
@@ -19,7 +33,7 @@ def admin_get_all_plans(db: Session = Depends(get_db)):
     [Admin] Retourne une liste de tous les plans de souscription, y compris les inactifs.
     """
     plans = db.query(models.Plan).order_by(models.Plan.id).all()
-    return plans
+    return json_list_response(subscription_plan_schema.PlanListSerializer, plans)
 
 @router.put("/plans/{plan_id}", response_model=subscription_plan_schema.Plan, summary="[Admin] Mettre à jour un plan")
 def admin_update_plan(plan_id: int, plan_update: subscription_plan_schema.PlanUpdate, db: Session = Depends(get_db)):
@@ -31,7 +45,7 @@ def admin_update_plan(plan_id: int, plan_update: subscription_plan_schema.PlanUp
     if not db_plan:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Plan non trouvé.")
 
-    update_data = plan_update.dict(exclude_unset=True)
+    update_data = plan_update.model_dump(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_plan, key, value)
 
@@ -57,4 +71,157 @@ def admin_delete_plan(plan_id: int, db: Session = Depends(get_db)):
 
     db_plan.is_active = False
     db.commit()
-    return
\ No newline at end of file
+    return
+
+@router.get("/maintenance/jobs", summary="[Admin] Statistiques des tâches de maintenance")
+def admin_get_maintenance_jobs():
+    """
+    [Admin] Retourne l'état des tâches périodiques (dernière exécution, erreurs),
+    les compteurs du nettoyeur de jetons expirés et du nettoyage des images
+    orphelines, l'état du pool de hachage des mots de passe, du limiteur de débit
+    et des codes envoyés par email (émis / dédupliqués), ainsi que le pool
+    d'appels Firebase Realtime Database, la diffusion temps réel, l'archivage
+    et l'index de recherche du chat.
+    """
+    return {
+        "jobs": JOB_STATS,
+        "token_sweeper": SWEEPER_METRICS,
+        "image_reconciler": RECONCILER_METRICS,
+        "password_hasher": PASSWORD_HASHER_METRICS,
+        "rate_limiter": RATE_LIMIT_METRICS,
+        "ephemeral_store": EPHEMERAL_STORE_METRICS,
+        "rtdb": RTDB_METRICS,
+        "chat_hub": CHAT_HUB_METRICS,
+        "chat_archiver": CHAT_ARCHIVER_METRICS,
+        "chat_search": CHAT_SEARCH_METRICS,
+    }
+
+
+@router.post("/maintenance/rebuild-ticket-summary", summary="[Admin] Recalculer les résumés de contraventions")
+def admin_rebuild_ticket_summary(db: Session = Depends(get_db)):
+    """
+    [Admin] Recalcule entièrement la table `user_ticket_summary` à partir des
+    contraventions et des rappels. Normalement inutile : les triggers la
+    maintiennent à jour ; sert à corriger un écart après une intervention manuelle.
+    """
+    rebuild_user_ticket_summary(db.connection())
+    db.commit()
+    return {"message": "Résumés des contraventions recalculés."}
+
+
+@router.post("/maintenance/rebuild-chat-session-index", summary="[Admin] Reconstruire l'index des sessions de chat")
+def admin_rebuild_chat_session_index():
+    """
+    [Admin] Reconstruit `chat_session_index` à partir de toutes les conversations.
+    Nécessaire une fois à la mise en place de l'index (les sessions existantes
+    sont sinon indexées à leur prochaine consultation) ; lit tout l'arbre
+    `chat_sessions`, à ne pas lancer fréquemment.
+    """
+    try:
+        result = rebuild_chat_session_index()
+    except Exception as e:
+        print(f"❌ Erreur lors de la reconstruction de l'index des sessions : {e}")
+        raise HTTPException(status_code=500, detail=f"Erreur lors de la reconstruction de l'index : {str(e)}")
+    return {"message": "Index des sessions de chat reconstruit.", **result}
+
+
+@router.post("/maintenance/archive-chat-sessions", summary="[Admin] Lancer un passage de l'archivage des sessions de chat")
+def admin_archive_chat_sessions(db: Session = Depends(get_db)):
+    """
+    [Admin] Archive immédiatement dans PostgreSQL les sessions de chat fermées
+    depuis plus de CHAT_ARCHIVE_AFTER_DAYS jours et les supprime de Firebase
+    (même traitement que la tâche périodique `chat_archiver`).
+    """
+    try:
+        result = archive_closed_chat_sessions(db)
+    except Exception as e:
+        print(f"❌ Erreur lors de l'archivage des sessions de chat : {e}")
+        raise HTTPException(status_code=500, detail=f"Erreur lors de l'archivage des sessions de chat : {str(e)}")
+    return {"message": "Archivage des sessions de chat terminé.", **result}
+
+
+@router.post("/maintenance/backfill-chat-search", summary="[Admin] Rattraper l'index de recherche du chat")
+def admin_backfill_chat_search(db: Session = Depends(get_db)):
+    """
+    [Admin] Indexe immédiatement les messages de chat absents de l'index de
+    recherche (archives et sessions en cours ; même traitement que la tâche
+    périodique `chat_search_indexer`). À lancer après la migration pour
+    indexer l'historique existant.
+    """
+    try:
+        result = backfill_chat_search_index(db)
+    except Exception as e:
+        print(f"❌ Erreur lors de l'indexation des messages de chat : {e}")
+        raise HTTPException(status_code=500, detail=f"Erreur lors de l'indexation des messages de chat : {str(e)}")
+    return {"message": "Index de recherche du chat à jour.", **result}
+
+
+@router.post("/maintenance/reconcile-images", summary="[Admin] Lancer un passage du nettoyage des images orphelines")
+def admin_reconcile_images(db: Session = Depends(get_db)):
+    """
+    [Admin] Exécute immédiatement un passage du nettoyage des images orphelines
+    (reprise au curseur enregistré, quarantaine puis suppression).
+    """
+    return reconcile_orphan_images(db)
+
+
+# =================================
+# Analytics (lecture des rollups quotidiens)
+# =================================
+
+def _analytics_period(start: Optional[date], end: Optional[date]) -> Tuple[date, date]:
+    """Période par défaut : les 30 derniers jours (bornes incluses)."""
+    end = end or datetime.now(timezone.utc).date()
+    start = start or end - timedelta(days=29)
+    if start > end:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="La date de début doit précéder la date de fin.")
+    return start, end
+
+
+@router.get("/analytics/revenue-by-plan", summary="[Admin] Revenu par plan")
+def admin_revenue_by_plan(start: Optional[date] = Query(None), end: Optional[date] = Query(None), db: Session = Depends(get_db)):
+    """
+    [Admin] Revenu et nombre de nouveaux abonnements payés par plan sur la période.
+    """
+    start, end = _analytics_period(start, end)
+    return {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "plans": analytics_service.get_revenue_by_plan(db, start, end),
+    }
+
+
+@router.get("/analytics/active-subscribers", summary="[Admin] Abonnés actifs par jour")
+def admin_active_subscribers(start: Optional[date] = Query(None), end: Optional[date] = Query(None), db: Session = Depends(get_db)):
+    """
+    [Admin] Série quotidienne du nombre d'utilisateurs ayant un abonnement payé actif.
+    """
+    start, end = _analytics_period(start, end)
+    return {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "series": analytics_service.get_active_subscribers_series(db, start, end),
+    }
+
+
+@router.get("/analytics/tickets-by-state", summary="[Admin] Contraventions par état")
+def admin_tickets_by_state(start: Optional[date] = Query(None), end: Optional[date] = Query(None), db: Session = Depends(get_db)):
+    """
+    [Admin] Nombre et montant total des contraventions créées sur la période, par état de l'utilisateur.
+    """
+    start, end = _analytics_period(start, end)
+    return {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "states": analytics_service.get_tickets_by_state(db, start, end),
+    }
+
+
+@router.post("/analytics/refresh", summary="[Admin] Recalculer les rollups analytiques")
+def admin_refresh_analytics(days: int = Query(analytics_service.ANALYTICS_REFRESH_DAYS, ge=1, le=3650), db: Session = Depends(get_db)):
+    """
+    [Admin] Recalcule immédiatement les agrégats quotidiens des `days` derniers jours.
+    Utile après une migration ou pour remplir l'historique une première fois.
+    """
+    window = analytics_service.refresh_analytics_rollups(db, days=days)
+    return {"message": "Rollups analytiques recalculés.", **window}
@@ -0,0 +1,203 @@
+import os
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from databaseone import SessionLocal
+
+
+# --- Configuration des rollups ---
+# Nombre de jours recalculés à chaque passage (aujourd'hui inclus)
+ANALYTICS_REFRESH_DAYS = int(os.getenv("ANALYTICS_REFRESH_DAYS", "2"))
+# Intervalle entre deux rafraîchissements
+ANALYTICS_REFRESH_INTERVAL_SECONDS = int(os.getenv("ANALYTICS_REFRESH_INTERVAL_SECONDS", "3600"))
+
+
+# Les journées sont découpées en UTC, quel que soit le fuseau (TimeZone) de
+# la session PostgreSQL. Chaque rafraîchissement supprime puis recalcule les
+# journées de la fenêtre, dans une seule transaction : une journée qui
+# retombe à zéro disparaît bien du rollup.
+
+# Revenu : paiements encaissés (table payments) rattachés à un abonnement, et
+# non le prix catalogue du plan (remises, changements de prix, renouvellements).
+# Un abonnement payé sans ligne de paiement (antérieur à leur enregistrement,
+# ou créé par un administrateur) compte pour le prix du plan.
+_REFRESH_PLAN_REVENUE_SQL = """
+WITH new_subscriptions AS (
+    SELECT (s.created_at AT TIME ZONE 'UTC')::date AS day,
+           s.plan_id,
+           count(*) AS new_subscriptions
+    FROM subscriptions s
+    WHERE s.created_at >= :start_ts AND s.created_at < :end_ts
+      AND s.payment_status = 'paid'
+    GROUP BY 1, 2
+), amounts AS (
+    SELECT (pay.created_at AT TIME ZONE 'UTC')::date AS day,
+           s.plan_id,
+           pay.amount_usd AS amount_usd
+    FROM payments pay
+    JOIN subscriptions s ON s.id = pay.subscription_id
+    WHERE pay.created_at >= :start_ts AND pay.created_at < :end_ts
+      AND pay.payment_status = 'completed'
+    UNION ALL
+    SELECT (s.created_at AT TIME ZONE 'UTC')::date AS day,
+           s.plan_id,
+           p.price AS amount_usd
+    FROM subscriptions s
+    JOIN plans p ON p.id = s.plan_id
+    WHERE s.created_at >= :start_ts AND s.created_at < :end_ts
+      AND s.payment_status = 'paid'
+      AND NOT EXISTS (SELECT 1 FROM payments pay WHERE pay.subscription_id = s.id)
+), revenue AS (
+    SELECT day, plan_id, sum(amount_usd) AS revenue_usd
+    FROM amounts
+    GROUP BY 1, 2
+)
+INSERT INTO daily_plan_revenue (day, plan_id, new_subscriptions, revenue_usd, refreshed_at)
+SELECT COALESCE(n.day, r.day),
+       COALESCE(n.plan_id, r.plan_id),
+       COALESCE(n.new_subscriptions, 0),
+       COALESCE(r.revenue_usd, 0),
+       now()
+FROM new_subscriptions n
+FULL OUTER JOIN revenue r ON r.day = n.day AND r.plan_id = n.plan_id
+"""
+
+# Seuls les abonnements qui chevauchent la fenêtre sont lus
+# (index ix_subscriptions_end_date_start_date : end_date est le critère sélectif)
+_REFRESH_ACTIVE_SUBSCRIBERS_SQL = """
+WITH overlapping AS (
+    SELECT s.user_id, s.start_date, s.end_date
+    FROM subscriptions s
+    WHERE s.end_date > :start_ts AND s.start_date < :end_ts
+      AND s.payment_status = 'paid'
+)
+INSERT INTO daily_active_subscribers (day, active_subscribers, refreshed_at)
+SELECT d.day::date,
+       count(DISTINCT s.user_id),
+       now()
+FROM generate_series(CAST(:start_day AS timestamp), CAST(:end_day AS timestamp) - interval '1 day', interval '1 day') AS d(day)
+LEFT JOIN overlapping s
+       -- d.day est un timestamp sans fuseau : minuit UTC explicitement
+       ON s.start_date < (d.day + interval '1 day') AT TIME ZONE 'UTC'
+      AND s.end_date > d.day AT TIME ZONE 'UTC'
+GROUP BY d.day
+"""
+
+_REFRESH_TICKET_STATS_SQL = """
+INSERT INTO daily_ticket_stats (day, state_id, ticket_count, amount_usd, refreshed_at)
+SELECT (t.created_at AT TIME ZONE 'UTC')::date AS day,
+       COALESCE(u.state_id, 0),
+       count(*),
+       sum(t.amount_usd),
+       now()
+FROM tickets t
+JOIN users u ON u.id = t.user_id
+WHERE t.created_at >= :start_ts AND t.created_at < :end_ts
+GROUP BY 1, 2
+"""
+
+
+def refresh_analytics_rollups(db: Optional[Session] = None, days: int = ANALYTICS_REFRESH_DAYS) -> dict:
+    """
+    Recalcule les rollups quotidiens pour les `days` derniers jours.
+
+    Args:
+        db: Session optionnelle (une session dédiée est ouverte sinon)
+        days: Nombre de journées recalculées, aujourd'hui inclus
+
+    Returns:
+        dict: Fenêtre recalculée
+    """
+    owns_session = db is None
+    if owns_session:
+        db = SessionLocal()
+
+    end_day = datetime.now(timezone.utc).date() + timedelta(days=1)
+    start_day = end_day - timedelta(days=days)
+    params = {
+        "start_day": start_day,
+        "end_day": end_day,
+        "start_ts": datetime.combine(start_day, datetime.min.time(), tzinfo=timezone.utc),
+        "end_ts": datetime.combine(end_day, datetime.min.time(), tzinfo=timezone.utc),
+    }
+
+    try:
+        for table in ("daily_plan_revenue", "daily_active_subscribers", "daily_ticket_stats"):
+            db.execute(text(f"DELETE FROM {table} WHERE day >= :start_day AND day < :end_day"), params)
+        db.execute(text(_REFRESH_PLAN_REVENUE_SQL), params)
+        db.execute(text(_REFRESH_ACTIVE_SUBSCRIBERS_SQL), params)
+        db.execute(text(_REFRESH_TICKET_STATS_SQL), params)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        if owns_session:
+            db.close()
+
+    return {"start_day": start_day.isoformat(), "end_day": (end_day - timedelta(days=1)).isoformat()}
+
+
+# ---------------------------
+# Lectures (uniquement sur les rollups)
+# ---------------------------
+
+def get_revenue_by_plan(db: Session, start_day: date, end_day: date) -> list:
+    """Revenu et nouveaux abonnements par plan entre deux dates (incluses)."""
+    rows = db.execute(text("""
+        SELECT r.plan_id, p.name AS plan_name,
+               sum(r.new_subscriptions) AS new_subscriptions,
+               sum(r.revenue_usd) AS revenue_usd
+        FROM daily_plan_revenue r
+        LEFT JOIN plans p ON p.id = r.plan_id
+        WHERE r.day BETWEEN :start_day AND :end_day
+        GROUP BY r.plan_id, p.name
+        ORDER BY revenue_usd DESC
+    """), {"start_day": start_day, "end_day": end_day}).mappings().all()
+
+    return [
+        {
+            "plan_id": row["plan_id"],
+            "plan_name": row["plan_name"],
+            "new_subscriptions": int(row["new_subscriptions"]),
+            "revenue_usd": float(row["revenue_usd"]),
+        } for row in rows
+    ]
+
+
+def get_active_subscribers_series(db: Session, start_day: date, end_day: date) -> list:
+    """Nombre d'abonnés actifs par jour entre deux dates (incluses)."""
+    rows = db.execute(text("""
+        SELECT day, active_subscribers
+        FROM daily_active_subscribers
+        WHERE day BETWEEN :start_day AND :end_day
+        ORDER BY day
+    """), {"start_day": start_day, "end_day": end_day}).mappings().all()
+
+    return [{"day": row["day"].isoformat(), "active_subscribers": row["active_subscribers"]} for row in rows]
+
+
+def get_tickets_by_state(db: Session, start_day: date, end_day: date) -> list:
+    """Volume et montant des contraventions par état entre deux dates (incluses)."""
+    rows = db.execute(text("""
+        SELECT r.state_id, s.name AS state_name,
+               sum(r.ticket_count) AS ticket_count,
+               sum(r.amount_usd) AS amount_usd
+        FROM daily_ticket_stats r
+        LEFT JOIN states s ON s.id = r.state_id
+        WHERE r.day BETWEEN :start_day AND :end_day
+        GROUP BY r.state_id, s.name
+        ORDER BY ticket_count DESC
+    """), {"start_day": start_day, "end_day": end_day}).mappings().all()
+
+    return [
+        {
+            "state_id": row["state_id"] or None,
+            "state_name": row["state_name"],
+            "ticket_count": int(row["ticket_count"]),
+            "amount_usd": float(row["amount_usd"]),
+        } for row in rows
+    ]
@@ -2,33 +2,65 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
-from passlib.context import CryptContext
-from typing import Optional
+from starlette.concurrency import run_in_threadpool
+from typing import Optional, Tuple
 
 from databaseone import get_db
-from models.models import User, State, PasswordResetToken
-from passlib.context import CryptContext
-from datetime import datetime, timedelta, timezone
+from models.models import User, State
+from datetime import datetime, timezone
+import os
 import secrets
 
 from .email_service import send_password_reset_email
 from .email_service3 import send_verification_code_and_store, verify_email_code
+from . import password_hasher
+from .rate_limiter import RateLimit
+from .ephemeral_store import get_ephemeral_store, PASSWORD_RESET
+from .auth_tokens import (
+    TokenClaims, TokenError, create_token_pair, verify_token, revoke_token, claim_token, get_current_claims,
+)
 
 
 
 
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 # Router
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
+# Limites par IP et par email ("nombre/secondes", modifiables par variables
+# d'environnement RATE_LIMIT_<SCOPE>_IP / RATE_LIMIT_<SCOPE>_EMAIL)
+login_rate_limit = RateLimit("login", per_ip="20/60", per_email="5/60")
+password_reset_request_rate_limit = RateLimit("password_reset_request", per_ip="10/600", per_email="3/600")
+password_reset_rate_limit = RateLimit("password_reset", per_ip="10/600", per_email="5/600")
+verification_send_rate_limit = RateLimit("verification_send", per_ip="10/600", per_email="3/600")
+verification_check_rate_limit = RateLimit("verification_check", per_ip="20/600", per_email="5/600")
+
+# Durée de validité d'un code de réinitialisation de mot de passe
+PASSWORD_RESET_CODE_TTL_SECONDS = 15 * 60
+# Délai minimum entre deux emails de réinitialisation pour un même compte
+PASSWORD_RESET_EMAIL_COOLDOWN_SECONDS = int(os.getenv("PASSWORD_RESET_EMAIL_COOLDOWN_SECONDS", "60"))
+
 # Pydantic models for request/response
 from pydantic import BaseModel, EmailStr
 
-def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+# ---- 🔹 Hachage des mots de passe ----
+# bcrypt s'exécute dans un pool de processus dédié (password_hasher) : une rafale
+# de connexions n'occupe plus le threadpool qui sert les autres routes.
+# Les routes qui hachent sont donc asynchrones ; leurs accès à la base passent
+# par run_in_threadpool.
+
+def _hasher_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Service d'authentification surchargé, veuillez réessayer.",
+        headers={"Retry-After": "1"},
+    )
+
+async def get_password_hash(password: str) -> str:
+    try:
+        return await password_hasher.hash_password(password)
+    except password_hasher.PasswordHasherBusy:
+        raise _hasher_busy()
 
 def get_user_by_email(email: str, db: Session):
     user = db.query(User).filter(User.email == email).first()
@@ -83,6 +115,12 @@ class UserUpdate(BaseModel):
     state: Optional[str] = None
     password: Optional[str] = None  # 👈 nouveau champ
 
+class RefreshTokenRequest(BaseModel):
+    refresh_token: str
+
+class LogoutRequest(BaseModel):
+    refresh_token: Optional[str] = None
+
 class PasswordResetRequest(BaseModel):
     email: EmailStr
 
@@ -93,14 +131,8 @@ class PasswordResetConfirm(BaseModel):
 
 
 # Routes
-@router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-def register_user(user_data: UserRegister, db: Session = Depends(get_db)):
-    existing_user = db.query(User).filter(User.email == user_data.email).first()
-    if existing_user:
-        raise HTTPException(status_code=400, detail="Email already registered")
-
+def _create_user(user_data: UserRegister, hashed_password: str, db: Session) -> dict:
     try:
-        hashed_password = get_password_hash(user_data.password)
         new_user = User(
             full_name=user_data.full_name,
             email=user_data.email,
@@ -134,9 +166,30 @@ def register_user(user_data: UserRegister, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail=f"Error creating user: {str(e)}")
 
 
+@router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
+async def register_user(user_data: UserRegister, db: Session = Depends(get_db)):
+    existing_user = await run_in_threadpool(lambda: db.query(User).filter(User.email == user_data.email).first())
+    if existing_user:
+        raise HTTPException(status_code=400, detail="Email already registered")
+
+    hashed_password = await get_password_hash(user_data.password)
+    return await run_in_threadpool(_create_user, user_data, hashed_password, db)
+
+
 # ---- 🔹 Vérification mot de passe ----
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+async def verify_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Vérifie le mot de passe. Retourne aussi un nouveau hash si le coût bcrypt
+    du hash stocké ne correspond plus à BCRYPT_ROUNDS.
+    """
+    try:
+        return await password_hasher.verify_password(plain_password, hashed_password)
+    except password_hasher.PasswordHasherBusy:
+        raise _hasher_busy()
+
+def _save_password_hash(user: User, new_hash: str, db: Session):
+    user.password_hash = new_hash
+    db.commit()
 
 # ---- 🔹 Schéma pour connexion ----
 class UserLogin(BaseModel):
@@ -144,16 +197,22 @@ class UserLogin(BaseModel):
     password: str
 
 # ---- 🔹 Route /auth/login ----
-@router.post("/login")
-def login_user(user_data: UserLogin, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.email == user_data.email).first()
+@router.post("/login", dependencies=[Depends(login_rate_limit)])
+async def login_user(user_data: UserLogin, db: Session = Depends(get_db)):
+    user = await run_in_threadpool(lambda: db.query(User).filter(User.email == user_data.email).first())
 
     if not user:
         raise HTTPException(status_code=404, detail="Utilisateur non trouvé")
 
-    if not verify_password(user_data.password, user.password_hash):
+    is_valid, new_hash = await verify_password(user_data.password, user.password_hash)
+    if not is_valid:
         raise HTTPException(status_code=401, detail="Mot de passe incorrect")
 
+    if new_hash:
+        # Le coût bcrypt a changé depuis la création du hash : on le met à jour
+        # maintenant que le mot de passe en clair est connu.
+        await run_in_threadpool(_save_password_hash, user, new_hash, db)
+
     return {
         "message": "Connexion réussie ✅",
         "user": {
@@ -162,7 +221,63 @@ def login_user(user_data: UserLogin, db: Session = Depends(get_db)):
             "email": user.email,
             "state_id": user.state_id,
             "created_at": str(user.created_at)
-        }
+        },
+        # Jetons à envoyer ensuite dans l'en-tête "Authorization: Bearer <access_token>"
+        **create_token_pair(user.id, user.email)
+    }
+
+
+def _revoke_user_tokens(user: User):
+    """
+    Invalide les jetons de rafraîchissement déjà émis pour l'utilisateur
+    (changement de mot de passe). Les jetons d'accès, vérifiés sans la base,
+    expirent d'eux-mêmes (ACCESS_TOKEN_TTL_SECONDS).
+    """
+    # Précision à la seconde, comme la date d'émission (iat) des jetons
+    user.tokens_valid_after = datetime.now(timezone.utc).replace(microsecond=0)
+
+
+def _rotate_refresh_token(claims: TokenClaims, db: Session) -> dict:
+    user = db.get(User, claims.user_id)
+    if not user or not user.is_active:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Utilisateur inactif ou supprimé.")
+    if user.tokens_valid_after and claims.issued_at < _timestamp(user.tokens_valid_after):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Jeton révoqué.")
+
+    # Rotation : l'ancien jeton de rafraîchissement ne peut servir qu'une fois.
+    # La liste en mémoire peut avoir quelques secondes de retard : c'est
+    # l'insertion en base qui décide, même entre deux requêtes simultanées.
+    if not claim_token(claims, db):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Jeton révoqué.")
+    return create_token_pair(user.id, user.email)
+
+
+def _timestamp(value: datetime) -> int:
+    """Horodatage Unix d'une date enregistrée (naïve = UTC)."""
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return int(value.timestamp())
+
+@router.post("/refresh")
+def refresh_tokens(request_data: RefreshTokenRequest, db: Session = Depends(get_db)):
+    """
+    Échange un jeton de rafraîchissement valide contre une nouvelle paire de jetons.
+    """
+    try:
+        claims = verify_token(request_data.refresh_token, "refresh")
+    except TokenError as e:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail=str(e))
+    return _rotate_refresh_token(claims, db)
+
+@router.get("/me")
+def get_current_identity(claims: TokenClaims = Depends(get_current_claims)):
+    """
+    Identité de l'utilisateur connecté, lue dans le jeton d'accès (sans requête en base).
+    """
+    return {
+        "user_id": claims.user_id,
+        "email": claims.email,
+        "expires_at": claims.expires_at,
     }
 
 @router.get("/user/{email}", response_model=UserResponse)
@@ -187,20 +302,26 @@ def get_user_info(email: str, db: Session = Depends(get_db)):
 
 
 @router.post("/logout")
-def logout_user():
+def logout_user(
+    request_data: Optional[LogoutRequest] = None,
+    claims: TokenClaims = Depends(get_current_claims),
+    db: Session = Depends(get_db)
+):
     """
-    Déconnexion (côté client)
+    Déconnexion : révoque le jeton d'accès et, s'il est fourni, le jeton de rafraîchissement.
     """
+    revoke_token(claims, db)
+    if request_data and request_data.refresh_token:
+        try:
+            refresh_claims = verify_token(request_data.refresh_token, "refresh")
+        except TokenError:
+            refresh_claims = None
+        # Un jeton de rafraîchissement d'un autre utilisateur est ignoré
+        if refresh_claims and refresh_claims.user_id == claims.user_id:
+            revoke_token(refresh_claims, db)
     return {"message": "Déconnexion réussie"}
 
-@router.put("/user/{email}", response_model=UserResponse)
-def update_user_profile(
-    email: str,
-    user_update: UserUpdate,
-    db: Session = Depends(get_db)
-):
-    user = get_user_by_email(email, db)
-    
+def _apply_user_update(user: User, user_update: UserUpdate, password_hash: Optional[str], db: Session) -> UserResponse:
     if user_update.full_name:
         user.full_name = user_update.full_name
     if user_update.phone:
@@ -210,77 +331,87 @@ def update_user_profile(
         if not state_obj:
             raise HTTPException(status_code=404, detail="État introuvable")
         user.state = state_obj
-    if user_update.password:
-        user.password_hash = get_password_hash(user_update.password)
+    if password_hash:
+        user.password_hash = password_hash
+        _revoke_user_tokens(user)
     
     db.commit()
     db.refresh(user)
     return UserResponse.from_orm(user)
 
-@router.post("/request-password-reset", status_code=status.HTTP_200_OK)
+@router.put("/user/{email}", response_model=UserResponse)
+async def update_user_profile(
+    email: str,
+    user_update: UserUpdate,
+    db: Session = Depends(get_db)
+):
+    user = await run_in_threadpool(get_user_by_email, email, db)
+    password_hash = await get_password_hash(user_update.password) if user_update.password else None
+    return await run_in_threadpool(_apply_user_update, user, user_update, password_hash, db)
+
+@router.post("/request-password-reset", status_code=status.HTTP_200_OK, dependencies=[Depends(password_reset_request_rate_limit)])
 def request_password_reset(request_data: PasswordResetRequest, db: Session = Depends(get_db)):
     """
     Déclenche le processus de réinitialisation de mot de passe.
     Un email avec un lien unique est envoyé à l'utilisateur.
+
+    Pendant PASSWORD_RESET_EMAIL_COOLDOWN_SECONDS après un envoi, aucun nouvel
+    email n'est envoyé. `retry_after` vaut toujours ce délai : le délai restant
+    d'un compte existant le distinguerait d'un email inconnu.
     """
+    message = "Si un compte est associé à cet email, un lien de réinitialisation a été envoyé."
     user = db.query(User).filter(User.email == request_data.email).first()
     if not user:
         # Pour des raisons de sécurité, on ne confirme pas si l'email existe ou non.
         # On retourne une réponse positive dans tous les cas pour éviter l'énumération d'utilisateurs.
         print(f"Tentative de réinitialisation pour un email inexistant : {request_data.email}")
-        return {"message": "Si un compte est associé à cet email, un lien de réinitialisation a été envoyé."}
+        return {"message": message, "retry_after": PASSWORD_RESET_EMAIL_COOLDOWN_SECONDS}
 
     # Générer un code à 6 chiffres
     code = str(secrets.randbelow(1_000_000)).zfill(6)
-    expires_at = datetime.now(timezone.utc) + timedelta(minutes=15)
-
-    # Stocker le token en base de données
-    # Note: La colonne 'token' stockera maintenant notre code à 6 chiffres.
-    reset_token = PasswordResetToken(
-        user_id=user.id,
-        token=code,
-        expires_at=expires_at
+
+    # Stocker le code (expiration automatique, remplace un code précédent hors délai d'attente)
+    result = get_ephemeral_store().issue(
+        PASSWORD_RESET, user.email, code,
+        PASSWORD_RESET_CODE_TTL_SECONDS, PASSWORD_RESET_EMAIL_COOLDOWN_SECONDS,
     )
-    db.add(reset_token)
-    db.commit()
 
-    # Envoyer l'email
-    send_password_reset_email(user.email, code)
+    # Envoyer l'email (sauf si un code encore valide vient d'être envoyé)
+    if result.issued:
+        send_password_reset_email(user.email, code)
 
-    return {"message": "Si un compte est associé à cet email, un lien de réinitialisation a été envoyé."}
+    # Même réponse qu'un email inconnu, que l'envoi ait eu lieu ou non
+    return {"message": message, "retry_after": PASSWORD_RESET_EMAIL_COOLDOWN_SECONDS}
 
 
-@router.post("/reset-password", status_code=status.HTTP_200_OK)
-def reset_password(reset_data: PasswordResetConfirm, db: Session = Depends(get_db)):
-    """
-    Finalise la réinitialisation du mot de passe avec un token valide.
-    """
-    # Trouver l'utilisateur
+def _apply_password_reset(reset_data: PasswordResetConfirm, password_hash: str, db: Session):
+    # Consommer le code : une seule requête peut l'utiliser, même en parallèle
+    if not get_ephemeral_store().consume(PASSWORD_RESET, reset_data.email, reset_data.code):
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Le code de réinitialisation est invalide ou a expiré.")
+
+    # Mettre à jour le mot de passe de l'utilisateur
     user = db.query(User).filter(User.email == reset_data.email).first()
     if not user:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Le code de réinitialisation est invalide ou a expiré.")
+    user.password_hash = password_hash
+    # Un jeton de rafraîchissement volé ne doit pas survivre à la réinitialisation
+    _revoke_user_tokens(user)
+    db.commit()
 
-    # Trouver le token en se basant sur le code et l'ID de l'utilisateur
-    token_record = db.query(PasswordResetToken).filter(
-        PasswordResetToken.user_id == user.id,
-        PasswordResetToken.token == reset_data.code
-    ).first()
-
-    if not token_record:
+@router.post("/reset-password", status_code=status.HTTP_200_OK, dependencies=[Depends(password_reset_rate_limit)])
+async def reset_password(reset_data: PasswordResetConfirm, db: Session = Depends(get_db)):
+    """
+    Finalise la réinitialisation du mot de passe avec un token valide.
+    Le code est vérifié avant le hachage du nouveau mot de passe.
+    """
+    code_is_valid = await run_in_threadpool(
+        get_ephemeral_store().verify, PASSWORD_RESET, reset_data.email, reset_data.code
+    )
+    if not code_is_valid:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Le code de réinitialisation est invalide ou a expiré.")
 
-    # Vérifier si le token a expiré
-    if token_record.expires_at < datetime.now(timezone.utc):
-        db.commit()
-        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Le jeton de réinitialisation a expiré.")
-
-    # Mettre à jour le mot de passe de l'utilisateur
-    user = token_record.user
-    user.password_hash = get_password_hash(reset_data.new_password)
-
-    # Supprimer le token pour qu'il ne soit pas réutilisé
-    db.delete(token_record)
-    db.commit()
+    password_hash = await get_password_hash(reset_data.new_password)
+    await run_in_threadpool(_apply_password_reset, reset_data, password_hash, db)
 
     return {"message": "Votre mot de passe a été réinitialisé avec succès."}
 
@@ -296,27 +427,28 @@ class EmailVerificationConfirm(BaseModel):
     email: EmailStr
     code: str
 
-@router.post("/send-verification-code", status_code=status.HTTP_200_OK)
+@router.post("/send-verification-code", status_code=status.HTTP_200_OK, dependencies=[Depends(verification_send_rate_limit)])
 def send_verification_code(request_data: EmailVerificationRequest, db: Session = Depends(get_db)):
     """
     Envoie un code de vérification par email.
     Le code est valide pendant 15 minutes.
+    Une nouvelle demande pendant le délai d'attente ne renvoie pas d'email.
     
     Args:
         request_data: Contient l'email de l'utilisateur
         
     Returns:
-        Message de succès ou d'erreur
+        Message, `sent` (un email est parti), `retry_after` et `expires_in` (secondes)
     """
-    success, message = send_verification_code_and_store(request_data.email, db)
+    success, message, code_state = send_verification_code_and_store(request_data.email, db)
     
     if not success:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=message)
     
-    return {"message": message}
+    return {"message": message, **code_state}
 
 
-@router.post("/verify-email-code", status_code=status.HTTP_200_OK)
+@router.post("/verify-email-code", status_code=status.HTTP_200_OK, dependencies=[Depends(verification_check_rate_limit)])
 def verify_email_verification_code(verify_data: EmailVerificationConfirm, db: Session = Depends(get_db)):
     """
     Vérifie le code de vérification envoyé par email.
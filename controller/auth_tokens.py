@@ -0,0 +1,292 @@
+import os
+import hmac
+import json
+import time
+import base64
+import hashlib
+import secrets
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional
+
+from fastapi import Depends, HTTPException, status
+from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from databaseone import SessionLocal
+from models.models import RevokedToken
+
+
+# --- Configuration des jetons d'authentification ---
+# Secret de signature HMAC-SHA256 (à partager entre tous les workers)
+AUTH_TOKEN_SECRET = os.getenv("AUTH_TOKEN_SECRET", "")
+if not AUTH_TOKEN_SECRET:
+    # Un secret propre à chaque processus rendrait les jetons invalides d'un
+    # worker à l'autre et après chaque redémarrage : on refuse de démarrer.
+    raise RuntimeError("La variable d'environnement AUTH_TOKEN_SECRET n'est pas définie.")
+# Durée de vie d'un jeton d'accès
+ACCESS_TOKEN_TTL_SECONDS = int(os.getenv("ACCESS_TOKEN_TTL_SECONDS", "900"))
+# Durée de vie d'un jeton de rafraîchissement
+REFRESH_TOKEN_TTL_SECONDS = int(os.getenv("REFRESH_TOKEN_TTL_SECONDS", str(30 * 24 * 3600)))
+# Nombre maximum de jetons validés gardés en cache
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
+# Intervalle de synchronisation de la liste de révocation avec la base
+REVOCATION_SYNC_INTERVAL_SECONDS = int(os.getenv("REVOCATION_SYNC_INTERVAL_SECONDS", "30"))
+
+_HEADER = {"alg": "HS256", "typ": "JWT"}
+
+
+class TokenError(Exception):
+    """Jeton invalide, expiré ou révoqué."""
+
+
+@dataclass(frozen=True)
+class TokenClaims:
+    """Identité portée par un jeton vérifié."""
+    user_id: int
+    email: str
+    token_type: str
+    jti: str
+    issued_at: int
+    expires_at: int
+
+
+# ============================================================
+# Encodage (JWT HS256, bibliothèque standard uniquement)
+# ============================================================
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _sign(signing_input: bytes) -> str:
+    return _b64encode(hmac.new(AUTH_TOKEN_SECRET.encode(), signing_input, hashlib.sha256).digest())
+
+
+_ENCODED_HEADER = _b64encode(json.dumps(_HEADER, separators=(",", ":")).encode())
+
+
+def _encode(payload: dict) -> str:
+    body = _b64encode(json.dumps(payload, separators=(",", ":")).encode())
+    signing_input = f"{_ENCODED_HEADER}.{body}"
+    return f"{signing_input}.{_sign(signing_input.encode())}"
+
+
+def _create_token(user_id: int, email: str, token_type: str, ttl_seconds: int) -> str:
+    now = int(time.time())
+    return _encode({
+        "sub": str(user_id),
+        "email": email,
+        "type": token_type,
+        "iat": now,
+        "exp": now + ttl_seconds,
+        "jti": secrets.token_urlsafe(12),
+    })
+
+
+def create_token_pair(user_id: int, email: str) -> dict:
+    """Jeton d'accès (courte durée) et jeton de rafraîchissement pour un utilisateur."""
+    return {
+        "access_token": _create_token(user_id, email, "access", ACCESS_TOKEN_TTL_SECONDS),
+        "refresh_token": _create_token(user_id, email, "refresh", REFRESH_TOKEN_TTL_SECONDS),
+        "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_TTL_SECONDS,
+    }
+
+
+# ============================================================
+# Liste de révocation
+# ============================================================
+# Seuls les identifiants (jti) des jetons d'accès révoqués et pas encore
+# expirés sont conservés : la liste reste petite (durée de vie de
+# ACCESS_TOKEN_TTL_SECONDS). Elle est persistée dans `revoked_tokens` et
+# complétée périodiquement avec les révocations récentes, pour que tous les
+# workers la partagent. Les jetons de rafraîchissement révoqués restent en
+# base uniquement : leur rotation est décidée par `claim_token`.
+
+_revoked: Dict[str, int] = {}
+_revoked_lock = threading.Lock()
+# Date de révocation (horloge de la base) la plus récente déjà chargée
+_last_revoked_at: Optional[datetime] = None
+# Relecture : une révocation validée après la synchronisation précédente peut
+# porter un revoked_at antérieur (heure de début de sa transaction)
+_SYNC_OVERLAP = timedelta(seconds=60)
+
+
+def is_revoked(jti: str) -> bool:
+    return jti in _revoked
+
+
+def revoke_token(claims: TokenClaims, db: Session):
+    """Révoque un jeton jusqu'à son expiration (en base, et localement pour un jeton d'accès)."""
+    if claims.token_type == "access":
+        with _revoked_lock:
+            _revoked[claims.jti] = claims.expires_at
+    db.merge(RevokedToken(
+        jti=claims.jti,
+        token_type=claims.token_type,
+        expires_at=datetime.fromtimestamp(claims.expires_at, tz=timezone.utc),
+    ))
+    db.commit()
+
+
+def claim_token(claims: TokenClaims, db: Session) -> bool:
+    """
+    Révoque un jeton à usage unique (rotation du jeton de rafraîchissement)
+    par un INSERT ... ON CONFLICT DO NOTHING : de deux requêtes concurrentes
+    avec le même jeton, une seule l'obtient.
+
+    Returns:
+        bool: False si le jeton était déjà révoqué
+    """
+    result = db.execute(
+        pg_insert(RevokedToken)
+        .values(
+            jti=claims.jti,
+            token_type=claims.token_type,
+            expires_at=datetime.fromtimestamp(claims.expires_at, tz=timezone.utc),
+        )
+        .on_conflict_do_nothing(index_elements=[RevokedToken.jti])
+    )
+    db.commit()
+    return result.rowcount == 1
+
+
+def sync_revocation_list(db: Optional[Session] = None) -> dict:
+    """
+    Charge les jetons d'accès révoqués depuis la synchronisation précédente
+    (par `revoked_at`, index), retire de la mémoire les entrées expirées et
+    supprime les lignes expirées en base.
+    Exécutée périodiquement (tâche `token_revocations`).
+    """
+    global _last_revoked_at
+    owns_session = db is None
+    if owns_session:
+        db = SessionLocal()
+
+    now = datetime.now(timezone.utc)
+    try:
+        purged = db.query(RevokedToken).filter(RevokedToken.expires_at < now).delete(synchronize_session=False)
+        db.commit()
+        query = db.query(RevokedToken.jti, RevokedToken.expires_at, RevokedToken.revoked_at).filter(
+            RevokedToken.token_type == "access", RevokedToken.expires_at >= now
+        )
+        if _last_revoked_at is not None:
+            query = query.filter(RevokedToken.revoked_at > _last_revoked_at - _SYNC_OVERLAP)
+        rows = query.all()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        if owns_session:
+            db.close()
+
+    now_ts = int(now.timestamp())
+    with _revoked_lock:
+        for jti in [jti for jti, expires_at in _revoked.items() if expires_at < now_ts]:
+            del _revoked[jti]
+        _revoked.update({jti: int(expires_at.timestamp()) for jti, expires_at, _ in rows})
+        size = len(_revoked)
+    if rows:
+        latest = max(revoked_at for _, _, revoked_at in rows)
+        _last_revoked_at = latest if _last_revoked_at is None else max(_last_revoked_at, latest)
+    return {"loaded": len(rows), "revoked": size, "purged": purged}
+
+
+# ============================================================
+# Vérification (avec cache)
+# ============================================================
+
+# Jetons déjà validés -> claims ; évite de refaire signature et décodage
+_claims_cache: "OrderedDict[str, TokenClaims]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _decode(token: str) -> TokenClaims:
+    try:
+        encoded_header, encoded_payload, signature = token.split(".")
+    except ValueError:
+        raise TokenError("Jeton mal formé.")
+    if not hmac.compare_digest(_sign(f"{encoded_header}.{encoded_payload}".encode()), signature):
+        raise TokenError("Signature du jeton invalide.")
+    try:
+        header = json.loads(_b64decode(encoded_header))
+        payload = json.loads(_b64decode(encoded_payload))
+        if header.get("alg") != "HS256":
+            raise TokenError("Algorithme de jeton non supporté.")
+        return TokenClaims(
+            user_id=int(payload["sub"]),
+            email=payload["email"],
+            token_type=payload["type"],
+            jti=payload["jti"],
+            issued_at=int(payload["iat"]),
+            expires_at=int(payload["exp"]),
+        )
+    except (ValueError, KeyError, TypeError):
+        raise TokenError("Jeton mal formé.")
+
+
+def verify_token(token: str, expected_type: str = "access") -> TokenClaims:
+    """
+    Vérifie un jeton sans accès à la base : signature (ou cache), type,
+    expiration et liste de révocation.
+
+    Raises:
+        TokenError: Jeton invalide, expiré ou révoqué
+    """
+    with _cache_lock:
+        claims = _claims_cache.get(token)
+        if claims is not None:
+            _claims_cache.move_to_end(token)
+
+    if claims is None:
+        claims = _decode(token)
+        with _cache_lock:
+            _claims_cache[token] = claims
+            if len(_claims_cache) > TOKEN_CACHE_SIZE:
+                _claims_cache.popitem(last=False)
+
+    if claims.token_type != expected_type:
+        raise TokenError("Type de jeton inattendu.")
+    if claims.expires_at <= time.time():
+        with _cache_lock:
+            _claims_cache.pop(token, None)
+        raise TokenError("Jeton expiré.")
+    if is_revoked(claims.jti):
+        raise TokenError("Jeton révoqué.")
+    return claims
+
+
+# ============================================================
+# Dépendance FastAPI
+# ============================================================
+
+_bearer_scheme = HTTPBearer(auto_error=False)
+
+
+def get_current_claims(credentials: Optional[HTTPAuthorizationCredentials] = Depends(_bearer_scheme)) -> TokenClaims:
+    """
+    Dépendance : identité de l'appelant d'après son jeton d'accès
+    (`Authorization: Bearer <token>`), sans requête en base.
+    """
+    if credentials is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Authentification requise.",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    try:
+        return verify_token(credentials.credentials, "access")
+    except TokenError as e:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail=str(e),
+            headers={"WWW-Authenticate": "Bearer"},
+        )
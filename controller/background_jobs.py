@@ -0,0 +1,88 @@
+import os
+import asyncio
+from datetime import datetime, timezone
+from typing import Callable, Dict, Any, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+
+# Permet de désactiver les tâches périodiques sur certains workers
+# (ex: avec plusieurs workers Gunicorn, un seul devrait les exécuter).
+BACKGROUND_JOBS_ENABLED = os.getenv("BACKGROUND_JOBS_ENABLED", "true").lower() == "true"
+
+# Tâches enregistrées et statistiques d'exécution, exposées par l'API admin
+_registered_jobs: List[Dict[str, Any]] = []
+_running_tasks: List[asyncio.Task] = []
+JOB_STATS: Dict[str, Dict[str, Any]] = {}
+
+
+def register_periodic_job(name: str, interval_seconds: int, func: Callable[[], Optional[dict]], run_at_startup: bool = False):
+    """
+    Enregistre une fonction synchrone à exécuter périodiquement.
+
+    La fonction est exécutée dans le threadpool pour ne pas bloquer la boucle
+    d'événements. Si elle retourne un dictionnaire, il est conservé dans
+    les statistiques de la tâche (`last_result`).
+    """
+    _registered_jobs.append({
+        "name": name,
+        "interval_seconds": interval_seconds,
+        "func": func,
+        "run_at_startup": run_at_startup,
+    })
+    JOB_STATS[name] = {
+        "interval_seconds": interval_seconds,
+        "runs": 0,
+        "failures": 0,
+        "last_run_at": None,
+        "last_duration_ms": None,
+        "last_result": None,
+        "last_error": None,
+    }
+
+
+async def _run_job_forever(job: Dict[str, Any]):
+    """Boucle d'exécution d'une tâche : attente, exécution, mise à jour des statistiques."""
+    stats = JOB_STATS[job["name"]]
+    if not job["run_at_startup"]:
+        await asyncio.sleep(job["interval_seconds"])
+
+    while True:
+        started = datetime.now(timezone.utc)
+        try:
+            result = await run_in_threadpool(job["func"])
+            stats["last_result"] = result
+            stats["last_error"] = None
+        except Exception as e:
+            stats["failures"] += 1
+            stats["last_error"] = str(e)
+            print(f"❌ Erreur dans la tâche périodique '{job['name']}' : {e}")
+        finally:
+            stats["runs"] += 1
+            stats["last_run_at"] = started.isoformat()
+            stats["last_duration_ms"] = int((datetime.now(timezone.utc) - started).total_seconds() * 1000)
+
+        await asyncio.sleep(job["interval_seconds"])
+
+
+def start_background_jobs():
+    """
+    Démarre toutes les tâches enregistrées. À appeler au démarrage de l'application.
+    """
+    if not BACKGROUND_JOBS_ENABLED:
+        print("⏸️ Tâches périodiques désactivées (BACKGROUND_JOBS_ENABLED=false).")
+        return
+
+    for job in _registered_jobs:
+        _running_tasks.append(asyncio.create_task(_run_job_forever(job)))
+        print(f"🕒 Tâche périodique '{job['name']}' démarrée (toutes les {job['interval_seconds']}s).")
+
+
+async def stop_background_jobs():
+    """
+    Annule les tâches en cours. À appeler à l'arrêt de l'application.
+    """
+    for task in _running_tasks:
+        task.cancel()
+    await asyncio.gather(*_running_tasks, return_exceptions=True)
+    _running_tasks.clear()
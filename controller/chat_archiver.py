@@ -0,0 +1,220 @@
+import os
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Optional
+
+from firebase_admin import db as rtdb
+from sqlalchemy.orm import Session
+
+from databaseone import SessionLocal
+from models.models import ChatSessionArchive, ChatArchivedMessage
+from .chat_search import index_archived_session
+
+
+# --- Configuration de l'archivage des sessions de chat ---
+# Délai après la fermeture avant qu'une session soit sortie de Firebase
+CHAT_ARCHIVE_AFTER_DAYS = int(os.getenv("CHAT_ARCHIVE_AFTER_DAYS", "30"))
+# Sessions candidates lues par requête sur l'index
+CHAT_ARCHIVE_BATCH_SIZE = int(os.getenv("CHAT_ARCHIVE_BATCH_SIZE", "50"))
+# Nombre maximum de sessions archivées par passage (la suite au passage suivant)
+CHAT_ARCHIVE_MAX_SESSIONS_PER_RUN = int(os.getenv("CHAT_ARCHIVE_MAX_SESSIONS_PER_RUN", "500"))
+# Intervalle entre deux passages
+CHAT_ARCHIVE_INTERVAL_SECONDS = int(os.getenv("CHAT_ARCHIVE_INTERVAL_SECONDS", "3600"))
+
+# Compteurs cumulés depuis le démarrage du processus
+CHAT_ARCHIVER_METRICS = {
+    "runs": 0,
+    "sessions_archived": 0,
+    "messages_archived": 0,
+    "sessions_skipped": 0,
+    "last_run_at": None,
+}
+
+
+class _ChatNodeChanged(Exception):
+    """Abandon d'une transaction Firebase : le nœud a changé depuis sa lecture."""
+
+
+def _delete_if_closed(node: Optional[Dict[str, Any]]) -> None:
+    """Transaction Firebase : supprime le nœud, sauf si la session n'est plus fermée."""
+    if node is not None and node.get("status") != "closed":
+        raise _ChatNodeChanged()
+    return None
+
+
+def parse_chat_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """Horodatage ISO enregistré par le chat (heure locale du serveur, sans fuseau)."""
+    if not value:
+        return None
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    return parsed if parsed.tzinfo else parsed.astimezone()
+
+
+def _store_archive(db: Session, session_key: str, session: Dict[str, Any]) -> ChatSessionArchive:
+    """
+    Copie une session (et ses messages) dans Postgres. Idempotent : une session
+    déjà archivée (même clé, même date de fermeture) n'est pas dupliquée.
+    """
+    closed_at = parse_chat_timestamp(session.get("closed_at") or session.get("updated_at"))
+    existing = db.query(ChatSessionArchive).filter(
+        ChatSessionArchive.session_key == session_key,
+        ChatSessionArchive.closed_at == closed_at,
+    ).first()
+    if existing is not None:
+        return existing
+
+    user_info = session.get("user_info") or {}
+    messages = session.get("messages") or {}
+    archive = ChatSessionArchive(
+        session_key=session_key,
+        user_email=user_info.get("email") or session_key.replace("_at_", "@").replace("_", "."),
+        user_name=user_info.get("name"),
+        subject=session.get("subject"),
+        admin_name=session.get("admin_name"),
+        started_at=parse_chat_timestamp(user_info.get("created_at")),
+        closed_at=closed_at,
+        message_count=len(messages),
+    )
+    db.add(archive)
+    db.flush()
+
+    db.bulk_insert_mappings(ChatArchivedMessage, [
+        {
+            "archive_id": archive.id,
+            "message_id": message_id,
+            "sender": message.get("sender", ""),
+            "sender_email": message.get("sender_email"),
+            "content": message.get("content", ""),
+            "sent_at": message.get("timestamp"),
+        }
+        for message_id, message in sorted(messages.items())
+    ])
+    # Recherche plein texte : messages rattachés à l'archive dans la même transaction
+    index_archived_session(db, archive)
+    db.commit()
+
+    CHAT_ARCHIVER_METRICS["sessions_archived"] += 1
+    CHAT_ARCHIVER_METRICS["messages_archived"] += len(messages)
+    return archive
+
+
+def archive_chat_session(db: Session, session_key: str) -> Optional[ChatSessionArchive]:
+    """
+    Archive une session fermée puis la supprime de Firebase (session et entrée
+    d'index). Ne fait rien si la session est active.
+
+    La suppression est conditionnelle (`Reference.transaction`) : elle est
+    abandonnée si la session a été rouverte entre sa lecture et sa suppression.
+
+    Returns:
+        L'archive, ou None si la session n'a pas été archivée
+    """
+    session = rtdb.reference(f"chat_sessions/{session_key}").get()
+    if not session:
+        # Entrée d'index sans session : rien à archiver
+        rtdb.reference(f"chat_session_index/{session_key}").delete()
+        return None
+    if session.get("status") != "closed":
+        return None
+
+    try:
+        archive = _store_archive(db, session_key, session)
+    except Exception:
+        db.rollback()
+        raise
+
+    try:
+        rtdb.reference(f"chat_sessions/{session_key}").transaction(_delete_if_closed)
+    except _ChatNodeChanged:
+        return archive
+    try:
+        rtdb.reference(f"chat_session_index/{session_key}").transaction(_delete_if_closed)
+    except _ChatNodeChanged:
+        # Nouvelle session déjà indexée sous la même clé
+        pass
+    return archive
+
+
+def _clear_stale_closed_at(session_key: str, closed_at: Optional[str]) -> bool:
+    """
+    Retire `closed_at` de l'entrée d'index d'une session qui n'est pas fermée :
+    sinon elle resterait en tête des candidates à chaque passage. La fermeture
+    suivante de la session le réécrit. Abandonné si l'entrée a changé depuis
+    la lecture des candidates.
+
+    Returns:
+        bool: True si l'entrée a été corrigée
+    """
+    def update(entry: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        if not entry or entry.get("closed_at") != closed_at:
+            raise _ChatNodeChanged()
+        return {**entry, "closed_at": None}
+
+    try:
+        rtdb.reference(f"chat_session_index/{session_key}").transaction(update)
+    except _ChatNodeChanged:
+        return False
+    return True
+
+
+def archive_closed_chat_sessions(db: Optional[Session] = None, max_sessions: int = CHAT_ARCHIVE_MAX_SESSIONS_PER_RUN) -> dict:
+    """
+    Sort de Firebase les sessions fermées depuis plus de CHAT_ARCHIVE_AFTER_DAYS
+    jours : elles sont copiées dans `chat_session_archives` /
+    `chat_archived_messages`, puis supprimées de `chat_sessions` et de
+    `chat_session_index`.
+
+    Les candidates sont lues par lots dans l'index, triées par `closed_at`
+    (règle Firebase requise : ".indexOn": ["updated_at", "closed_at"]).
+    Seules les sessions archivées sont lues en entier.
+
+    Returns:
+        dict: Compteurs de ce passage
+    """
+    owns_session = db is None
+    if owns_session:
+        db = SessionLocal()
+
+    cutoff = (datetime.now() - timedelta(days=CHAT_ARCHIVE_AFTER_DAYS)).isoformat()
+    result = {"sessions_archived": 0, "messages_archived": 0, "sessions_skipped": 0}
+
+    try:
+        while result["sessions_archived"] + result["sessions_skipped"] < max_sessions:
+            # start_at("") exclut les sessions sans `closed_at` (actives)
+            candidates = (
+                rtdb.reference("chat_session_index")
+                .order_by_child("closed_at")
+                .start_at("")
+                .end_at(cutoff)
+                .limit_to_first(CHAT_ARCHIVE_BATCH_SIZE)
+                .get()
+            ) or {}
+            if not candidates:
+                break
+
+            # Sessions archivées ou entrées d'index corrigées dans ce lot
+            progressed = 0
+            for session_key, entry in candidates.items():
+                archive = archive_chat_session(db, session_key)
+                if archive is None:
+                    result["sessions_skipped"] += 1
+                    if _clear_stale_closed_at(session_key, (entry or {}).get("closed_at")):
+                        progressed += 1
+                    continue
+                progressed += 1
+                result["sessions_archived"] += 1
+                result["messages_archived"] += archive.message_count
+
+            # Lot incomplet (fin des candidates) ou sans progrès : arrêt jusqu'au prochain passage
+            if len(candidates) < CHAT_ARCHIVE_BATCH_SIZE or progressed == 0:
+                break
+    finally:
+        if owns_session:
+            db.close()
+
+    CHAT_ARCHIVER_METRICS["runs"] += 1
+    CHAT_ARCHIVER_METRICS["sessions_skipped"] += result["sessions_skipped"]
+    CHAT_ARCHIVER_METRICS["last_run_at"] = datetime.now(timezone.utc).isoformat()
+    return result
@@ -0,0 +1,133 @@
+import os
+import json
+import asyncio
+from typing import Any, Dict, Optional, Set
+
+from .redis_client import get_async_redis
+
+
+# --- Configuration de la diffusion des messages de chat ---
+# "memory" (abonnés du même processus) ou "redis" (pub/sub partagé entre les workers)
+CHAT_HUB_BACKEND = os.getenv("CHAT_HUB_BACKEND", "memory").lower()
+# Événements en attente par connexion ; au-delà, le client lent est déconnecté
+# et reprend depuis son dernier curseur
+CHAT_HUB_QUEUE_SIZE = int(os.getenv("CHAT_HUB_QUEUE_SIZE", "100"))
+
+_CHANNEL_PREFIX = "chat:"
+
+# Compteurs cumulés depuis le démarrage du processus
+CHAT_HUB_METRICS = {
+    "backend": CHAT_HUB_BACKEND,
+    "subscribers": 0,
+    "published": 0,
+    "delivered": 0,
+    "slow_consumers_dropped": 0,
+    "publish_errors": 0,
+}
+
+
+class Subscription:
+    """Abonnement d'une connexion aux événements d'une session de chat."""
+
+    def __init__(self, session_key: str):
+        self.session_key = session_key
+        self.queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(maxsize=CHAT_HUB_QUEUE_SIZE)
+        # Passe à True si la file a débordé : la connexion doit être fermée
+        self.overflowed = False
+
+
+# Clé de session (email nettoyé) -> abonnements de ce processus
+_subscriptions: Dict[str, Set[Subscription]] = {}
+_listener_task: Optional[asyncio.Task] = None
+
+
+def subscribe(session_key: str) -> Subscription:
+    subscription = Subscription(session_key)
+    _subscriptions.setdefault(session_key, set()).add(subscription)
+    CHAT_HUB_METRICS["subscribers"] += 1
+    return subscription
+
+
+def unsubscribe(subscription: Subscription):
+    subscribers = _subscriptions.get(subscription.session_key)
+    if subscribers is None or subscription not in subscribers:
+        return
+    subscribers.discard(subscription)
+    if not subscribers:
+        del _subscriptions[subscription.session_key]
+    CHAT_HUB_METRICS["subscribers"] -= 1
+
+
+def _dispatch(session_key: str, event: Dict[str, Any]):
+    """Distribue un événement aux abonnés locaux de la session."""
+    for subscription in list(_subscriptions.get(session_key, ())):
+        try:
+            subscription.queue.put_nowait(event)
+            CHAT_HUB_METRICS["delivered"] += 1
+        except asyncio.QueueFull:
+            subscription.overflowed = True
+            unsubscribe(subscription)
+            CHAT_HUB_METRICS["slow_consumers_dropped"] += 1
+
+
+async def publish(session_key: str, event: Dict[str, Any]):
+    """
+    Publie un événement pour une session. Une erreur de diffusion n'est que
+    journalisée : le message est déjà enregistré dans Firebase et les clients
+    le récupèrent en reprenant depuis leur curseur.
+    """
+    CHAT_HUB_METRICS["published"] += 1
+    if CHAT_HUB_BACKEND != "redis":
+        _dispatch(session_key, event)
+        return
+    try:
+        await get_async_redis().publish(f"{_CHANNEL_PREFIX}{session_key}", json.dumps(event))
+    except Exception as e:
+        CHAT_HUB_METRICS["publish_errors"] += 1
+        print(f"⚠️ Diffusion du chat indisponible : {e}")
+
+
+# ============================================================
+# Écoute Redis (un abonnement par worker, redistribué localement)
+# ============================================================
+
+async def _listen_redis():
+    while True:
+        pubsub = None
+        try:
+            pubsub = get_async_redis().pubsub()
+            await pubsub.psubscribe(f"{_CHANNEL_PREFIX}*")
+            async for item in pubsub.listen():
+                if item.get("type") != "pmessage":
+                    continue
+                session_key = item["channel"][len(_CHANNEL_PREFIX):]
+                if session_key in _subscriptions:
+                    _dispatch(session_key, json.loads(item["data"]))
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"⚠️ Écoute Redis du chat interrompue, nouvelle tentative : {e}")
+            await asyncio.sleep(1)
+        finally:
+            if pubsub is not None:
+                try:
+                    await pubsub.aclose()
+                except Exception:
+                    pass
+
+
+def start_chat_hub():
+    """Démarre l'écoute Redis (backend "redis" uniquement). À appeler au démarrage."""
+    global _listener_task
+    if CHAT_HUB_BACKEND == "redis" and _listener_task is None:
+        _listener_task = asyncio.create_task(_listen_redis())
+        print("📡 Diffusion du chat via Redis pub/sub démarrée.")
+
+
+async def stop_chat_hub():
+    """Arrête l'écoute Redis. À appeler à l'arrêt de l'application."""
+    global _listener_task
+    if _listener_task is not None:
+        _listener_task.cancel()
+        await asyncio.gather(_listener_task, return_exceptions=True)
+        _listener_task = None
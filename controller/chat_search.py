@@ -0,0 +1,302 @@
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from firebase_admin import db as rtdb
+from sqlalchemy import exists, func, literal, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session, defer
+
+from databaseone import SessionLocal
+from models.models import ChatMessageSearch, ChatSessionArchive, ChatArchivedMessage
+
+
+# --- Configuration de la recherche dans les conversations de chat ---
+# Configuration plein texte de PostgreSQL : doit rester celle de la colonne
+# générée `chat_message_search.search_vector` (models.py, migration)
+CHAT_SEARCH_TS_CONFIG = "french"
+# Extraits renvoyés avec chaque résultat (termes trouvés entre <b></b>)
+CHAT_SEARCH_HEADLINE_OPTIONS = "MaxFragments=2, MaxWords=20, MinWords=5"
+# Résultats par page
+CHAT_SEARCH_PAGE_SIZE = int(os.getenv("CHAT_SEARCH_PAGE_SIZE", "20"))
+CHAT_SEARCH_MAX_PAGE_SIZE = int(os.getenv("CHAT_SEARCH_MAX_PAGE_SIZE", "100"))
+# Décalage maximal : au-delà, affiner la recherche plutôt que paginer
+CHAT_SEARCH_MAX_OFFSET = int(os.getenv("CHAT_SEARCH_MAX_OFFSET", "1000"))
+# --- Configuration de l'indexation de rattrapage (tâche `chat_search_indexer`) ---
+CHAT_SEARCH_BACKFILL_INTERVAL_SECONDS = int(os.getenv("CHAT_SEARCH_BACKFILL_INTERVAL_SECONDS", "600"))
+# Sessions Firebase vérifiées par passage (la suite au passage suivant)
+CHAT_SEARCH_BACKFILL_MAX_SESSIONS_PER_RUN = int(os.getenv("CHAT_SEARCH_BACKFILL_MAX_SESSIONS_PER_RUN", "500"))
+# Archives et messages traités par requête
+CHAT_SEARCH_BACKFILL_BATCH_SIZE = int(os.getenv("CHAT_SEARCH_BACKFILL_BATCH_SIZE", "500"))
+# Marge relue à chaque passage (décalage d'horloge entre les workers)
+CHAT_SEARCH_BACKFILL_OVERLAP_SECONDS = int(os.getenv("CHAT_SEARCH_BACKFILL_OVERLAP_SECONDS", "300"))
+
+# Compteurs cumulés depuis le démarrage du processus
+CHAT_SEARCH_METRICS = {
+    "messages_indexed_on_write": 0,
+    "index_errors": 0,
+    "backfill_runs": 0,
+    "messages_backfilled": 0,
+    "archives_backfilled": 0,
+    "searches": 0,
+    "last_search_ms": None,
+    "last_backfill_at": None,
+}
+
+# Sessions mises à jour depuis cette date (`updated_at` de l'index) à vérifier
+# au prochain passage ; vide au démarrage : toutes les sessions sont vérifiées
+_backfill_since = ""
+
+
+def _search_row(session_key: str, user_email: str, message_id: str, message: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "session_key": session_key,
+        "user_email": user_email,
+        "message_id": message_id,
+        "sender": message.get("sender", ""),
+        "content": message.get("content", ""),
+        "sent_at": message.get("timestamp"),
+    }
+
+
+def index_chat_messages(db: Session, rows: List[Dict[str, Any]]) -> int:
+    """
+    Ajoute des messages à l'index de recherche (sans commit). Les messages déjà
+    indexés sont ignorés.
+
+    Returns:
+        int: Nombre de messages ajoutés
+    """
+    if not rows:
+        return 0
+    statement = pg_insert(ChatMessageSearch).values(rows).on_conflict_do_nothing(
+        index_elements=[ChatMessageSearch.session_key, ChatMessageSearch.message_id],
+    )
+    return db.execute(statement).rowcount
+
+
+def index_chat_message(user_email: str, session_key: str, message_id: str, message: Dict[str, Any]):
+    """
+    Indexe un message juste après son envoi (tâche d'arrière-plan de la route).
+    Une erreur n'est que journalisée : le message est dans Firebase et la tâche
+    `chat_search_indexer` le rattrape.
+    """
+    db = SessionLocal()
+    try:
+        index_chat_messages(db, [_search_row(session_key, user_email, message_id, message)])
+        db.commit()
+        CHAT_SEARCH_METRICS["messages_indexed_on_write"] += 1
+    except Exception as e:
+        db.rollback()
+        CHAT_SEARCH_METRICS["index_errors"] += 1
+        print(f"⚠️ Indexation du message {message_id} impossible (rattrapée plus tard) : {e}")
+    finally:
+        db.close()
+
+
+def index_archived_session(db: Session, archive: ChatSessionArchive) -> int:
+    """
+    Indexe les messages d'une session archivée (sans commit). Les messages déjà
+    indexés pendant la conversation sont rattachés à l'archive.
+
+    Returns:
+        int: Nombre de messages ajoutés ou rattachés
+    """
+    archived = select(
+        literal(archive.session_key),
+        literal(archive.user_email),
+        ChatArchivedMessage.message_id,
+        ChatArchivedMessage.sender,
+        ChatArchivedMessage.content,
+        ChatArchivedMessage.sent_at,
+        ChatArchivedMessage.archive_id,
+    ).where(ChatArchivedMessage.archive_id == archive.id)
+
+    statement = pg_insert(ChatMessageSearch).from_select(
+        ["session_key", "user_email", "message_id", "sender", "content", "sent_at", "archive_id"],
+        archived,
+    )
+    statement = statement.on_conflict_do_update(
+        index_elements=[ChatMessageSearch.session_key, ChatMessageSearch.message_id],
+        set_={"archive_id": statement.excluded.archive_id},
+        where=ChatMessageSearch.archive_id.is_(None),
+    )
+    return db.execute(statement).rowcount
+
+
+def _backfill_archives(db: Session) -> Tuple[int, int]:
+    """Indexe les archives créées avant la recherche (aucun message indexé)."""
+    archives_indexed = messages_indexed = 0
+    while True:
+        pending = (
+            db.query(ChatSessionArchive)
+            .filter(
+                ChatSessionArchive.message_count > 0,
+                ~exists().where(ChatMessageSearch.archive_id == ChatSessionArchive.id),
+            )
+            .order_by(ChatSessionArchive.id)
+            .limit(CHAT_SEARCH_BACKFILL_BATCH_SIZE)
+            .all()
+        )
+        indexed_in_batch = 0
+        for archive in pending:
+            indexed = index_archived_session(db, archive)
+            db.commit()
+            if indexed:
+                indexed_in_batch += 1
+                messages_indexed += indexed
+        archives_indexed += indexed_in_batch
+        # Fin des archives en attente, ou aucun progrès : arrêt jusqu'au prochain passage
+        if len(pending) < CHAT_SEARCH_BACKFILL_BATCH_SIZE or indexed_in_batch == 0:
+            return archives_indexed, messages_indexed
+
+
+def _backfill_live_session(db: Session, session_key: str, entry: Dict[str, Any]) -> int:
+    """
+    Indexe les messages manquants d'une session Firebase. Les messages ne sont
+    relus que si l'index de recherche en compte moins que l'index des sessions.
+    """
+    indexed_count = db.query(func.count(ChatMessageSearch.id)).filter(
+        ChatMessageSearch.session_key == session_key,
+        ChatMessageSearch.archive_id.is_(None),
+        # Exclut une éventuelle session précédente avec la même clé
+        ChatMessageSearch.sent_at >= (entry.get("created_at") or ""),
+    ).scalar()
+    if indexed_count >= entry.get("message_count", 0):
+        return 0
+
+    user_email = entry.get("user_email") or session_key.replace("_at_", "@").replace("_", ".")
+    messages_ref = rtdb.reference(f"chat_sessions/{session_key}/messages")
+    added = 0
+    start_key = None
+    while True:
+        query = messages_ref.order_by_key()
+        if start_key is None:
+            query = query.limit_to_first(CHAT_SEARCH_BACKFILL_BATCH_SIZE)
+        else:
+            # start_at inclut le dernier message de la page précédente
+            query = query.start_at(start_key).limit_to_first(CHAT_SEARCH_BACKFILL_BATCH_SIZE + 1)
+        page = query.get() or {}
+        rows = [
+            _search_row(session_key, user_email, message_id, message)
+            for message_id, message in sorted(page.items())
+            if message_id != start_key and isinstance(message, dict)
+        ]
+        if not rows:
+            break
+        added += index_chat_messages(db, rows)
+        db.commit()
+        if len(rows) < CHAT_SEARCH_BACKFILL_BATCH_SIZE:
+            break
+        start_key = rows[-1]["message_id"]
+    return added
+
+
+def backfill_chat_search_index(db: Optional[Session] = None, max_sessions: int = CHAT_SEARCH_BACKFILL_MAX_SESSIONS_PER_RUN) -> dict:
+    """
+    Rattrape l'index de recherche : archives jamais indexées (créées avant la
+    recherche), puis messages Firebase manquants (envoyés avant la recherche,
+    ou dont l'indexation à l'envoi a échoué).
+
+    Seules les sessions mises à jour depuis le passage précédent sont
+    vérifiées (requête triée sur `updated_at` de l'index des sessions) ; au
+    démarrage du processus, toutes les sessions le sont.
+
+    Returns:
+        dict: Compteurs de ce passage
+    """
+    global _backfill_since
+
+    owns_session = db is None
+    if owns_session:
+        db = SessionLocal()
+
+    run_started_at = datetime.now()
+    result = {"archives_indexed": 0, "messages_indexed": 0, "sessions_checked": 0}
+
+    try:
+        result["archives_indexed"], result["messages_indexed"] = _backfill_archives(db)
+
+        entries = (
+            rtdb.reference("chat_session_index")
+            .order_by_child("updated_at")
+            .start_at(_backfill_since)
+            .get()
+        ) or {}
+        ordered = sorted(entries.items(), key=lambda item: (item[1].get("updated_at") or "", item[0]))
+
+        next_since = (run_started_at - timedelta(seconds=CHAT_SEARCH_BACKFILL_OVERLAP_SECONDS)).isoformat()
+        for position, (session_key, entry) in enumerate(ordered):
+            if position >= max_sessions:
+                # Reprise au prochain passage à partir de la première session non vérifiée
+                next_since = entry.get("updated_at") or ""
+                break
+            result["messages_indexed"] += _backfill_live_session(db, session_key, entry)
+            result["sessions_checked"] += 1
+        _backfill_since = next_since
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        if owns_session:
+            db.close()
+
+    CHAT_SEARCH_METRICS["backfill_runs"] += 1
+    CHAT_SEARCH_METRICS["archives_backfilled"] += result["archives_indexed"]
+    CHAT_SEARCH_METRICS["messages_backfilled"] += result["messages_indexed"]
+    CHAT_SEARCH_METRICS["last_backfill_at"] = datetime.now(timezone.utc).isoformat()
+    return result
+
+
+def search_chat_messages(
+    db: Session,
+    text: str,
+    user_email: Optional[str] = None,
+    sender: Optional[str] = None,
+    include_archived: bool = True,
+    limit: int = CHAT_SEARCH_PAGE_SIZE,
+    offset: int = 0,
+) -> Tuple[List[Tuple[ChatMessageSearch, float, str]], bool]:
+    """
+    Recherche plein texte (syntaxe web : mots, "expression exacte", -exclu, or)
+    classée par pertinence (`ts_rank_cd`), les plus récents d'abord à égalité.
+
+    Les résultats sont sélectionnés et classés avec l'index GIN ; les extraits
+    (`ts_headline`, coûteux) ne sont calculés que pour la page renvoyée.
+
+    Returns:
+        ([(message, score, extrait)], has_more)
+    """
+    started = time.perf_counter()
+    tsquery = func.websearch_to_tsquery(CHAT_SEARCH_TS_CONFIG, text)
+    rank = func.ts_rank_cd(ChatMessageSearch.search_vector, tsquery)
+
+    ranked = db.query(ChatMessageSearch.id.label("id"), rank.label("rank")).filter(
+        ChatMessageSearch.search_vector.op("@@")(tsquery)
+    )
+    if user_email:
+        ranked = ranked.filter(ChatMessageSearch.user_email == user_email)
+    if sender:
+        ranked = ranked.filter(ChatMessageSearch.sender == sender)
+    if not include_archived:
+        ranked = ranked.filter(ChatMessageSearch.archive_id.is_(None))
+    ranked = (
+        ranked.order_by(rank.desc(), ChatMessageSearch.id.desc())
+        .offset(offset)
+        .limit(limit + 1)
+        .subquery()
+    )
+
+    snippet = func.ts_headline(CHAT_SEARCH_TS_CONFIG, ChatMessageSearch.content, tsquery, CHAT_SEARCH_HEADLINE_OPTIONS)
+    rows = (
+        db.query(ChatMessageSearch, ranked.c.rank, snippet.label("snippet"))
+        .join(ranked, ranked.c.id == ChatMessageSearch.id)
+        .options(defer(ChatMessageSearch.search_vector))
+        .order_by(ranked.c.rank.desc(), ChatMessageSearch.id.desc())
+        .all()
+    )
+
+    CHAT_SEARCH_METRICS["searches"] += 1
+    CHAT_SEARCH_METRICS["last_search_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    return [tuple(row) for row in rows[:limit]], len(rows) > limit
@@ -5,6 +5,7 @@ from typing import List
 from databaseone import get_db
 from models import models
 from schemas import device_token_schema
+from schemas.serialization import json_list_response
 
 router = APIRouter(
     prefix="/api",
@@ -65,4 +66,4 @@ def get_user_device_tokens(user_email: str, db: Session = Depends(get_db)):
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Utilisateur avec l'email {user_email} non trouvé.")
     
-    return user.device_tokens
\ No newline at end of file
+    return json_list_response(device_token_schema.DeviceTokenListSerializer, user.device_tokens)
\ No newline at end of file
@@ -3,10 +3,8 @@ import os
 import secrets
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
-from datetime import datetime, timedelta, timezone
 from sqlalchemy.orm import Session
-from databaseone import SessionLocal
-from models.models import PasswordResetToken, User, EmailVerificationCode
+from .ephemeral_store import get_ephemeral_store, EMAIL_VERIFICATION
 
 
 # --- Configuration SMTP ---
@@ -15,6 +13,11 @@ HOSTINGER_PASSWORD = os.getenv("HOSTINGER_PASSWORD")
 HOSTINGER_SMTP_SERVER = "smtp.hostinger.com"
 HOSTINGER_SMTP_PORT = 465  # Port SSL
 
+# Durée de validité d'un code de vérification
+VERIFICATION_CODE_TTL_SECONDS = 15 * 60
+# Délai minimum entre deux envois de code à une même adresse
+VERIFICATION_EMAIL_COOLDOWN_SECONDS = int(os.getenv("VERIFICATION_EMAIL_COOLDOWN_SECONDS", "60"))
+
 
 def generate_verification_code() -> str:
     """
@@ -69,9 +72,15 @@ def send_verification_code_email(recipient_email: str, verification_code: str):
         return False
 
 
-def send_verification_code_and_store(email: str, db: Session) -> tuple[bool, str]:
+def send_verification_code_and_store(email: str, db: Session) -> tuple[bool, str, dict]:
     """
-    Génère un code de vérification, le stocke en base de données et l'envoie par email.
+    Génère un code de vérification, le stocke dans le stockage éphémère
+    (expiration automatique après 15 minutes) et l'envoie par email.
+    Un nouveau code remplace le précédent.
+
+    Si un code encore valide a été envoyé il y a moins de
+    VERIFICATION_EMAIL_COOLDOWN_SECONDS, aucun email n'est renvoyé : le code
+    déjà reçu reste valable.
     
     ADAPTATIVE: Fonctionne pour:
     - Les utilisateurs déjà inscrits
@@ -79,40 +88,35 @@ def send_verification_code_and_store(email: str, db: Session) -> tuple[bool, str
     
     Args:
         email: L'adresse email de l'utilisateur
-        db: La session de base de données
+        db: La session de base de données (non utilisée, conservée pour compatibilité)
         
     Returns:
-        tuple[bool, str]: (succès, message)
+        tuple[bool, str, dict]: (succès, message, état du code :
+        `sent`, `retry_after` et `expires_in` en secondes)
     """
+    store = get_ephemeral_store()
     try:
-        # Générer le code
+        # Générer et stocker le code avant l'envoi : il est utilisable dès réception
         verification_code = generate_verification_code()
+        result = store.issue(
+            EMAIL_VERIFICATION, email, verification_code,
+            VERIFICATION_CODE_TTL_SECONDS, VERIFICATION_EMAIL_COOLDOWN_SECONDS,
+        )
+        state = {"sent": result.issued, "retry_after": result.retry_after, "expires_in": result.expires_in}
+        if not result.issued:
+            return True, f"Un code a déjà été envoyé à {email}. Vous pourrez en demander un nouveau dans {result.retry_after} secondes.", state
         
         # Envoyer l'email
         email_sent = send_verification_code_email(email, verification_code)
         if not email_sent:
-            return False, "Impossible d'envoyer l'email"
-        
-        # Stocker le code dans la base de données
-        expires_at = datetime.now(timezone.utc) + timedelta(minutes=15)
-        
-        # Créer un record dans la table EmailVerificationCode
-        # (Fonctionne pour les emails existants ET ceux qui ne sont pas inscrits)
-        verification_record = EmailVerificationCode(
-            email=email,
-            code=verification_code,
-            expires_at=expires_at
-        )
-        
-        db.add(verification_record)
-        db.commit()
+            store.discard(EMAIL_VERIFICATION, email)
+            return False, "Impossible d'envoyer l'email", {}
         
-        return True, f"Code de vérification envoyé à {email}"
+        return True, f"Code de vérification envoyé à {email}", state
     
     except Exception as e:
-        db.rollback()
         print(f"❌ Erreur: {str(e)}")
-        return False, f"Erreur: {str(e)}"
+        return False, f"Erreur: {str(e)}", {}
 
 
 def verify_email_code(email: str, code: str, db: Session) -> tuple[bool, str]:
@@ -126,34 +130,18 @@ def verify_email_code(email: str, code: str, db: Session) -> tuple[bool, str]:
     Args:
         email: L'adresse email de l'utilisateur
         code: Le code de vérification fourni par l'utilisateur
-        db: La session de base de données
+        db: La session de base de données (non utilisée, conservée pour compatibilité)
         
     Returns:
         tuple[bool, str]: (succès, message)
     """
     try:
-        # Récupérer le record de vérification le plus récent pour cet email
-        verification_record = db.query(EmailVerificationCode).filter(
-            EmailVerificationCode.email == email,
-            EmailVerificationCode.code == code
-        ).order_by(EmailVerificationCode.created_at.desc()).first()
-        
-        if not verification_record:
-            return False, "Code de vérification invalide"
-        
-        # Vérifier que le code n'a pas expiré
-        if datetime.now(timezone.utc) > verification_record.expires_at:
-            db.delete(verification_record)
-            db.commit()
-            return False, "Le code a expiré. Demandez un nouveau code."
-        
-        # Le code est valide!
-        db.delete(verification_record)
-        db.commit()
+        # Vérification et suppression atomiques : le code ne sert qu'une fois
+        if not get_ephemeral_store().consume(EMAIL_VERIFICATION, email, code):
+            return False, "Code de vérification invalide ou expiré. Demandez un nouveau code si nécessaire."
         
         return True, "Code vérifié avec succès"
     
     except Exception as e:
-        db.rollback()
         print(f"❌ Erreur: {str(e)}")
         return False, f"Erreur: {str(e)}"
@@ -0,0 +1,377 @@
+import os
+import time
+import hmac
+import hashlib
+import math
+import threading
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import text
+
+from databaseone import SessionLocal
+from models.models import EmailVerificationCode, PasswordResetToken, User
+from .redis_client import get_sync_redis
+from .auth_tokens import AUTH_TOKEN_SECRET
+
+
+# --- Configuration du stockage des secrets éphémères ---
+# "database" (tables email_verification_codes / password_reset_tokens),
+# "redis" (expiration native, recommandé avec plusieurs workers)
+# ou "memory" (un seul processus)
+EPHEMERAL_STORE_BACKEND = os.getenv("EPHEMERAL_STORE_BACKEND", "database").lower()
+# Nombre maximum d'entrées en mémoire avant suppression des entrées expirées
+EPHEMERAL_STORE_MAX_KEYS = int(os.getenv("EPHEMERAL_STORE_MAX_KEYS", "100000"))
+# Clé HMAC des empreintes de codes (par défaut, le secret des jetons d'authentification)
+EPHEMERAL_STORE_SECRET = os.getenv("EPHEMERAL_STORE_SECRET", "") or AUTH_TOKEN_SECRET
+
+# Espaces de noms des secrets
+EMAIL_VERIFICATION = "email_verification"
+PASSWORD_RESET = "password_reset"
+
+# Compteurs cumulés depuis le démarrage du processus
+EPHEMERAL_STORE_METRICS = {
+    "backend": EPHEMERAL_STORE_BACKEND,
+    "issued": 0,
+    "deduplicated": 0,
+}
+
+
+@dataclass(frozen=True)
+class IssueResult:
+    """Résultat de `EphemeralSecretStore.issue`."""
+    # False : un code encore valide a été émis pendant le délai d'attente, rien n'a été remplacé
+    issued: bool
+    # Secondes avant de pouvoir émettre un nouveau code
+    retry_after: int
+    # Durée de validité restante du code actif
+    expires_in: int
+
+
+def _count(result: IssueResult) -> IssueResult:
+    EPHEMERAL_STORE_METRICS["issued" if result.issued else "deduplicated"] += 1
+    return result
+
+
+def _digest(namespace: str, subject: str, secret: str) -> str:
+    """
+    Empreinte HMAC-SHA256 du secret, avec une clé du serveur : un code à
+    6 chiffres ne peut pas être retrouvé hors ligne à partir d'une copie de
+    la mémoire ou de Redis sans cette clé.
+    """
+    message = f"{namespace}:{subject}:{secret}".encode()
+    return hmac.new(f"ephemeral:{EPHEMERAL_STORE_SECRET}".encode(), message, hashlib.sha256).hexdigest()
+
+
+class EphemeralSecretStore(ABC):
+    """
+    Secrets à durée de vie courte (codes de vérification, codes de réinitialisation).
+
+    Un seul secret actif par (espace de noms, sujet) : émettre un nouveau code
+    remplace le précédent. `consume` vérifie et supprime le secret de façon
+    atomique : un code ne peut être utilisé qu'une fois, même par deux requêtes
+    simultanées.
+    """
+
+    @abstractmethod
+    def put(self, namespace: str, subject: str, secret: str, ttl_seconds: int):
+        """Enregistre le secret, en remplaçant le secret actif du sujet."""
+
+    @abstractmethod
+    def issue(self, namespace: str, subject: str, secret: str, ttl_seconds: int, cooldown_seconds: int) -> IssueResult:
+        """
+        Comme `put`, sauf si le secret actif a été émis il y a moins de
+        `cooldown_seconds` : il est alors conservé et l'état du code existant
+        est retourné (l'appelant n'envoie pas de nouvel email).
+        """
+
+    @abstractmethod
+    def verify(self, namespace: str, subject: str, secret: str) -> bool:
+        """Vérifie le secret sans le consommer."""
+
+    @abstractmethod
+    def consume(self, namespace: str, subject: str, secret: str) -> bool:
+        """Vérifie et supprime le secret ; False s'il est invalide, expiré ou déjà utilisé."""
+
+    @abstractmethod
+    def discard(self, namespace: str, subject: str):
+        """Supprime le secret actif du sujet, s'il existe."""
+
+
+# ============================================================
+# Mémoire (un seul processus)
+# ============================================================
+
+class MemoryEphemeralStore(EphemeralSecretStore):
+
+    def __init__(self):
+        # (espace de noms, sujet) -> (empreinte, expiration, émission)
+        self._entries: Dict[Tuple[str, str], Tuple[str, float, float]] = {}
+        self._lock = threading.Lock()
+
+    def _get_valid(self, key: Tuple[str, str]) -> Optional[Tuple[str, float, float]]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] <= time.monotonic():
+            del self._entries[key]
+            return None
+        return entry
+
+    def _store(self, key: Tuple[str, str], digest: str, ttl_seconds: int, now: float):
+        if len(self._entries) >= EPHEMERAL_STORE_MAX_KEYS:
+            expired = [k for k, (_, expires_at, _) in self._entries.items() if expires_at <= now]
+            for k in expired:
+                del self._entries[k]
+        self._entries[key] = (digest, now + ttl_seconds, now)
+
+    def put(self, namespace: str, subject: str, secret: str, ttl_seconds: int):
+        with self._lock:
+            self._store((namespace, subject), _digest(namespace, subject, secret), ttl_seconds, time.monotonic())
+
+    def issue(self, namespace: str, subject: str, secret: str, ttl_seconds: int, cooldown_seconds: int) -> IssueResult:
+        key = (namespace, subject)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._get_valid(key)
+            if entry is not None and now - entry[2] < cooldown_seconds:
+                return _count(IssueResult(
+                    issued=False,
+                    retry_after=math.ceil(entry[2] + cooldown_seconds - now),
+                    expires_in=math.ceil(entry[1] - now),
+                ))
+            self._store(key, _digest(namespace, subject, secret), ttl_seconds, now)
+        return _count(IssueResult(issued=True, retry_after=cooldown_seconds, expires_in=ttl_seconds))
+
+    def verify(self, namespace: str, subject: str, secret: str) -> bool:
+        with self._lock:
+            entry = self._get_valid((namespace, subject))
+        return entry is not None and hmac.compare_digest(entry[0], _digest(namespace, subject, secret))
+
+    def consume(self, namespace: str, subject: str, secret: str) -> bool:
+        key = (namespace, subject)
+        with self._lock:
+            entry = self._get_valid(key)
+            if entry is None or not hmac.compare_digest(entry[0], _digest(namespace, subject, secret)):
+                return False
+            del self._entries[key]
+            return True
+
+    def discard(self, namespace: str, subject: str):
+        with self._lock:
+            self._entries.pop((namespace, subject), None)
+
+
+# ============================================================
+# Redis (expiration native, partagé entre les workers)
+# ============================================================
+
+# Scripts exécutés atomiquement par Redis.
+# KEYS[1] : secret ; KEYS[2] : marqueur de délai d'attente (expire avec le délai)
+_CONSUME_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('DEL', KEYS[1], KEYS[2])
+    return 1
+end
+return 0
+"""
+
+_ISSUE_LUA = """
+local cooldown_ms = redis.call('PTTL', KEYS[2])
+if cooldown_ms > 0 then
+    local secret_ms = redis.call('PTTL', KEYS[1])
+    if secret_ms > 0 then
+        return {0, cooldown_ms, secret_ms}
+    end
+end
+redis.call('SET', KEYS[1], ARGV[1], 'PX', ARGV[2])
+if tonumber(ARGV[3]) > 0 then
+    redis.call('SET', KEYS[2], '1', 'PX', ARGV[3])
+else
+    redis.call('DEL', KEYS[2])
+end
+return {1, tonumber(ARGV[3]), tonumber(ARGV[2])}
+"""
+
+
+class RedisEphemeralStore(EphemeralSecretStore):
+
+    def __init__(self):
+        self._consume_script = None
+        self._issue_script = None
+
+    @staticmethod
+    def _key(namespace: str, subject: str) -> str:
+        return f"secret:{namespace}:{subject}"
+
+    @staticmethod
+    def _cooldown_key(namespace: str, subject: str) -> str:
+        return f"secret-cooldown:{namespace}:{subject}"
+
+    def put(self, namespace: str, subject: str, secret: str, ttl_seconds: int):
+        redis = get_sync_redis()
+        redis.set(self._key(namespace, subject), _digest(namespace, subject, secret), ex=ttl_seconds)
+        redis.delete(self._cooldown_key(namespace, subject))
+
+    def issue(self, namespace: str, subject: str, secret: str, ttl_seconds: int, cooldown_seconds: int) -> IssueResult:
+        if self._issue_script is None:
+            self._issue_script = get_sync_redis().register_script(_ISSUE_LUA)
+        issued, cooldown_ms, secret_ms = self._issue_script(
+            keys=[self._key(namespace, subject), self._cooldown_key(namespace, subject)],
+            args=[_digest(namespace, subject, secret), ttl_seconds * 1000, cooldown_seconds * 1000],
+        )
+        return _count(IssueResult(
+            issued=int(issued) == 1,
+            retry_after=math.ceil(int(cooldown_ms) / 1000),
+            expires_in=math.ceil(int(secret_ms) / 1000),
+        ))
+
+    def verify(self, namespace: str, subject: str, secret: str) -> bool:
+        digest = get_sync_redis().get(self._key(namespace, subject))
+        return digest is not None and hmac.compare_digest(digest, _digest(namespace, subject, secret))
+
+    def consume(self, namespace: str, subject: str, secret: str) -> bool:
+        if self._consume_script is None:
+            self._consume_script = get_sync_redis().register_script(_CONSUME_LUA)
+        deleted = self._consume_script(
+            keys=[self._key(namespace, subject), self._cooldown_key(namespace, subject)],
+            args=[_digest(namespace, subject, secret)],
+        )
+        return int(deleted) == 1
+
+    def discard(self, namespace: str, subject: str):
+        get_sync_redis().delete(self._key(namespace, subject), self._cooldown_key(namespace, subject))
+
+
+# ============================================================
+# Base de données (repli : tables historiques)
+# ============================================================
+
+class DatabaseEphemeralStore(EphemeralSecretStore):
+    """
+    Secrets stockés dans `email_verification_codes` et `password_reset_tokens`,
+    comme avant l'introduction du stockage éphémère. Les lignes expirées sont
+    supprimées par le nettoyeur périodique (token_sweeper).
+    """
+
+    @staticmethod
+    def _rows(db, namespace: str, subject: str):
+        """Requête sur les lignes du sujet, modèle et colonne contenant le secret."""
+        if namespace == EMAIL_VERIFICATION:
+            model, secret_column = EmailVerificationCode, EmailVerificationCode.code
+            return db.query(model).filter(model.email == subject), model, secret_column
+        if namespace == PASSWORD_RESET:
+            model, secret_column = PasswordResetToken, PasswordResetToken.token
+            user_ids = db.query(User.id).filter(User.email == subject).scalar_subquery()
+            return db.query(model).filter(model.user_id.in_(user_ids)), model, secret_column
+        raise ValueError(f"Espace de noms inconnu : {namespace}")
+
+    def _replace(self, db, namespace: str, subject: str, secret: str, ttl_seconds: int, now: datetime):
+        rows, _, _ = self._rows(db, namespace, subject)
+        rows.delete(synchronize_session=False)
+        expires_at = now + timedelta(seconds=ttl_seconds)
+        if namespace == EMAIL_VERIFICATION:
+            db.add(EmailVerificationCode(email=subject, code=secret, expires_at=expires_at, created_at=now))
+        else:
+            user = db.query(User).filter(User.email == subject).first()
+            if user is None:
+                raise ValueError(f"Utilisateur inconnu : {subject}")
+            db.add(PasswordResetToken(user_id=user.id, token=secret, expires_at=expires_at, created_at=now))
+
+    def put(self, namespace: str, subject: str, secret: str, ttl_seconds: int):
+        db = SessionLocal()
+        try:
+            self._replace(db, namespace, subject, secret, ttl_seconds, datetime.now(timezone.utc))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def issue(self, namespace: str, subject: str, secret: str, ttl_seconds: int, cooldown_seconds: int) -> IssueResult:
+        now = datetime.now(timezone.utc)
+        db = SessionLocal()
+        try:
+            # Sérialise les demandes simultanées pour un même sujet (PostgreSQL)
+            if db.get_bind().dialect.name == "postgresql":
+                db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": f"{namespace}:{subject}"})
+
+            rows, model, _ = self._rows(db, namespace, subject)
+            current = (
+                rows.filter(model.expires_at > now)
+                .with_entities(model.created_at, model.expires_at)
+                .order_by(model.created_at.desc())
+                .first()
+            )
+            if current is not None:
+                # SQLite renvoie des dates naïves (UTC)
+                created_at, expires_at = (value.replace(tzinfo=value.tzinfo or timezone.utc) for value in current)
+                elapsed = (now - created_at).total_seconds()
+                if elapsed < cooldown_seconds:
+                    db.rollback()
+                    return _count(IssueResult(
+                        issued=False,
+                        retry_after=math.ceil(cooldown_seconds - elapsed),
+                        expires_in=math.ceil((expires_at - now).total_seconds()),
+                    ))
+
+            self._replace(db, namespace, subject, secret, ttl_seconds, now)
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        return _count(IssueResult(issued=True, retry_after=cooldown_seconds, expires_in=ttl_seconds))
+
+    def verify(self, namespace: str, subject: str, secret: str) -> bool:
+        db = SessionLocal()
+        try:
+            rows, model, secret_column = self._rows(db, namespace, subject)
+            return rows.filter(secret_column == secret, model.expires_at > datetime.now(timezone.utc)).first() is not None
+        finally:
+            db.close()
+
+    def consume(self, namespace: str, subject: str, secret: str) -> bool:
+        db = SessionLocal()
+        try:
+            rows, model, secret_column = self._rows(db, namespace, subject)
+            # DELETE conditionnel : une seule requête concurrente peut supprimer la ligne
+            deleted = rows.filter(
+                secret_column == secret, model.expires_at > datetime.now(timezone.utc)
+            ).delete(synchronize_session=False)
+            db.commit()
+            return deleted > 0
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def discard(self, namespace: str, subject: str):
+        db = SessionLocal()
+        try:
+            rows, _, _ = self._rows(db, namespace, subject)
+            rows.delete(synchronize_session=False)
+            db.commit()
+        finally:
+            db.close()
+
+
+_store: Optional[EphemeralSecretStore] = None
+
+
+def get_ephemeral_store() -> EphemeralSecretStore:
+    """Retourne le backend configuré (créé à la première utilisation)."""
+    global _store
+    if _store is None:
+        if EPHEMERAL_STORE_BACKEND == "redis":
+            _store = RedisEphemeralStore()
+        elif EPHEMERAL_STORE_BACKEND == "memory":
+            _store = MemoryEphemeralStore()
+        else:
+            _store = DatabaseEphemeralStore()
+    return _store
@@ -0,0 +1,146 @@
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+
+# --- Configuration du traitement des images ---
+# Nombre de processus dédiés au traitement d'images
+IMAGE_PIPELINE_WORKERS = int(os.getenv("IMAGE_PIPELINE_WORKERS", "2"))
+# Format des variantes : "webp" (par défaut) ou "jpeg"
+IMAGE_VARIANT_FORMAT = os.getenv("IMAGE_VARIANT_FORMAT", "webp").lower()
+# Plus grand côté de l'image affichée en détail
+IMAGE_DISPLAY_MAX_SIZE = int(os.getenv("IMAGE_DISPLAY_MAX_SIZE", "1600"))
+# Plus grand côté de la miniature des listes
+IMAGE_THUMBNAIL_MAX_SIZE = int(os.getenv("IMAGE_THUMBNAIL_MAX_SIZE", "320"))
+
+_VARIANT_EXTENSIONS = {"webp": ".webp", "jpeg": ".jpg"}
+# Formats dont l'original est réécrit sans métadonnées (GIF n'a pas d'EXIF, HEIC n'est pas décodable ici)
+_STRIPPABLE_FORMATS = ("JPEG", "PNG", "WEBP")
+# Blocs de métadonnées retirés de l'original (le profil ICC est conservé pour les couleurs)
+_METADATA_KEYS = ("exif", "xmp", "XML:com.adobe.xmp", "comment")
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+# ============================================================
+# Traitement (exécuté dans les processus du pool)
+# ============================================================
+# Ces fonctions ne dépendent ni de la base de données ni de FastAPI :
+# elles sont importées telles quelles par les processus enfants.
+
+def _save_variant(image: Image.Image, max_size: int, path: str, quality: int):
+    """Réduit une copie de l'image et l'enregistre sans métadonnées."""
+    variant = image.copy()
+    variant.thumbnail((max_size, max_size), Image.LANCZOS)
+    if IMAGE_VARIANT_FORMAT == "jpeg":
+        variant.convert("RGB").save(path, "JPEG", quality=quality, optimize=True, progressive=True)
+    else:
+        variant.save(path, "WEBP", quality=quality, method=4)
+
+
+def variant_filenames(stem: str) -> dict:
+    """Noms des fichiers de variantes produits pour une image."""
+    extension = _VARIANT_EXTENSIONS.get(IMAGE_VARIANT_FORMAT, ".webp")
+    return {"display": f"{stem}_display{extension}", "thumbnail": f"{stem}_thumb{extension}"}
+
+
+def process_ticket_image(source_path: str, output_dir: str, stem: str) -> dict:
+    """
+    Génère les variantes d'une photo de contravention.
+
+    - L'orientation EXIF est appliquée aux pixels, puis toutes les métadonnées
+      (EXIF, GPS...) sont supprimées des variantes.
+    - `<stem>_display` : image réduite pour l'affichage en détail.
+    - `<stem>_thumb` : miniature pour les listes.
+
+    Returns:
+        dict: Noms de fichiers des variantes, ou {} si l'image n'est pas lisible
+    """
+    names = variant_filenames(stem)
+    display_name = names["display"]
+    thumbnail_name = names["thumbnail"]
+
+    try:
+        with Image.open(source_path) as original:
+            image = ImageOps.exif_transpose(original)
+            if image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA" if "transparency" in image.info else "RGB")
+
+            _save_variant(image, IMAGE_DISPLAY_MAX_SIZE, os.path.join(output_dir, display_name), quality=80)
+            _save_variant(image, IMAGE_THUMBNAIL_MAX_SIZE, os.path.join(output_dir, thumbnail_name), quality=70)
+    except (UnidentifiedImageError, OSError) as e:
+        # Ex: HEIC sans greffon de décodage ; l'image originale reste utilisable
+        print(f"⚠️ Variantes non générées pour {source_path} : {e}")
+        return {}
+
+    return {"display": display_name, "thumbnail": thumbnail_name}
+
+
+def strip_image_metadata(path: str) -> bool:
+    """
+    Réécrit l'image originale sans métadonnées (EXIF, coordonnées GPS, XMP,
+    commentaires) avant sa publication : l'original est servi publiquement.
+    L'orientation EXIF est d'abord appliquée aux pixels. Un JPEG non tourné
+    garde ses tables de quantification d'origine (pas de perte supplémentaire).
+
+    Returns:
+        bool: True si le fichier a été réécrit, False s'il n'avait pas de
+        métadonnées ou si son format n'est pas pris en charge
+    """
+    temp_path = f"{path}.strip"
+    try:
+        with Image.open(path) as original:
+            if original.format not in _STRIPPABLE_FORMATS:
+                return False
+            if not original.getexif() and not any(key in original.info for key in _METADATA_KEYS):
+                return False
+
+            image_format = original.format
+            rotated = original.getexif().get(0x0112, 1) not in (1, None)
+            image = ImageOps.exif_transpose(original) if rotated else original
+            options = {"icc_profile": original.info.get("icc_profile")}
+            if image_format == "JPEG":
+                options["quality"] = 95 if rotated else "keep"
+                if not rotated:
+                    options["subsampling"] = "keep"
+            elif image_format == "WEBP":
+                options["quality"] = 95
+
+            image.save(temp_path, image_format, **{k: v for k, v in options.items() if v is not None})
+    except (UnidentifiedImageError, OSError) as e:
+        print(f"⚠️ Métadonnées non retirées pour {path} : {e}")
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        return False
+
+    os.replace(temp_path, path)
+    return True
+
+
+# ============================================================
+# Pool de processus
+# ============================================================
+
+def get_image_executor() -> ProcessPoolExecutor:
+    """
+    Retourne le pool de processus dédié aux images (créé à la première utilisation).
+    Le démarrage en "spawn" évite de dupliquer les threads du serveur dans les enfants.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=IMAGE_PIPELINE_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def shutdown_image_executor():
+    """Arrête le pool de processus. À appeler à l'arrêt de l'application."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -0,0 +1,316 @@
+import os
+import re
+import shutil
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional, Set
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from databaseone import SessionLocal
+from models.models import Ticket, JobWatermark
+from .storage import get_storage, LocalStorage, ListedObject, StorageBackend
+from .upload_service import lock_image_blob
+
+
+# --- Configuration du nettoyage des images orphelines ---
+# Âge minimum d'un fichier avant de pouvoir être considéré comme orphelin
+# (laisse le temps à une création de contravention en cours de se terminer)
+ORPHAN_IMAGE_MIN_AGE_SECONDS = int(os.getenv("ORPHAN_IMAGE_MIN_AGE_SECONDS", "86400"))
+# Durée de quarantaine avant suppression définitive
+ORPHAN_IMAGE_QUARANTINE_DAYS = int(os.getenv("ORPHAN_IMAGE_QUARANTINE_DAYS", "7"))
+# Nombre de fichiers vérifiés par requête en base
+ORPHAN_IMAGE_BATCH_SIZE = int(os.getenv("ORPHAN_IMAGE_BATCH_SIZE", "500"))
+# Nombre maximum de fichiers examinés par passage (la suite au passage suivant)
+ORPHAN_IMAGE_MAX_FILES_PER_RUN = int(os.getenv("ORPHAN_IMAGE_MAX_FILES_PER_RUN", "20000"))
+# Intervalle entre deux passages
+ORPHAN_IMAGE_INTERVAL_SECONDS = int(os.getenv("ORPHAN_IMAGE_INTERVAL_SECONDS", "3600"))
+
+# Les fichiers en quarantaine gardent leur clé, sous ce préfixe (jamais servi ni parcouru)
+QUARANTINE_PREFIX = ".quarantine"
+WATERMARK_JOB_NAME = "image_reconciler"
+# Fichiers temporaires laissés à la racine du stockage local par upload_service
+# (".<uuid>.part", réécrit en ".part.strip" sans métadonnées) et par la génération des variantes
+_TEMP_FILE_NAME = re.compile(r"^\.[0-9a-f]{32}\.part(\.strip)?$")
+_TEMP_DIR_PREFIX = ".variants-"
+
+# Compteurs cumulés depuis le démarrage du processus
+RECONCILER_METRICS = {
+    "runs": 0,
+    "runs_skipped": 0,
+    "full_passes": 0,
+    "files_scanned": 0,
+    "files_quarantined": 0,
+    "files_restored": 0,
+    "files_deleted": 0,
+    "files_vanished": 0,
+    "bytes_reclaimed": 0,
+    "temp_files_removed": 0,
+    "last_run_at": None,
+    "cursor": "",
+}
+
+
+# ---------------------------
+# Curseur de reprise
+# ---------------------------
+
+def _load_watermark(db: Session) -> str:
+    watermark = db.get(JobWatermark, WATERMARK_JOB_NAME)
+    return watermark.cursor if watermark else ""
+
+
+def _save_watermark(db: Session, cursor: str):
+    db.merge(JobWatermark(job_name=WATERMARK_JOB_NAME, cursor=cursor))
+    db.commit()
+
+
+def _try_lock_job(connection: Connection) -> bool:
+    """
+    Verrou de session (advisory lock PostgreSQL) sur le job : un seul worker
+    le fait tourner à la fois, les autres passent leur tour.
+    Pris sur une connexion dédiée, gardée jusqu'à la fin du passage.
+    """
+    if connection.dialect.name != "postgresql":
+        return True
+    return bool(connection.execute(
+        text("SELECT pg_try_advisory_lock(hashtext(:key))"), {"key": WATERMARK_JOB_NAME}
+    ).scalar())
+
+
+def _unlock_job(connection: Connection):
+    if connection.dialect.name == "postgresql":
+        connection.execute(text("SELECT pg_advisory_unlock(hashtext(:key))"), {"key": WATERMARK_JOB_NAME})
+        connection.commit()
+
+
+# ---------------------------
+# Vérifications en base
+# ---------------------------
+
+def _referenced_urls(db: Session, urls: List[str]) -> Set[str]:
+    """URLs (parmi `urls`) utilisées par au moins une contravention : une requête indexée par colonne."""
+    if not urls:
+        return set()
+    referenced = set()
+    for column in (Ticket.image_url, Ticket.image_display_url, Ticket.image_thumbnail_url):
+        referenced.update(value for (value,) in db.query(column).filter(column.in_(urls)).distinct())
+    return referenced
+
+
+def _lock_urls(db: Session, urls: List[str]):
+    """Verrouille les images dans un ordre fixe (pas d'interblocage entre deux passages)."""
+    for url in sorted(urls):
+        lock_image_blob(db, url)
+
+
+# ---------------------------
+# Étapes du nettoyage
+# ---------------------------
+
+def _move_if_present(storage: StorageBackend, source_key: str, target_key: str) -> bool:
+    """
+    Déplace un objet ; un objet déjà disparu (supprimé avec sa contravention
+    depuis le listage) est ignoré au lieu d'interrompre tout le lot.
+
+    Returns:
+        bool: False si l'objet n'existait plus
+    """
+    try:
+        storage.move(source_key, target_key)
+    except Exception:
+        if storage.exists(source_key):
+            raise
+        RECONCILER_METRICS["files_vanished"] += 1
+        return False
+    return True
+
+
+def _quarantine_batch(db: Session, storage: StorageBackend, batch: List[ListedObject], min_modified_at: datetime) -> int:
+    """
+    Met en quarantaine les fichiers du lot qu'aucune contravention ne référence.
+    La vérification est refaite sous verrou, juste avant le déplacement.
+    """
+    urls = {storage.public_url(item.key): item for item in batch if item.modified_at < min_modified_at}
+    referenced = _referenced_urls(db, list(urls))
+    candidates = [url for url in urls if url not in referenced]
+    if not candidates:
+        return 0
+
+    quarantined = 0
+    try:
+        _lock_urls(db, candidates)
+        still_referenced = _referenced_urls(db, candidates)
+        for url in candidates:
+            if url in still_referenced:
+                continue
+            key = urls[url].key
+            if _move_if_present(storage, key, f"{QUARANTINE_PREFIX}/{key}"):
+                quarantined += 1
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return quarantined
+
+
+def _purge_quarantine(db: Session, storage: StorageBackend, expired_before: datetime) -> dict:
+    """
+    Supprime les fichiers dont la quarantaine est terminée.
+    Un fichier à nouveau référencé entre-temps est restauré à sa place.
+    """
+    stats = {"restored": 0, "deleted": 0, "bytes": 0}
+    quarantined = list(storage.iter_objects(prefix=QUARANTINE_PREFIX))
+
+    for start in range(0, len(quarantined), ORPHAN_IMAGE_BATCH_SIZE):
+        batch = quarantined[start:start + ORPHAN_IMAGE_BATCH_SIZE]
+        originals = {
+            storage.public_url(item.key[len(QUARANTINE_PREFIX) + 1:]): item for item in batch
+        }
+        try:
+            _lock_urls(db, list(originals))
+            referenced = _referenced_urls(db, list(originals))
+            for url, item in originals.items():
+                original_key = item.key[len(QUARANTINE_PREFIX) + 1:]
+                if url in referenced:
+                    if _move_if_present(storage, item.key, original_key):
+                        stats["restored"] += 1
+                elif item.modified_at < expired_before:
+                    storage.delete(item.key)
+                    stats["deleted"] += 1
+                    stats["bytes"] += item.size
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+    return stats
+
+
+def _remove_stale_temp_files(storage: StorageBackend, min_modified_at: datetime) -> int:
+    """
+    Supprime les fichiers temporaires abandonnés (upload interrompu, processus arrêté
+    pendant la génération des variantes) : fichiers `.<uuid>.part` et dossiers
+    `.variants-*`. Les autres fichiers cachés de la racine ne sont pas touchés.
+    """
+    if not isinstance(storage, LocalStorage):
+        return 0
+
+    removed = 0
+    for entry in os.scandir(storage.root):
+        is_temp_dir = entry.name.startswith(_TEMP_DIR_PREFIX) and entry.is_dir(follow_symlinks=False)
+        is_temp_file = _TEMP_FILE_NAME.match(entry.name) and entry.is_file(follow_symlinks=False)
+        if not (is_temp_dir or is_temp_file):
+            continue
+        try:
+            modified_at = datetime.fromtimestamp(entry.stat(follow_symlinks=False).st_mtime, tz=timezone.utc)
+            if modified_at >= min_modified_at:
+                continue
+            if is_temp_dir:
+                shutil.rmtree(entry.path, ignore_errors=True)
+            else:
+                os.remove(entry.path)
+        except FileNotFoundError:
+            # Fichier publié ou supprimé entre-temps
+            continue
+        removed += 1
+    return removed
+
+
+def reconcile_orphan_images(db: Optional[Session] = None, max_files: int = ORPHAN_IMAGE_MAX_FILES_PER_RUN) -> dict:
+    """
+    Supprime les images qui ne sont plus référencées par aucune contravention
+    (création interrompue, suppression de fichier échouée, suppression d'un
+    utilisateur en cascade...).
+
+    - Le stockage est parcouru par ordre de clé, au plus `max_files` fichiers
+      par passage ; la dernière clé examinée est enregistrée dans
+      `job_watermarks` et le passage suivant reprend à partir d'elle.
+    - Les fichiers sont vérifiés par lots contre `tickets` (image originale
+      et variantes), avec une requête IN par colonne.
+    - Les orphelins sont d'abord mis en quarantaine, puis supprimés après
+      ORPHAN_IMAGE_QUARANTINE_DAYS jours s'ils ne sont toujours pas référencés.
+    - Un seul worker exécute le passage à la fois (verrou PostgreSQL) ; un
+      fichier disparu depuis le listage est simplement ignoré.
+
+    Returns:
+        dict: Compteurs de ce passage
+    """
+    owns_session = db is None
+    if owns_session:
+        db = SessionLocal()
+
+    lock_connection = db.get_bind().connect()
+    try:
+        if not _try_lock_job(lock_connection):
+            RECONCILER_METRICS["runs_skipped"] += 1
+            print("⏭️ Nettoyage des images déjà en cours sur un autre worker : passage ignoré.")
+            return {"skipped": True}
+        try:
+            return _reconcile(db, max_files)
+        finally:
+            _unlock_job(lock_connection)
+    finally:
+        lock_connection.close()
+        if owns_session:
+            db.close()
+
+
+def _reconcile(db: Session, max_files: int) -> dict:
+    """Passage du nettoyage, exécuté sous le verrou du job (voir reconcile_orphan_images)."""
+    storage = get_storage()
+    now = datetime.now(timezone.utc)
+    min_modified_at = now - timedelta(seconds=ORPHAN_IMAGE_MIN_AGE_SECONDS)
+    result = {"files_scanned": 0, "files_quarantined": 0, "full_pass_completed": False}
+
+    try:
+        cursor = _load_watermark(db)
+        batch: List[ListedObject] = []
+        exhausted = True
+        for item in storage.iter_objects(start_after=cursor):
+            if result["files_scanned"] >= max_files:
+                exhausted = False
+                break
+            batch.append(item)
+            result["files_scanned"] += 1
+            if len(batch) >= ORPHAN_IMAGE_BATCH_SIZE:
+                result["files_quarantined"] += _quarantine_batch(db, storage, batch, min_modified_at)
+                cursor = batch[-1].key
+                _save_watermark(db, cursor)
+                batch = []
+
+        if batch:
+            result["files_quarantined"] += _quarantine_batch(db, storage, batch, min_modified_at)
+            cursor = batch[-1].key
+        if exhausted:
+            # Fin du stockage atteinte : le prochain passage repart du début
+            cursor = ""
+            result["full_pass_completed"] = True
+        _save_watermark(db, cursor)
+
+        purge = _purge_quarantine(db, storage, now - timedelta(days=ORPHAN_IMAGE_QUARANTINE_DAYS))
+        temp_removed = _remove_stale_temp_files(storage, min_modified_at)
+    except Exception:
+        db.rollback()
+        raise
+
+    result.update({
+        "files_restored": purge["restored"],
+        "files_deleted": purge["deleted"],
+        "bytes_reclaimed": purge["bytes"],
+        "temp_files_removed": temp_removed,
+        "cursor": cursor,
+    })
+
+    RECONCILER_METRICS["runs"] += 1
+    RECONCILER_METRICS["full_passes"] += int(result["full_pass_completed"])
+    for counter in ("files_scanned", "files_quarantined", "files_restored", "files_deleted", "bytes_reclaimed", "temp_files_removed"):
+        RECONCILER_METRICS[counter] += result[counter]
+    RECONCILER_METRICS["last_run_at"] = now.isoformat()
+    RECONCILER_METRICS["cursor"] = cursor
+
+    if result["files_quarantined"] or purge["deleted"] or purge["restored"]:
+        print(f"🧹 Images orphelines : {result['files_quarantined']} mise(s) en quarantaine, "
+              f"{purge['deleted']} supprimée(s) ({purge['bytes']} octets), {purge['restored']} restaurée(s).")
+
+    return result
@@ -1,8 +1,15 @@
-from fastapi import APIRouter, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from pydantic import BaseModel, EmailStr, HttpUrl
-from typing import Optional
+from sqlalchemy.orm import Session
+from typing import Optional, List
+from datetime import datetime, timedelta, timezone
 import firebase_admin # Importer la racine pour accéder à FirebaseError
 
+from databaseone import get_db
+from models import models
+from schemas.notification_schema import NotificationResponse, NotificationListSerializer
+from schemas.serialization import json_list_response
+
 from .email_service1 import send_email_notification
 from .firebase_notifications import send_push_notification
 
@@ -57,4 +64,31 @@ def send_generic_push(notification_data: PushNotificationSchema):
         )
         return {"message": "Notification push envoyée avec succès", "response": response}
     except Exception as e: # Garder une capture générale pour les autres erreurs
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Erreur inattendue lors de l'envoi de la notification : {e}")
\ No newline at end of file
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Erreur inattendue lors de l'envoi de la notification : {e}")
+
+
+@router.get("/user/{user_email}", response_model=List[NotificationResponse], summary="Lister les notifications récentes d'un utilisateur")
+def get_recent_user_notifications(
+    user_email: str,
+    days: int = Query(90, ge=1, le=365),
+    limit: int = Query(50, ge=1, le=200),
+    db: Session = Depends(get_db)
+):
+    """
+    Retourne les dernières notifications envoyées à un utilisateur.
+    La borne sur `created_at` permet à PostgreSQL de ne lire que les partitions
+    mensuelles concernées, quel que soit le volume d'historique.
+    """
+    user = db.query(models.User).filter(models.User.email == user_email).first()
+    if not user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Utilisateur avec l'email {user_email} non trouvé.")
+
+    since = datetime.now(timezone.utc) - timedelta(days=days)
+    notifications = (
+        db.query(models.Notification)
+        .filter(models.Notification.user_id == user.id, models.Notification.created_at >= since)
+        .order_by(models.Notification.created_at.desc())
+        .limit(limit)
+        .all()
+    )
+    return json_list_response(NotificationListSerializer, notifications)
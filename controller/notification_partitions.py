@@ -0,0 +1,132 @@
+import os
+import re
+from datetime import date, datetime, timezone
+
+from sqlalchemy import text
+
+from databaseone import engine, add_months, create_notification_partitions
+
+
+# --- Configuration du partitionnement de la table notifications ---
+# Nombre de partitions mensuelles créées à l'avance (mois courant inclus)
+NOTIFICATION_PARTITIONS_AHEAD = int(os.getenv("NOTIFICATION_PARTITIONS_AHEAD", "3"))
+# Nombre de mois d'historique conservés
+NOTIFICATION_RETENTION_MONTHS = int(os.getenv("NOTIFICATION_RETENTION_MONTHS", "12"))
+# "drop" : les anciennes partitions sont supprimées
+# "detach" : elles sont seulement détachées (archivage manuel possible)
+NOTIFICATION_RETENTION_MODE = os.getenv("NOTIFICATION_RETENTION_MODE", "drop")
+# Intervalle entre deux passages de maintenance
+NOTIFICATION_PARTITION_INTERVAL_SECONDS = int(os.getenv("NOTIFICATION_PARTITION_INTERVAL_SECONDS", "86400"))
+# Lignes supprimées par transaction dans la partition par défaut (rétention)
+NOTIFICATION_DEFAULT_PURGE_BATCH_SIZE = int(os.getenv("NOTIFICATION_DEFAULT_PURGE_BATCH_SIZE", "10000"))
+
+_PARTITION_NAME_PATTERN = re.compile(r"^notifications_y(\d{4})m(\d{2})$")
+
+
+def _is_partitioned(connection) -> bool:
+    """Vrai si `notifications` est une table partitionnée (migration appliquée)."""
+    relkind = connection.execute(text(
+        "SELECT relkind FROM pg_class WHERE oid = to_regclass('notifications')"
+    )).scalar()
+    return relkind == "p"
+
+
+def _purge_default_partition(oldest_kept_month: date) -> int:
+    """
+    Applique la rétention à la partition par défaut (lignes hors des plages
+    mensuelles), qu'on ne peut pas détacher : suppression par lots, une
+    transaction par lot.
+
+    Returns:
+        int: Nombre de lignes supprimées
+    """
+    purged = 0
+    while True:
+        with engine.begin() as connection:
+            deleted = connection.execute(text(
+                "DELETE FROM notifications_default WHERE ctid IN ("
+                "SELECT ctid FROM notifications_default WHERE created_at < :cutoff LIMIT :batch_size)"
+            ), {
+                "cutoff": datetime(oldest_kept_month.year, oldest_kept_month.month, 1, tzinfo=timezone.utc),
+                "batch_size": NOTIFICATION_DEFAULT_PURGE_BATCH_SIZE,
+            }).rowcount
+        purged += deleted
+        if deleted < NOTIFICATION_DEFAULT_PURGE_BATCH_SIZE:
+            return purged
+
+
+def _list_monthly_partitions(connection) -> list:
+    """Retourne les partitions mensuelles attachées sous forme de (nom, premier jour du mois)."""
+    rows = connection.execute(text(
+        "SELECT child.relname FROM pg_inherits "
+        "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+        "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE parent.relname = 'notifications'"
+    )).scalars().all()
+
+    partitions = []
+    for name in rows:
+        match = _PARTITION_NAME_PATTERN.match(name)
+        if match:
+            partitions.append((name, date(int(match.group(1)), int(match.group(2)), 1)))
+    return sorted(partitions, key=lambda p: p[1])
+
+
+def maintain_notification_partitions() -> dict:
+    """
+    Crée les partitions des prochains mois et applique la rétention.
+
+    Une partition est retirée quand tout son mois est plus ancien que la
+    période de rétention. Elle est d'abord détachée (opération rapide),
+    puis supprimée si NOTIFICATION_RETENTION_MODE vaut "drop". En mode
+    "drop", les lignes trop anciennes de la partition par défaut sont
+    aussi supprimées.
+
+    Si la table n'est pas encore partitionnée (migration
+    migration_partition_notifications.sql non appliquée), rien n'est fait.
+
+    Returns:
+        dict: Partitions créées, détachées et supprimées, lignes purgées de la partition par défaut
+    """
+    result = {"created": [], "detached": [], "dropped": [], "default_purged": 0}
+    if engine.dialect.name != "postgresql":
+        return result
+
+    with engine.connect() as connection:
+        partitioned = _is_partitioned(connection)
+    if not partitioned:
+        print("⚠️ Table notifications non partitionnée (migration non appliquée) : maintenance des partitions ignorée.")
+        return result
+
+    today = datetime.now(timezone.utc).date()
+    current_month = date(today.year, today.month, 1)
+    oldest_kept_month = add_months(current_month, -NOTIFICATION_RETENTION_MONTHS)
+
+    with engine.begin() as connection:
+        created = create_notification_partitions(connection, current_month, NOTIFICATION_PARTITIONS_AHEAD + 1)
+
+    with engine.connect() as connection:
+        partitions = _list_monthly_partitions(connection)
+
+    detached, dropped = [], []
+    for name, month_start in partitions:
+        if month_start >= oldest_kept_month:
+            continue
+        # Une transaction par partition pour ne pas garder de verrou sur la table parente
+        with engine.begin() as connection:
+            connection.execute(text(f"ALTER TABLE notifications DETACH PARTITION {name}"))
+            detached.append(name)
+            if NOTIFICATION_RETENTION_MODE == "drop":
+                connection.execute(text(f"DROP TABLE {name}"))
+                dropped.append(name)
+
+    default_purged = 0
+    if NOTIFICATION_RETENTION_MODE == "drop":
+        default_purged = _purge_default_partition(oldest_kept_month)
+
+    if created or detached or default_purged:
+        print(f"🗂️ Partitions notifications : {len(created)} créée(s), {len(detached)} détachée(s), "
+              f"{len(dropped)} supprimée(s), {default_purged} ligne(s) purgée(s) de la partition par défaut.")
+
+    result.update(created=created, detached=detached, dropped=dropped, default_purged=default_purged)
+    return result
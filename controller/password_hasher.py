@@ -0,0 +1,161 @@
+import os
+import time
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Tuple
+
+from passlib.context import CryptContext
+
+
+# --- Configuration du hachage des mots de passe ---
+# Coût bcrypt (2^rounds itérations). Un hash d'un autre coût est refait à la connexion.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+# Nombre de processus dédiés à bcrypt
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+# Nombre maximum d'opérations en cours ou en attente ; au-delà, la requête est refusée (503)
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "64"))
+
+# min_rounds = max_rounds = BCRYPT_ROUNDS : tout hash d'un autre coût est
+# signalé par `verify_and_update`, que le coût ait été augmenté ou réduit.
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+_executor: Optional[ProcessPoolExecutor] = None
+_pending = 0
+
+# Compteurs cumulés depuis le démarrage du processus
+PASSWORD_HASHER_METRICS = {
+    "bcrypt_rounds": BCRYPT_ROUNDS,
+    "workers": PASSWORD_HASH_WORKERS,
+    "max_queue": PASSWORD_HASH_MAX_QUEUE,
+    "pending": 0,
+    "max_pending": 0,
+    "hashes": 0,
+    "verifications": 0,
+    "rehashes": 0,
+    "rejected": 0,
+    "failures": 0,
+    "pool_restarts": 0,
+    "total_duration_ms": 0,
+    "last_duration_ms": None,
+}
+
+
+class PasswordHasherBusy(Exception):
+    """File d'attente du hachage pleine : la requête doit être retentée plus tard."""
+
+
+# ============================================================
+# Opérations (exécutées dans les processus du pool)
+# ============================================================
+
+def _hash_password(password: str) -> str:
+    return pwd_context.hash(password)
+
+
+def _verify_and_update(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(password, hashed_password)
+
+
+# ============================================================
+# Pool de processus
+# ============================================================
+
+def get_password_executor() -> ProcessPoolExecutor:
+    """
+    Retourne le pool de processus dédié à bcrypt (créé à la première utilisation).
+    Le démarrage en "spawn" évite de dupliquer les threads du serveur dans les enfants.
+    """
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(
+            max_workers=PASSWORD_HASH_WORKERS,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _executor
+
+
+def shutdown_password_executor():
+    """Arrête le pool de processus. À appeler à l'arrêt de l'application."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _replace_broken_executor(broken: ProcessPoolExecutor):
+    """
+    Abandonne un pool dont un processus est mort (OOM, signal...) : il refuse
+    alors toute nouvelle tâche. Le suivant est créé à la prochaine utilisation.
+    Seul le premier appelant remplace le pool ; les autres réutilisent le nouveau.
+    """
+    global _executor
+    if _executor is broken:
+        _executor = None
+        broken.shutdown(wait=False, cancel_futures=True)
+        PASSWORD_HASHER_METRICS["pool_restarts"] += 1
+        print("⚠️ Pool de hachage des mots de passe cassé : il est recréé.")
+
+
+async def _run_in_pool(func, *args):
+    """
+    Exécute une opération bcrypt dans le pool, en limitant le nombre
+    d'opérations en attente : une rafale de connexions est refusée plutôt que
+    d'allonger indéfiniment la file.
+    """
+    global _pending
+    if _pending >= PASSWORD_HASH_MAX_QUEUE:
+        PASSWORD_HASHER_METRICS["rejected"] += 1
+        raise PasswordHasherBusy()
+
+    _pending += 1
+    PASSWORD_HASHER_METRICS["pending"] = _pending
+    PASSWORD_HASHER_METRICS["max_pending"] = max(PASSWORD_HASHER_METRICS["max_pending"], _pending)
+    started = time.perf_counter()
+    try:
+        loop = asyncio.get_running_loop()
+        executor = get_password_executor()
+        try:
+            return await loop.run_in_executor(executor, func, *args)
+        except BrokenProcessPool:
+            # Les opérations bcrypt sont sans effet de bord : une seule nouvelle tentative
+            _replace_broken_executor(executor)
+            return await loop.run_in_executor(get_password_executor(), func, *args)
+    except Exception:
+        PASSWORD_HASHER_METRICS["failures"] += 1
+        raise
+    finally:
+        _pending -= 1
+        duration_ms = int((time.perf_counter() - started) * 1000)
+        PASSWORD_HASHER_METRICS["pending"] = _pending
+        PASSWORD_HASHER_METRICS["total_duration_ms"] += duration_ms
+        PASSWORD_HASHER_METRICS["last_duration_ms"] = duration_ms
+
+
+async def hash_password(password: str) -> str:
+    """Hache un mot de passe avec le coût configuré (BCRYPT_ROUNDS)."""
+    hashed = await _run_in_pool(_hash_password, password)
+    PASSWORD_HASHER_METRICS["hashes"] += 1
+    return hashed
+
+
+async def verify_password(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Vérifie un mot de passe.
+
+    Returns:
+        (valide, nouveau_hash) : `nouveau_hash` est renseigné quand le hash
+        stocké n'utilise pas le coût configuré et doit être remplacé.
+    """
+    valid, new_hash = await _run_in_pool(_verify_and_update, password, hashed_password)
+    PASSWORD_HASHER_METRICS["verifications"] += 1
+    if new_hash:
+        PASSWORD_HASHER_METRICS["rehashes"] += 1
+    return valid, new_hash
@@ -5,6 +5,7 @@ from fastapi import APIRouter, Depends, HTTPException, status, Request, Query, H
 from fastapi.responses import HTMLResponse
 from sqlalchemy.orm import Session
 from datetime import datetime, timezone
+from decimal import Decimal
 
 from databaseone import get_db
 from models import models
@@ -129,7 +130,10 @@ async def payment_success(session_id: str = Query(...), db: Session = Depends(ge
                     # On vérifie si l'utilisateur n'a pas déjà un abonnement actif
                     # pour éviter les créations multiples si la page est rafraîchie.
                     if not user.abonnement_finish or user.abonnement_finish < datetime.now(timezone.utc):
-                        _create_subscription_logic(user=user, plan=plan, db=db)
+                        # Montant réellement encaissé par Stripe (en centimes), prix du plan à défaut
+                        amount_total = session.get('amount_total')
+                        amount_paid = Decimal(amount_total) / 100 if amount_total is not None else plan.price
+                        _create_subscription_logic(user=user, plan=plan, db=db, amount_paid=amount_paid)
                         db.commit()
         else:
 
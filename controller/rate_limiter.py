@@ -0,0 +1,188 @@
+import os
+import time
+import json
+import math
+import uuid
+import threading
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Optional, Tuple
+
+from fastapi import HTTPException, Request, status
+
+from .redis_client import get_async_redis
+
+
+# --- Configuration du limiteur de débit ---
+# "memory" (un compteur par processus) ou "redis" (partagé entre les workers)
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory").lower()
+RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+# Derrière un reverse proxy, l'IP du client est lue dans X-Forwarded-For
+RATE_LIMIT_TRUST_PROXY = os.getenv("RATE_LIMIT_TRUST_PROXY", "false").lower() == "true"
+# Nombre maximum de clés suivies en mémoire ; au-delà, les moins récemment utilisées sont oubliées
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+
+# Compteurs cumulés depuis le démarrage du processus
+RATE_LIMIT_METRICS = {
+    "backend": RATE_LIMIT_BACKEND,
+    "allowed": 0,
+    "limited": 0,
+    "backend_errors": 0,
+    "evicted_keys": 0,
+}
+
+
+def parse_limit(value: str) -> Tuple[int, int]:
+    """Convertit une limite "nombre/secondes" (ex: "5/60") en tuple."""
+    count, seconds = value.split("/")
+    return int(count), int(seconds)
+
+
+# ============================================================
+# Backends (fenêtre glissante)
+# ============================================================
+# Chaque appel à `hit` est atomique : si la clé a encore de la place dans la
+# fenêtre, la requête est comptée et 0 est retourné ; sinon rien n'est compté et
+# le délai avant qu'une place se libère est retourné (en secondes).
+
+class MemoryRateLimitBackend:
+    """
+    Journal des requêtes récentes par clé, en mémoire (un seul processus).
+    Les clés sont rangées de la moins à la plus récemment utilisée : une fois
+    RATE_LIMIT_MAX_KEYS atteint, chaque nouvelle clé n'en retire qu'une en tête
+    (coût constant, même si des valeurs aléatoires sont envoyées en rafale).
+    """
+
+    def __init__(self):
+        self._hits: "OrderedDict[str, Deque[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def hit(self, key: str, limit: int, window_seconds: int) -> float:
+        now = time.monotonic()
+        with self._lock:
+            hits = self._hits.get(key)
+            if hits is None:
+                while len(self._hits) >= RATE_LIMIT_MAX_KEYS:
+                    self._hits.popitem(last=False)
+                    RATE_LIMIT_METRICS["evicted_keys"] += 1
+                hits = self._hits[key] = deque()
+            else:
+                self._hits.move_to_end(key)
+            while hits and hits[0] <= now - window_seconds:
+                hits.popleft()
+            if len(hits) < limit:
+                hits.append(now)
+                return 0
+            return hits[0] + window_seconds - now
+
+
+# Script exécuté atomiquement par Redis : journal des requêtes dans un sorted set
+_SLIDING_WINDOW_LUA = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', key, 0, now - window)
+if redis.call('ZCARD', key) < limit then
+    redis.call('ZADD', key, now, ARGV[4])
+    redis.call('PEXPIRE', key, window)
+    return 0
+end
+local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+return tonumber(oldest[2]) + window - now
+"""
+
+
+class RedisRateLimitBackend:
+    """Journal des requêtes récentes dans Redis, partagé par tous les workers."""
+
+    def __init__(self):
+        self._script = None
+
+    async def hit(self, key: str, limit: int, window_seconds: int) -> float:
+        if self._script is None:
+            self._script = get_async_redis().register_script(_SLIDING_WINDOW_LUA)
+        now_ms = int(time.time() * 1000)
+        retry_after_ms = await self._script(
+            keys=[f"ratelimit:{key}"],
+            args=[now_ms, window_seconds * 1000, limit, f"{now_ms}-{uuid.uuid4().hex[:8]}"],
+        )
+        return int(retry_after_ms) / 1000
+
+
+_backend = None
+
+
+def get_rate_limit_backend():
+    """Retourne le backend configuré (créé à la première utilisation)."""
+    global _backend
+    if _backend is None:
+        _backend = RedisRateLimitBackend() if RATE_LIMIT_BACKEND == "redis" else MemoryRateLimitBackend()
+    return _backend
+
+
+# ============================================================
+# Dépendance FastAPI
+# ============================================================
+
+def client_ip(request: Request) -> str:
+    """Adresse IP du client (X-Forwarded-For uniquement derrière un proxy de confiance)."""
+    if RATE_LIMIT_TRUST_PROXY:
+        forwarded_for = request.headers.get("x-forwarded-for")
+        if forwarded_for:
+            return forwarded_for.split(",")[0].strip()
+    return request.client.host if request.client else "unknown"
+
+
+async def _email_from_body(request: Request) -> Optional[str]:
+    """Email du corps JSON de la requête (le corps est mis en cache par Starlette pour la route)."""
+    try:
+        body = json.loads(await request.body() or b"{}")
+    except ValueError:
+        return None
+    email = body.get("email") if isinstance(body, dict) else None
+    return email.strip().lower() if isinstance(email, str) and email.strip() else None
+
+
+class RateLimit:
+    """
+    Dépendance de limitation de débit par IP et par email (champ `email` du corps JSON).
+
+    Elle s'exécute avant le corps de la route : une requête refusée (429 avec
+    Retry-After) ne déclenche ni hachage ni accès à la base.
+
+    Exemple :
+        @router.post("/login", dependencies=[Depends(RateLimit("login", "20/60", "5/60"))])
+    """
+
+    def __init__(self, scope: str, per_ip: str, per_email: Optional[str] = None):
+        self.scope = scope
+        self.ip_limit = parse_limit(os.getenv(f"RATE_LIMIT_{scope.upper()}_IP", per_ip))
+        self.email_limit = parse_limit(os.getenv(f"RATE_LIMIT_{scope.upper()}_EMAIL", per_email)) if per_email else None
+
+    async def __call__(self, request: Request):
+        if not RATE_LIMIT_ENABLED:
+            return
+
+        checks = [(f"{self.scope}:ip:{client_ip(request)}", self.ip_limit)]
+        if self.email_limit:
+            email = await _email_from_body(request)
+            if email:
+                checks.append((f"{self.scope}:email:{email}", self.email_limit))
+
+        backend = get_rate_limit_backend()
+        for key, (limit, window_seconds) in checks:
+            try:
+                retry_after = await backend.hit(key, limit, window_seconds)
+            except Exception as e:
+                # Backend indisponible : on laisse passer plutôt que de bloquer l'authentification
+                RATE_LIMIT_METRICS["backend_errors"] += 1
+                print(f"⚠️ Limiteur de débit indisponible : {e}")
+                return
+            if retry_after > 0:
+                RATE_LIMIT_METRICS["limited"] += 1
+                raise HTTPException(
+                    status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+                    detail="Trop de tentatives, veuillez réessayer plus tard.",
+                    headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+                )
+        RATE_LIMIT_METRICS["allowed"] += 1
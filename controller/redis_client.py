@@ -0,0 +1,43 @@
+import os
+from typing import Optional
+
+
+# --- Connexion Redis (partagée par le limiteur de débit et le stockage éphémère) ---
+# Ex: redis://localhost:6379/0 ; toute implémentation du protocole Redis convient
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+
+_async_client = None
+_sync_client = None
+
+
+def get_async_redis():
+    """
+    Client Redis asynchrone, pour le code exécuté dans la boucle d'événements
+    (créé à la première utilisation).
+    Import local : le paquet `redis` n'est nécessaire que si un backend Redis est configuré.
+    """
+    global _async_client
+    if _async_client is None:
+        import redis.asyncio
+        _async_client = redis.asyncio.Redis.from_url(REDIS_URL, decode_responses=True)
+    return _async_client
+
+
+def get_sync_redis():
+    """Client Redis synchrone, pour le code exécuté dans le threadpool."""
+    global _sync_client
+    if _sync_client is None:
+        import redis
+        _sync_client = redis.Redis.from_url(REDIS_URL, decode_responses=True)
+    return _sync_client
+
+
+async def close_redis():
+    """Ferme les connexions Redis. À appeler à l'arrêt de l'application."""
+    global _async_client, _sync_client
+    if _async_client is not None:
+        await _async_client.aclose()
+        _async_client = None
+    if _sync_client is not None:
+        _sync_client.close()
+        _sync_client = None
@@ -1,10 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select, delete, literal, literal_column
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, selectinload
 from typing import List, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 from databaseone import get_db
-from models.models import User, Ticket, Reminder, ReminderChannel, NotificationChannel
+from models.models import User, Ticket, TicketStatus, Reminder, ReminderChannel, NotificationChannel
+from schemas.reminder_schema import ReminderResponse, ReminderListSerializer
+from schemas.serialization import json_list_response
 
 # --- Pydantic Schemas for Request/Response Validation ---
 
@@ -20,6 +25,14 @@ class ReminderUpdate(BaseModel):
     active: Optional[bool] = None
     channels: Optional[List[NotificationChannel]] = None
 
+class BulkReminderPolicy(BaseModel):
+    """Schema for applying one reminder policy to many tickets."""
+    user_email: str
+    ticket_ids: Optional[List[int]] = Field(None, max_length=5000)  # None = toutes les contraventions en cours
+    frequency_days: int = Field(7, ge=1)
+    active: bool = True
+    channels: List[NotificationChannel] = [NotificationChannel.email]
+
 
 # --- Router Definition ---
 
@@ -72,8 +85,8 @@ def create_user_reminder(reminder_data: ReminderCreate, db: Session = Depends(ge
         db.add(new_reminder)
         db.flush()  # Pour obtenir l'ID du nouveau rappel
 
-        # Ajouter les canaux de notification sélectionnés
-        for channel_name in reminder_data.channels:
+        # Ajouter les canaux de notification sélectionnés (dédoublonnés : un canal par rappel)
+        for channel_name in dict.fromkeys(reminder_data.channels):
             channel = ReminderChannel(
                 reminder_id=new_reminder.id,
                 channel=channel_name,  # Déjà un enum grâce à la validation Pydantic
@@ -85,12 +98,108 @@ def create_user_reminder(reminder_data: ReminderCreate, db: Session = Depends(ge
         db.refresh(new_reminder)
         
         return {"message": "Rappel créé avec succès", "reminder_id": new_reminder.id}
+    except IntegrityError:
+        # Rappel créé entre-temps pour ce ticket par une requête concurrente
+        db.rollback()
+        raise HTTPException(
+            status_code=409,
+            detail="Un rappel existe déjà pour cette contravention. Vous ne pouvez créer qu'un seul rappel par ticket."
+        )
     except Exception as e:
         db.rollback()
         raise HTTPException(status_code=500, detail=f"Impossible de créer le rappel : {e}")
 
 
-@router.get("/{email}")
+@router.post("/bulk", status_code=200)
+def apply_bulk_reminder_policy(policy: BulkReminderPolicy, db: Session = Depends(get_db)):
+    """
+    Applique une même configuration de rappel (fréquence, canaux) à une liste de
+    contraventions, ou à toutes les contraventions en cours de l'utilisateur si
+    `ticket_ids` est omis.
+
+    Les rappels existants sont mis à jour, les autres sont créés. Le tout se fait
+    en quelques requêtes ensemblistes (INSERT ... ON CONFLICT), quel que soit le
+    nombre de contraventions.
+    """
+    if policy.ticket_ids is not None and not policy.ticket_ids:
+        raise HTTPException(status_code=400, detail="La liste 'ticket_ids' ne peut pas être vide.")
+    if not policy.channels:
+        raise HTTPException(status_code=400, detail="Au moins un canal de notification est requis.")
+
+    user = get_user_by_email(policy.user_email, db)
+    channels = list(dict.fromkeys(policy.channels))  # Dédoublonnage en gardant l'ordre
+
+    # Contraventions ciblées, toujours restreintes à celles de l'utilisateur
+    target_tickets = select(
+        Ticket.id,
+        literal(policy.frequency_days),
+        literal(policy.active),
+    ).where(Ticket.user_id == user.id)
+    if policy.ticket_ids is not None:
+        target_tickets = target_tickets.where(Ticket.id.in_(policy.ticket_ids))
+    else:
+        target_tickets = target_tickets.where(Ticket.status == TicketStatus.en_cours)
+
+    try:
+        # 1. Créer ou mettre à jour les rappels en une seule requête
+        upsert_reminders = pg_insert(Reminder).from_select(
+            ["ticket_id", "frequency_days", "active"], target_tickets
+        )
+        upsert_reminders = upsert_reminders.on_conflict_do_update(
+            index_elements=[Reminder.ticket_id],
+            set_={
+                "frequency_days": upsert_reminders.excluded.frequency_days,
+                "active": upsert_reminders.excluded.active,
+            },
+        ).returning(
+            Reminder.id,
+            Reminder.ticket_id,
+            literal_column("(xmax = 0)").label("inserted"),  # Vrai si la ligne vient d'être créée
+        )
+        applied = db.execute(upsert_reminders).all()
+        reminder_ids = [row.id for row in applied]
+
+        if reminder_ids:
+            # 2. Retirer les canaux qui ne font plus partie de la politique
+            db.execute(
+                delete(ReminderChannel)
+                .where(
+                    ReminderChannel.reminder_id.in_(reminder_ids),
+                    ReminderChannel.channel.notin_(channels),
+                )
+                .execution_options(synchronize_session=False)
+            )
+
+            # 3. Ajouter (ou réactiver) les canaux demandés
+            upsert_channels = pg_insert(ReminderChannel).values([
+                {"reminder_id": reminder_id, "channel": channel, "enabled": True}
+                for reminder_id in reminder_ids
+                for channel in channels
+            ])
+            db.execute(upsert_channels.on_conflict_do_update(
+                index_elements=[ReminderChannel.reminder_id, ReminderChannel.channel],
+                set_={"enabled": True},
+            ))
+
+        db.commit()
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Impossible d'appliquer la configuration de rappel : {e}")
+
+    applied_ticket_ids = {row.ticket_id for row in applied}
+    skipped_ticket_ids = [t for t in (policy.ticket_ids or []) if t not in applied_ticket_ids]
+    created = sum(1 for row in applied if row.inserted)
+
+    return {
+        "message": "Configuration de rappel appliquée avec succès",
+        "created": created,
+        "updated": len(applied) - created,
+        "reminders": [{"reminder_id": row.id, "ticket_id": row.ticket_id} for row in applied],
+        "skipped_ticket_ids": skipped_ticket_ids,
+    }
+
+
+@router.get("/{email}", response_model=List[ReminderResponse])
 def get_all_reminders_for_user(email: str, db: Session = Depends(get_db)):
     """
     Récupère toutes les configurations de rappel pour toutes les contraventions
@@ -98,18 +207,17 @@ def get_all_reminders_for_user(email: str, db: Session = Depends(get_db)):
     """
     user = get_user_by_email(email, db)
     
-    # Jointure pour trouver les rappels via les contraventions de l'utilisateur
-    reminders = db.query(Reminder).join(Ticket).filter(Ticket.user_id == user.id).all()
-    
-    return [
-        {
-            "id": r.id,
-            "frequency_days": r.frequency_days,
-            "ticket_id": r.ticket_id,
-            "active": r.active,
-            "channels": [{"channel": c.channel.value, "enabled": c.enabled} for c in r.notification_channels]
-        } for r in reminders
-    ]
+    # Jointure pour trouver les rappels via les contraventions de l'utilisateur.
+    # Les canaux sont chargés en une seule requête supplémentaire (pas de N+1).
+    reminders = (
+        db.query(Reminder)
+        .join(Ticket)
+        .filter(Ticket.user_id == user.id)
+        .options(selectinload(Reminder.notification_channels))
+        .all()
+    )
+
+    return json_list_response(ReminderListSerializer, reminders)
 
 @router.put("/{reminder_id}")
 def update_reminder(reminder_id: int, reminder_data: ReminderUpdate, db: Session = Depends(get_db)):
@@ -130,8 +238,8 @@ def update_reminder(reminder_id: int, reminder_data: ReminderUpdate, db: Session
         if reminder_data.channels is not None:
             # Supprimer les anciens canaux
             db.query(ReminderChannel).filter(ReminderChannel.reminder_id == reminder_id).delete()
-            # Ajouter les nouveaux
-            for channel_name in reminder_data.channels:
+            # Ajouter les nouveaux (dédoublonnés : un canal par rappel)
+            for channel_name in dict.fromkeys(reminder_data.channels):
                 new_channel = ReminderChannel(
                     reminder_id=reminder_id,
                     channel=channel_name,
@@ -0,0 +1,70 @@
+import os
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional
+
+
+# --- Configuration de l'accès à Firebase Realtime Database ---
+# Nombre de threads dédiés aux appels RTDB. Le client HTTP de firebase_admin
+# (session requests partagée, connexions keep-alive) garde au plus 10
+# connexions par hôte : au-delà, les connexions supplémentaires ne sont pas réutilisées.
+RTDB_MAX_WORKERS = int(os.getenv("RTDB_MAX_WORKERS", "10"))
+
+_executor: Optional[ThreadPoolExecutor] = None
+
+# Compteurs cumulés depuis le démarrage du processus
+RTDB_METRICS = {
+    "workers": RTDB_MAX_WORKERS,
+    "calls": 0,
+    "errors": 0,
+    "in_flight": 0,
+    "max_in_flight": 0,
+    "total_duration_ms": 0,
+    "last_duration_ms": None,
+}
+
+
+def get_rtdb_executor() -> ThreadPoolExecutor:
+    """Retourne le pool de threads dédié aux appels RTDB (créé à la première utilisation)."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=RTDB_MAX_WORKERS, thread_name_prefix="rtdb")
+    return _executor
+
+
+def shutdown_rtdb_executor():
+    """Arrête le pool de threads RTDB (appelé à l'arrêt de l'application)."""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+async def run_rtdb(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Exécute un appel bloquant au client firebase_admin (ou une fonction qui en
+    enchaîne plusieurs) dans le pool RTDB, sans bloquer la boucle d'événements.
+
+    Le pool est distinct du threadpool de Starlette : une lenteur de Firebase
+    n'occupe pas les threads des routes synchrones (base de données, etc.).
+
+    Exemple :
+        session = await run_rtdb(get_chat_session_ref(email).get)
+    """
+    loop = asyncio.get_running_loop()
+    RTDB_METRICS["in_flight"] += 1
+    RTDB_METRICS["max_in_flight"] = max(RTDB_METRICS["max_in_flight"], RTDB_METRICS["in_flight"])
+    started = time.perf_counter()
+    try:
+        return await loop.run_in_executor(get_rtdb_executor(), partial(func, *args, **kwargs))
+    except Exception:
+        RTDB_METRICS["errors"] += 1
+        raise
+    finally:
+        duration_ms = int((time.perf_counter() - started) * 1000)
+        RTDB_METRICS["in_flight"] -= 1
+        RTDB_METRICS["calls"] += 1
+        RTDB_METRICS["total_duration_ms"] += duration_ms
+        RTDB_METRICS["last_duration_ms"] = duration_ms
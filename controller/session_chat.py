@@ -1,17 +1,51 @@
 import os
 import json
+import asyncio
+import secrets
+import threading
 from datetime import datetime
 from typing import Optional, List, Dict, Any
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, BackgroundTasks, HTTPException, Depends, Query, WebSocket, WebSocketDisconnect
 from pydantic import BaseModel, EmailStr
 from firebase_admin import credentials, db
 import firebase_admin
 from dotenv import load_dotenv
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from databaseone import SessionLocal, get_db
+from models.models import ChatSessionArchive, ChatArchivedMessage
+from .rtdb_client import run_rtdb
+from .chat_archiver import archive_chat_session
+from .chat_search import (
+    index_chat_message,
+    search_chat_messages,
+    CHAT_SEARCH_PAGE_SIZE,
+    CHAT_SEARCH_MAX_PAGE_SIZE,
+    CHAT_SEARCH_MAX_OFFSET,
+)
+from . import chat_hub
 
 load_dotenv()
 
+# --- Configuration de la pagination des messages ---
+CHAT_MESSAGES_PAGE_SIZE = int(os.getenv("CHAT_MESSAGES_PAGE_SIZE", "50"))
+CHAT_MESSAGES_MAX_PAGE_SIZE = int(os.getenv("CHAT_MESSAGES_MAX_PAGE_SIZE", "200"))
+# --- Configuration de la pagination des sessions (liste admin) ---
+CHAT_SESSIONS_PAGE_SIZE = int(os.getenv("CHAT_SESSIONS_PAGE_SIZE", "50"))
+CHAT_SESSIONS_MAX_PAGE_SIZE = int(os.getenv("CHAT_SESSIONS_MAX_PAGE_SIZE", "200"))
+# --- Configuration du flux temps réel (WebSocket) ---
+# Intervalle des pings envoyés au client (maintient la connexion derrière les proxys)
+CHAT_WS_HEARTBEAT_SECONDS = float(os.getenv("CHAT_WS_HEARTBEAT_SECONDS", "25"))
+# Messages manqués relus par requête lors d'une reprise (`after`)
+CHAT_WS_RESUME_PAGE_SIZE = int(os.getenv("CHAT_WS_RESUME_PAGE_SIZE", "200"))
+
 router = APIRouter(prefix="/chat", tags=["Chat Sessions"])
 
+# Le client firebase_admin est synchrone : dans les routes (async), chaque
+# appel RTDB passe par `run_rtdb` (pool de threads dédié) pour ne jamais
+# bloquer la boucle d'événements.
+
 # ============================================================
 # MODELS PYDANTIC
 # ============================================================
@@ -22,6 +56,15 @@ class ChatMessage(BaseModel):
     sender_email: str
     content: str
     timestamp: str
+    message_id: Optional[str] = None
+
+
+class ChatMessagePage(BaseModel):
+    """Page de messages, du plus ancien au plus récent."""
+    messages: List[ChatMessage]
+    # Curseur à passer en `before` pour charger les messages plus anciens
+    next_cursor: Optional[str] = None
+    has_more: bool = False
 
 
 class InitiateChatSession(BaseModel):
@@ -48,6 +91,57 @@ class ChatSessionInfo(BaseModel):
     status: str  # 'active', 'closed'
     admin_name: Optional[str] = None
     message_count: int = 0
+    unread_by_admin: int = 0  # Messages de l'utilisateur pas encore lus par l'admin
+    unread_by_user: int = 0  # Messages de l'admin pas encore lus par l'utilisateur
+
+
+class ChatArchiveInfo(BaseModel):
+    """Session de chat archivée (sortie de Firebase après sa fermeture)."""
+    archive_id: int
+    user_email: str
+    user_name: Optional[str] = None
+    subject: Optional[str] = None
+    admin_name: Optional[str] = None
+    started_at: Optional[datetime] = None
+    closed_at: Optional[datetime] = None
+    archived_at: datetime
+    message_count: int = 0
+
+
+class ChatArchiveTranscript(ChatMessagePage):
+    """Page de messages d'une session archivée."""
+    archive: ChatArchiveInfo
+
+
+class ChatSearchHit(BaseModel):
+    """Message trouvé par la recherche plein texte."""
+    user_email: str
+    message_id: str
+    sender: str
+    content: str
+    # Extrait autour des termes trouvés (entourés de <b></b>)
+    snippet: str
+    timestamp: str
+    # Session archivée : transcription via GET /chat/archives/{email}/{archive_id} ;
+    # None : session en cours, via GET /chat/messages/{email}
+    archive_id: Optional[int] = None
+    score: float
+
+
+class ChatSearchPage(BaseModel):
+    """Page de résultats, les plus pertinents en premier."""
+    hits: List[ChatSearchHit]
+    # Valeur à passer en `offset` pour la page suivante
+    next_offset: Optional[int] = None
+    has_more: bool = False
+
+
+class ChatSessionPage(BaseModel):
+    """Page de sessions, de la plus récemment mise à jour à la plus ancienne."""
+    sessions: List[ChatSessionInfo]
+    # Curseur à passer en `before` pour charger la page suivante
+    next_cursor: Optional[str] = None
+    has_more: bool = False
 
 
 # ============================================================
@@ -125,6 +219,160 @@ def get_messages_ref(user_email: str):
     return db.reference(f"chat_sessions/{sanitized_email}/messages")
 
 
+# Alphabet des push IDs Firebase (ordre ASCII croissant)
+_PUSH_CHARS = "-0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ_abcdefghijklmnopqrstuvwxyz"
+_last_message_ms = 0
+_last_message_suffix: List[int] = []
+_message_id_lock = threading.Lock()
+
+
+def chat_message_from_data(message_id: str, message_data: Dict[str, Any]) -> ChatMessage:
+    return ChatMessage(
+        sender=message_data.get("sender", ""),
+        sender_email=message_data.get("sender_email", ""),
+        content=message_data.get("content", ""),
+        timestamp=message_data.get("timestamp", ""),
+        message_id=message_id,
+    )
+
+
+def message_event(message_id: str, message_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Événement "message" du flux temps réel ; `cursor` sert à la reprise."""
+    return {
+        "type": "message",
+        "cursor": message_id,
+        "message": chat_message_from_data(message_id, message_data).model_dump(),
+    }
+
+
+def generate_message_id() -> str:
+    """
+    Génère localement (sans aller-retour Firebase) un identifiant de message
+    unique et croissant dans le temps : `msg_<millisecondes>_<12 caractères>`.
+
+    Le suffixe suit l'algorithme des push IDs Firebase : aléatoire, puis
+    incrémenté pour les identifiants générés dans la même milliseconde (deux
+    messages simultanés ne s'écrasent plus et restent ordonnés). Le préfixe
+    `msg_<millisecondes>` garde l'ordre des clés cohérent avec les anciens
+    messages, dont dépend la pagination.
+    """
+    global _last_message_ms, _last_message_suffix
+    now_ms = int(datetime.now().timestamp() * 1000)
+    with _message_id_lock:
+        if now_ms == _last_message_ms:
+            for i in range(len(_last_message_suffix) - 1, -1, -1):
+                if _last_message_suffix[i] < 63:
+                    _last_message_suffix[i] += 1
+                    break
+                _last_message_suffix[i] = 0
+        else:
+            _last_message_ms = now_ms
+            _last_message_suffix = [secrets.randbelow(64) for _ in range(12)]
+        suffix = "".join(_PUSH_CHARS[i] for i in _last_message_suffix)
+    return f"msg_{now_ms}_{suffix}"
+
+
+# ------------------------------------------------------------
+# Index des sessions
+# ------------------------------------------------------------
+# `chat_session_index/{email}` contient uniquement le résumé de chaque session
+# (sans les messages) : la liste admin et les infos de session ne téléchargent
+# plus les conversations. Il est mis à jour à chaque création, message et
+# fermeture. Règle Firebase requise pour les requêtes triées (liste admin,
+# sélection des sessions à archiver) :
+#   "chat_session_index": { ".indexOn": ["updated_at", "closed_at"] }
+
+def get_session_index_ref(user_email: Optional[str] = None):
+    """Retourne la référence à l'index des sessions (ou à l'entrée d'un utilisateur)."""
+    if user_email is None:
+        return db.reference("chat_session_index")
+    return db.reference(f"chat_session_index/{sanitize_email(user_email)}")
+
+
+def build_session_index_entry(user_email: str, session: Dict[str, Any]) -> Dict[str, Any]:
+    """Résumé d'une session à partir de son nœud complet (sessions créées avant l'index)."""
+    user_info = session.get("user_info") or {}
+    return {
+        "user_email": user_info.get("email") or user_email,
+        "user_name": user_info.get("name"),
+        "subject": session.get("subject", "Support"),
+        "status": session.get("status", "active"),
+        "created_at": user_info.get("created_at", ""),
+        "updated_at": session.get("updated_at", ""),
+        # Date de fermeture : sélection des sessions à archiver (chat_archiver)
+        "closed_at": session.get("closed_at") or (session.get("updated_at") if session.get("status") == "closed" else None),
+        "admin_name": session.get("admin_name"),
+        "message_count": len(session.get("messages") or {}),
+        "unread_by_admin": 0,
+        "unread_by_user": 0,
+    }
+
+
+def get_session_summary(user_email: str) -> Optional[Dict[str, Any]]:
+    """
+    Retourne le résumé d'une session depuis l'index. Une session créée avant
+    l'index est lue une fois en entier puis indexée.
+    """
+    index_ref = get_session_index_ref(user_email)
+    entry = index_ref.get()
+    if entry:
+        return entry
+
+    session = get_chat_session_ref(user_email).get()
+    if not session:
+        return None
+    entry = build_session_index_entry(user_email, session)
+    index_ref.set(entry)
+    return entry
+
+
+def session_info_from_summary(user_email: str, entry: Dict[str, Any]) -> ChatSessionInfo:
+    return ChatSessionInfo(
+        user_email=entry.get("user_email") or user_email,
+        user_name=entry.get("user_name"),
+        subject=entry.get("subject", "Support"),
+        created_at=entry.get("created_at", ""),
+        updated_at=entry.get("updated_at", ""),
+        status=entry.get("status", "active"),
+        admin_name=entry.get("admin_name"),
+        message_count=entry.get("message_count", 0),
+        unread_by_admin=entry.get("unread_by_admin", 0),
+        unread_by_user=entry.get("unread_by_user", 0),
+    )
+
+
+def _archive_closed_session(session_key: str):
+    sql_session = SessionLocal()
+    try:
+        archive_chat_session(sql_session, session_key)
+    finally:
+        sql_session.close()
+
+
+def rebuild_chat_session_index() -> Dict[str, int]:
+    """
+    Reconstruit entièrement `chat_session_index` à partir de `chat_sessions`.
+    Lit tout l'arbre des conversations : à n'utiliser que ponctuellement
+    (mise en place de l'index, correction manuelle). Les compteurs de messages
+    non lus sont conservés.
+    """
+    sessions_data = db.reference("chat_sessions").get() or {}
+    current_index = get_session_index_ref().get() or {}
+
+    new_index = {}
+    for sanitized_email, session_data in sessions_data.items():
+        user_email = sanitized_email.replace("_at_", "@").replace("_", ".")
+        entry = build_session_index_entry(user_email, session_data)
+        previous = current_index.get(sanitized_email) or {}
+        entry["unread_by_admin"] = previous.get("unread_by_admin", 0)
+        entry["unread_by_user"] = previous.get("unread_by_user", 0)
+        new_index[sanitized_email] = entry
+
+    get_session_index_ref().set(new_index)
+    print(f"✅ Index des sessions de chat reconstruit : {len(new_index)} sessions")
+    return {"sessions": len(new_index)}
+
+
 # ============================================================
 # ENDPOINTS
 # ============================================================
@@ -157,26 +405,26 @@ async def initiate_chat_session(session_data: InitiateChatSession):
         user_email = session_data.user_email
         sanitized_email = sanitize_email(user_email)
         
-        # Vérifier si une session existe déjà
-        session_ref = get_chat_session_ref(user_email)
-        existing_session = session_ref.get()
+        # Vérifier si une session existe déjà (résumé seulement, sans les messages)
+        existing_session = await run_rtdb(get_session_summary, user_email)
         
         if existing_session and existing_session.get("status") == "active":
             # Mettre à jour le timestamp
-            session_ref.update({
-                "updated_at": datetime.now().isoformat(),
+            current_time = datetime.now().isoformat()
+            await run_rtdb(db.reference().update, {
+                f"chat_sessions/{sanitized_email}/updated_at": current_time,
+                f"chat_session_index/{sanitized_email}/updated_at": current_time,
             })
+            existing_session["updated_at"] = current_time
             
-            return ChatSessionInfo(
-                user_email=user_email,
-                user_name=existing_session.get("user_info", {}).get("name"),
-                subject=existing_session.get("subject", "Support"),
-                created_at=existing_session.get("user_info", {}).get("created_at", ""),
-                updated_at=datetime.now().isoformat(),
-                status="active",
-                admin_name=existing_session.get("admin_name"),
-                message_count=len(existing_session.get("messages", {})) if existing_session.get("messages") else 0
-            )
+            return session_info_from_summary(user_email, existing_session)
+        
+        if existing_session:
+            # Session fermée : archivée avant d'être remplacée par la nouvelle
+            try:
+                await run_in_threadpool(_archive_closed_session, sanitized_email)
+            except Exception as e:
+                print(f"⚠️ Archivage de l'ancienne session impossible pour {user_email} : {e}")
         
         # Créer une nouvelle session
         current_time = datetime.now().isoformat()
@@ -194,7 +442,11 @@ async def initiate_chat_session(session_data: InitiateChatSession):
             "messages": {}
         }
         
-        session_ref.set(new_session)
+        # Session et entrée d'index écrites ensemble
+        await run_rtdb(db.reference().update, {
+            f"chat_sessions/{sanitized_email}": new_session,
+            f"chat_session_index/{sanitized_email}": build_session_index_entry(user_email, new_session),
+        })
         
         print(f"✅ Session de chat créée pour : {user_email}")
         
@@ -218,24 +470,33 @@ async def initiate_chat_session(session_data: InitiateChatSession):
 
 
 @router.post("/messages/send")
-async def send_message(message_data: SendMessage):
+async def send_message(message_data: SendMessage, background_tasks: BackgroundTasks):
     """
     Envoie un message dans une session de chat.
+
+    Seul le statut de la session est lu ; le message, les dates de mise à jour
+    et les compteurs de l'index sont écrits en une seule mise à jour
+    multi-chemins (atomique côté Firebase, un seul aller-retour). Le message
+    est ajouté à l'index de recherche après l'envoi de la réponse.
     """
     try:
         user_email = message_data.user_email
+        sanitized_email = sanitize_email(user_email)
         
-        # Vérifier que la session existe
-        session_ref = get_chat_session_ref(user_email)
-        session = session_ref.get()
+        # Vérifier que la session existe (lecture du seul champ `status`)
+        session_status = await run_rtdb(get_session_index_ref(user_email).child("status").get)
+        if session_status is None:
+            # Session absente de l'index (créée avant l'index) ou inexistante
+            session = await run_rtdb(get_session_summary, user_email)
+            session_status = session.get("status", "active") if session else None
         
-        if not session:
+        if session_status is None:
             raise HTTPException(
                 status_code=404,
                 detail="Session de chat non trouvée. Veuillez d'abord initier une session."
             )
         
-        if session.get("status") != "active":
+        if session_status != "active":
             raise HTTPException(
                 status_code=403,
                 detail="Cette session de chat est fermée."
@@ -243,7 +504,7 @@ async def send_message(message_data: SendMessage):
         
         # Créer le nouveau message
         current_time = datetime.now().isoformat()
-        message_id = f"msg_{int(datetime.now().timestamp() * 1000)}"
+        message_id = generate_message_id()
         
         new_message = {
             "sender": message_data.sender,  # 'user' ou 'admin'
@@ -252,15 +513,22 @@ async def send_message(message_data: SendMessage):
             "timestamp": current_time
         }
         
-        # Ajouter le message à la session
-        messages_ref = get_messages_ref(user_email)
-        messages_ref.child(message_id).set(new_message)
-        
-        # Mettre à jour le timestamp de la session
-        session_ref.update({
-            "updated_at": current_time,
+        # Message, timestamps et compteurs en une seule écriture ; les compteurs
+        # sont incrémentés par le serveur (`.sv`), sans lecture préalable
+        unread_field = "unread_by_user" if message_data.sender == "admin" else "unread_by_admin"
+        increment = {".sv": {"increment": 1}}
+        await run_rtdb(db.reference().update, {
+            f"chat_sessions/{sanitized_email}/messages/{message_id}": new_message,
+            f"chat_sessions/{sanitized_email}/updated_at": current_time,
+            f"chat_session_index/{sanitized_email}/updated_at": current_time,
+            f"chat_session_index/{sanitized_email}/message_count": increment,
+            f"chat_session_index/{sanitized_email}/{unread_field}": increment,
         })
         
+        # Diffusion aux clients connectés au flux temps réel
+        await chat_hub.publish(sanitized_email, message_event(message_id, new_message))
+        background_tasks.add_task(index_chat_message, user_email, sanitized_email, message_id, new_message)
+        
         print(f"✅ Message envoyé pour : {user_email}")
         
         return {
@@ -285,8 +553,7 @@ async def get_chat_session(user_email: str):
     Récupère les informations d'une session de chat.
     """
     try:
-        session_ref = get_chat_session_ref(user_email)
-        session = session_ref.get()
+        session = await run_rtdb(get_session_summary, user_email)
         
         if not session:
             raise HTTPException(
@@ -294,18 +561,7 @@ async def get_chat_session(user_email: str):
                 detail="Session de chat non trouvée."
             )
         
-        message_count = len(session.get("messages", {})) if session.get("messages") else 0
-        
-        return ChatSessionInfo(
-            user_email=user_email,
-            user_name=session.get("user_info", {}).get("name"),
-            subject=session.get("subject", "Support"),
-            created_at=session.get("user_info", {}).get("created_at", ""),
-            updated_at=session.get("updated_at", ""),
-            status=session.get("status", "active"),
-            admin_name=session.get("admin_name"),
-            message_count=message_count
-        )
+        return session_info_from_summary(user_email, session)
         
     except HTTPException as e:
         raise e
@@ -317,31 +573,42 @@ async def get_chat_session(user_email: str):
         )
 
 
-@router.get("/messages/{user_email}", response_model=List[ChatMessage])
-async def get_chat_messages(user_email: str):
+@router.get("/messages/{user_email}", response_model=ChatMessagePage)
+async def get_chat_messages(
+    user_email: str,
+    limit: int = Query(CHAT_MESSAGES_PAGE_SIZE, ge=1, le=CHAT_MESSAGES_MAX_PAGE_SIZE),
+    before: Optional[str] = Query(None, description="Curseur `next_cursor` de la page précédente"),
+):
     """
-    Récupère tous les messages d'une session de chat.
+    Récupère une page de messages d'une session de chat.
+
+    Sans curseur, retourne les `limit` messages les plus récents. Pour remonter
+    l'historique, passer le `next_cursor` reçu en paramètre `before`.
+    Les identifiants de messages sont croissants dans le temps : la requête
+    Firebase est triée par clé (`order_by_key`) et seule la page demandée est
+    téléchargée.
     """
     try:
-        messages_ref = get_messages_ref(user_email)
-        messages_data = messages_ref.get()
-        
-        if not messages_data:
-            return []
-        
-        messages = []
-        for message_id, message_data in messages_data.items():
-            messages.append(ChatMessage(
-                sender=message_data.get("sender", ""),
-                sender_email=message_data.get("sender_email", ""),
-                content=message_data.get("content", ""),
-                timestamp=message_data.get("timestamp", "")
-            ))
-        
-        # Trier par timestamp
-        messages.sort(key=lambda m: m.timestamp)
-        
-        return messages
+        query = get_messages_ref(user_email).order_by_key()
+        if before:
+            # end_at est inclusif : le message du curseur est retiré ci-dessous
+            query = query.end_at(before).limit_to_last(limit + 2)
+        else:
+            query = query.limit_to_last(limit + 1)
+        messages_data = await run_rtdb(query.get) or {}
+
+        # Résultat trié par clé (ordre chronologique)
+        message_ids = [message_id for message_id in messages_data if message_id != before]
+        has_more = len(message_ids) > limit
+        page_ids = message_ids[-limit:]
+
+        messages = [chat_message_from_data(message_id, messages_data[message_id]) for message_id in page_ids]
+
+        return ChatMessagePage(
+            messages=messages,
+            next_cursor=page_ids[0] if has_more else None,
+            has_more=has_more,
+        )
         
     except Exception as e:
         print(f"❌ Erreur lors de la récupération des messages : {e}")
@@ -351,14 +618,105 @@ async def get_chat_messages(user_email: str):
         )
 
 
+async def _wait_for_disconnect(websocket: WebSocket):
+    """Lit (et ignore) ce que le client envoie, jusqu'à sa déconnexion."""
+    while True:
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            return
+
+
+@router.websocket("/ws/{user_email}")
+async def chat_websocket(websocket: WebSocket, user_email: str, after: Optional[str] = None):
+    """
+    Flux temps réel d'une session de chat : remplace l'interrogation
+    périodique de GET /chat/messages.
+
+    Événements JSON envoyés :
+    - {"type": "message", "cursor": "<message_id>", "message": {...}}
+    - {"type": "session_closed"} puis fermeture de la connexion
+    - {"type": "ping"} toutes les CHAT_WS_HEARTBEAT_SECONDS (ce que le client
+      envoie est ignoré)
+
+    Reprise : après une coupure, se reconnecter avec `?after=<dernier cursor>`
+    pour recevoir d'abord les messages manqués, puis le flux en direct. Une
+    connexion trop lente pour suivre est fermée (code 1013) : se reconnecter
+    de la même façon.
+    """
+    await websocket.accept()
+    session_key = sanitize_email(user_email)
+    # Abonnement avant la relecture des messages manqués : rien n'est perdu entre les deux
+    subscription = chat_hub.subscribe(session_key)
+    disconnected = None
+    try:
+        session = await run_rtdb(get_session_summary, user_email)
+        if not session:
+            await websocket.close(code=4404, reason="Session de chat non trouvée.")
+            return
+
+        # Messages envoyés pendant la reprise : le flux en direct peut les republier.
+        # Seuls ceux-là sont filtrés ensuite ; un message en direct plus ancien
+        # que le dernier curseur (publications concurrentes, horloges des
+        # workers) doit quand même être transmis.
+        replayed_ids = set()
+        resume_cursor = after
+        while resume_cursor:
+            # start_at est inclusif : le message du curseur est ignoré
+            query = get_messages_ref(user_email).order_by_key().start_at(resume_cursor).limit_to_first(CHAT_WS_RESUME_PAGE_SIZE + 1)
+            missed = await run_rtdb(query.get) or {}
+            missed_ids = [message_id for message_id in missed if message_id > resume_cursor]
+            for message_id in missed_ids:
+                await websocket.send_json(message_event(message_id, missed[message_id]))
+                replayed_ids.add(message_id)
+                resume_cursor = message_id
+            if len(missed_ids) < CHAT_WS_RESUME_PAGE_SIZE:
+                break
+
+        disconnected = asyncio.create_task(_wait_for_disconnect(websocket))
+        while True:
+            if subscription.overflowed:
+                await websocket.close(code=1013, reason="Connexion trop lente, reprendre avec `after`.")
+                return
+
+            next_event = asyncio.ensure_future(subscription.queue.get())
+            done, _ = await asyncio.wait(
+                {next_event, disconnected},
+                timeout=CHAT_WS_HEARTBEAT_SECONDS,
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if next_event not in done:
+                next_event.cancel()
+                if disconnected in done:
+                    return
+                await websocket.send_json({"type": "ping"})
+                continue
+
+            event = next_event.result()
+            if event["type"] == "message" and event["cursor"] in replayed_ids:
+                # Déjà envoyé pendant la reprise
+                replayed_ids.discard(event["cursor"])
+                continue
+            await websocket.send_json(event)
+            if event["type"] == "session_closed":
+                await websocket.close()
+                return
+
+    except WebSocketDisconnect:
+        pass
+    finally:
+        chat_hub.unsubscribe(subscription)
+        if disconnected is not None:
+            disconnected.cancel()
+
+
 @router.put("/sessions/{user_email}/close")
 async def close_chat_session(user_email: str):
     """
     Ferme une session de chat.
     """
     try:
-        session_ref = get_chat_session_ref(user_email)
-        session = session_ref.get()
+        sanitized_email = sanitize_email(user_email)
+        session = await run_rtdb(get_session_summary, user_email)
         
         if not session:
             raise HTTPException(
@@ -366,11 +724,17 @@ async def close_chat_session(user_email: str):
                 detail="Session de chat non trouvée."
             )
         
-        # Mettre à jour le statut
-        session_ref.update({
-            "status": "closed",
-            "updated_at": datetime.now().isoformat(),
+        # Mettre à jour le statut (session et index en une seule écriture)
+        current_time = datetime.now().isoformat()
+        await run_rtdb(db.reference().update, {
+            f"chat_sessions/{sanitized_email}/status": "closed",
+            f"chat_sessions/{sanitized_email}/updated_at": current_time,
+            f"chat_sessions/{sanitized_email}/closed_at": current_time,
+            f"chat_session_index/{sanitized_email}/status": "closed",
+            f"chat_session_index/{sanitized_email}/updated_at": current_time,
+            f"chat_session_index/{sanitized_email}/closed_at": current_time,
         })
+        await chat_hub.publish(sanitized_email, {"type": "session_closed"})
         
         print(f"✅ Session de chat fermée pour : {user_email}")
         
@@ -390,42 +754,219 @@ async def close_chat_session(user_email: str):
         )
 
 
-@router.get("/sessions")
-async def list_all_chat_sessions():
+@router.put("/sessions/{user_email}/read")
+async def mark_chat_session_read(user_email: str, reader: str = Query(..., pattern="^(admin|user)$")):
     """
-    Récupère toutes les sessions de chat (pour l'admin).
+    Remet à zéro le compteur de messages non lus de `reader` ('admin' ou 'user').
     """
     try:
-        sessions_ref = db.reference("chat_sessions")
-        sessions_data = sessions_ref.get()
-        
-        if not sessions_data:
-            return []
+        if not await run_rtdb(get_session_summary, user_email):
+            raise HTTPException(
+                status_code=404,
+                detail="Session de chat non trouvée."
+            )
         
-        sessions_list = []
-        for sanitized_email, session_data in sessions_data.items():
-            user_email = sanitized_email.replace("_at_", "@").replace("_", ".")
-            message_count = len(session_data.get("messages", {})) if session_data.get("messages") else 0
-            
-            sessions_list.append({
-                "user_email": user_email,
-                "user_name": session_data.get("user_info", {}).get("name"),
-                "subject": session_data.get("subject", "Support"),
-                "status": session_data.get("status", "active"),
-                "created_at": session_data.get("user_info", {}).get("created_at", ""),
-                "updated_at": session_data.get("updated_at", ""),
-                "message_count": message_count,
-                "admin_name": session_data.get("admin_name")
-            })
+        await run_rtdb(get_session_index_ref(user_email).update, {f"unread_by_{reader}": 0})
         
-        # Trier par updated_at (les plus récentes en premier)
-        sessions_list.sort(key=lambda s: s["updated_at"], reverse=True)
+        return {"status": "success", "user_email": user_email, "reader": reader}
         
-        return sessions_list
+    except HTTPException as e:
+        raise e
+    except Exception as e:
+        print(f"❌ Erreur lors de la mise à jour des messages non lus : {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erreur lors de la mise à jour des messages non lus : {str(e)}"
+        )
+
+
+@router.get("/sessions", response_model=ChatSessionPage)
+async def list_all_chat_sessions(
+    limit: int = Query(CHAT_SESSIONS_PAGE_SIZE, ge=1, le=CHAT_SESSIONS_MAX_PAGE_SIZE),
+    before: Optional[str] = Query(None, description="Curseur `next_cursor` de la page précédente"),
+):
+    """
+    Récupère les sessions de chat (pour l'admin), les plus récentes en premier.
+
+    Lit uniquement l'index des sessions, trié par `updated_at` côté Firebase
+    (`order_by_child`) : le coût ne dépend ni du nombre de messages ni du
+    nombre total de sessions. Pour la page suivante, passer `next_cursor`
+    en paramètre `before`.
+    """
+    try:
+        query = get_session_index_ref().order_by_child("updated_at")
+        cursor = None
+        if before:
+            # Curseur "updated_at|clé" : Firebase départage les égalités par clé
+            cursor = tuple(before.split("|", 1))
+            if len(cursor) != 2:
+                raise HTTPException(status_code=400, detail="Curseur invalide.")
+            query = query.end_at(cursor[0]).limit_to_last(limit + 2)
+        else:
+            query = query.limit_to_last(limit + 1)
+        index_data = await run_rtdb(query.get) or {}
+        
+        # Résultat trié par (updated_at, clé) croissants
+        entries = [
+            (sanitized_email, entry) for sanitized_email, entry in index_data.items()
+            if cursor is None or (entry.get("updated_at", ""), sanitized_email) < cursor
+        ]
+        has_more = len(entries) > limit
+        page = entries[-limit:][::-1]
+        
+        sessions_list = [
+            session_info_from_summary(sanitized_email.replace("_at_", "@").replace("_", "."), entry)
+            for sanitized_email, entry in page
+        ]
+        
+        next_cursor = None
+        if has_more:
+            last_email, last_entry = page[-1]
+            next_cursor = f"{last_entry.get('updated_at', '')}|{last_email}"
+        
+        return ChatSessionPage(sessions=sessions_list, next_cursor=next_cursor, has_more=has_more)
         
+    except HTTPException as e:
+        raise e
     except Exception as e:
         print(f"❌ Erreur lors de la récupération des sessions : {e}")
         raise HTTPException(
             status_code=500,
             detail=f"Erreur lors de la récupération des sessions : {str(e)}"
         )
+
+
+# ============================================================
+# ARCHIVES (sessions fermées, stockées dans PostgreSQL)
+# ============================================================
+
+def _archive_info(archive: ChatSessionArchive) -> ChatArchiveInfo:
+    return ChatArchiveInfo(
+        archive_id=archive.id,
+        user_email=archive.user_email,
+        user_name=archive.user_name,
+        subject=archive.subject,
+        admin_name=archive.admin_name,
+        started_at=archive.started_at,
+        closed_at=archive.closed_at,
+        archived_at=archive.archived_at,
+        message_count=archive.message_count,
+    )
+
+
+@router.get("/archives/{user_email}", response_model=List[ChatArchiveInfo])
+def list_chat_archives(
+    user_email: str,
+    limit: int = Query(CHAT_SESSIONS_PAGE_SIZE, ge=1, le=CHAT_SESSIONS_MAX_PAGE_SIZE),
+    database: Session = Depends(get_db),
+):
+    """
+    Liste les sessions archivées d'un utilisateur, les plus récentes en premier.
+    """
+    archives = (
+        database.query(ChatSessionArchive)
+        .filter(ChatSessionArchive.user_email == user_email)
+        .order_by(ChatSessionArchive.closed_at.desc().nullslast(), ChatSessionArchive.id.desc())
+        .limit(limit)
+        .all()
+    )
+    return [_archive_info(archive) for archive in archives]
+
+
+@router.get("/archives/{user_email}/{archive_id}", response_model=ChatArchiveTranscript)
+def get_chat_archive_transcript(
+    user_email: str,
+    archive_id: int,
+    limit: int = Query(CHAT_MESSAGES_PAGE_SIZE, ge=1, le=CHAT_MESSAGES_MAX_PAGE_SIZE),
+    before: Optional[str] = Query(None, description="Curseur `next_cursor` de la page précédente"),
+    database: Session = Depends(get_db),
+):
+    """
+    Récupère une page de la transcription d'une session archivée, avec la même
+    pagination que GET /chat/messages (page la plus récente, puis `before`).
+    """
+    archive = database.query(ChatSessionArchive).filter(
+        ChatSessionArchive.id == archive_id,
+        ChatSessionArchive.user_email == user_email,
+    ).first()
+    if not archive:
+        raise HTTPException(status_code=404, detail="Archive de chat non trouvée.")
+
+    query = database.query(ChatArchivedMessage).filter(ChatArchivedMessage.archive_id == archive.id)
+    if before:
+        query = query.filter(ChatArchivedMessage.message_id < before)
+    rows = query.order_by(ChatArchivedMessage.message_id.desc()).limit(limit + 1).all()
+
+    has_more = len(rows) > limit
+    page = rows[:limit][::-1]
+    messages = [
+        ChatMessage(
+            sender=row.sender,
+            sender_email=row.sender_email or "",
+            content=row.content,
+            timestamp=row.sent_at or "",
+            message_id=row.message_id,
+        )
+        for row in page
+    ]
+    return ChatArchiveTranscript(
+        archive=_archive_info(archive),
+        messages=messages,
+        next_cursor=page[0].message_id if has_more else None,
+        has_more=has_more,
+    )
+
+
+# ============================================================
+# RECHERCHE (sessions en cours et archivées, index PostgreSQL)
+# ============================================================
+
+@router.get("/search", response_model=ChatSearchPage)
+def search_chat(
+    q: str = Query(..., min_length=2, max_length=200, description='Mots recherchés (syntaxe web : "expression", -exclu, or)'),
+    user_email: Optional[str] = Query(None, description="Limiter aux conversations d'un utilisateur"),
+    sender: Optional[str] = Query(None, pattern="^(admin|user)$"),
+    include_archived: bool = Query(True),
+    limit: int = Query(CHAT_SEARCH_PAGE_SIZE, ge=1, le=CHAT_SEARCH_MAX_PAGE_SIZE),
+    offset: int = Query(0, ge=0, le=CHAT_SEARCH_MAX_OFFSET),
+    database: Session = Depends(get_db),
+):
+    """
+    Recherche dans le contenu des conversations (pour l'admin), résultats
+    classés par pertinence. Interroge l'index plein texte PostgreSQL
+    (`chat_message_search`) sans lire Firebase.
+    """
+    try:
+        results, has_more = search_chat_messages(
+            database, q,
+            user_email=user_email,
+            sender=sender,
+            include_archived=include_archived,
+            limit=limit,
+            offset=offset,
+        )
+    except Exception as e:
+        print(f"❌ Erreur lors de la recherche dans les conversations : {e}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Erreur lors de la recherche dans les conversations : {str(e)}"
+        )
+
+    hits = [
+        ChatSearchHit(
+            user_email=row.user_email,
+            message_id=row.message_id,
+            sender=row.sender,
+            content=row.content,
+            snippet=snippet,
+            timestamp=row.sent_at or "",
+            archive_id=row.archive_id,
+            score=score,
+        )
+        for row, score, snippet in results
+    ]
+    return ChatSearchPage(
+        hits=hits,
+        next_offset=offset + limit if has_more else None,
+        has_more=has_more,
+    )
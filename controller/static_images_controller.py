@@ -0,0 +1,192 @@
+import os
+import re
+import hashlib
+import mimetypes
+from functools import lru_cache
+from typing import Optional, Tuple
+
+import anyio
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import Response, FileResponse, StreamingResponse
+
+from .storage import get_storage, LocalStorage, IMMUTABLE_CACHE_CONTROL
+from .image_pipeline import IMAGE_VARIANT_FORMAT, variant_filenames
+
+# Service des images de contraventions en stockage local, avant le montage
+# générique /static : les noms de fichiers sont uniques (empreinte SHA-256 ou
+# UUID) et leur contenu ne change jamais, ils peuvent donc être mis en cache
+# indéfiniment par l'application et les proxys.
+router = APIRouter(
+    prefix="/static/images/tickets",
+    tags=["Static"],
+    include_in_schema=False,
+)
+
+STREAM_CHUNK_SIZE = 64 * 1024
+
+# Un JPEG/PNG/GIF est remplacé par sa version d'affichage WebP (`<stem>_display.webp`,
+# écrite par image_pipeline, au plus IMAGE_DISPLAY_MAX_SIZE de côté) quand le
+# client accepte le WebP et que la variante a déjà été générée.
+_NEGOTIATED_MEDIA_TYPE = "image/webp" if IMAGE_VARIANT_FORMAT == "webp" else None
+_NEGOTIABLE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".gif"}
+
+_SHA256_NAME = re.compile(r"^[0-9a-f]{64}$")
+_RANGE_HEADER = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+@lru_cache(maxsize=4096)
+def _content_digest(path: str, size: int, mtime_ns: int) -> str:
+    """SHA-256 d'un fichier ; la taille et la date font partie de la clé du cache."""
+    hasher = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(STREAM_CHUNK_SIZE), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest()
+
+
+def _strong_etag(path: str, stat_result: os.stat_result, variant: str = "") -> str:
+    """
+    ETag fort, calculé sur le contenu.
+    Pour une image stockée sous son empreinte, le nom du fichier suffit.
+    Une version négociée est servie sous l'URL de l'original : son nom de
+    variante est ajouté à l'ETag pour que deux représentations ne se confondent pas.
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    if _SHA256_NAME.match(stem):
+        digest = stem
+    else:
+        digest = _content_digest(path, stat_result.st_size, stat_result.st_mtime_ns)
+    return f'"{digest}-{variant}"' if variant else f'"{digest}"'
+
+
+def _accepts(accept_header: str, media_type: str) -> bool:
+    """Vrai si l'en-tête Accept liste explicitement ce type (avec q > 0)."""
+    for part in accept_header.split(","):
+        fields = [field.strip() for field in part.split(";")]
+        if fields[0] != media_type:
+            continue
+        for param in fields[1:]:
+            if param.startswith("q="):
+                try:
+                    return float(param[2:]) > 0
+                except ValueError:
+                    return False
+        return True
+    return False
+
+
+def _negotiate(path: str, accept_header: str) -> str:
+    """Choisit le fichier à servir selon l'en-tête Accept (original par défaut)."""
+    directory, filename = os.path.split(path)
+    stem, extension = os.path.splitext(filename)
+    if extension.lower() not in _NEGOTIABLE_EXTENSIONS or _NEGOTIATED_MEDIA_TYPE is None:
+        return path
+    alternative = os.path.join(directory, variant_filenames(stem)["display"])
+    if _accepts(accept_header, _NEGOTIATED_MEDIA_TYPE) and os.path.isfile(alternative):
+        return alternative
+    return path
+
+
+def _parse_range(range_header: str, size: int) -> Optional[Tuple[int, int]]:
+    """
+    Interprète un en-tête Range à une seule plage.
+
+    Returns:
+        (début, fin incluse), ou None si l'en-tête est ignoré (plages multiples, syntaxe inconnue)
+
+    Raises:
+        ValueError: Plage non satisfiable
+    """
+    match = _RANGE_HEADER.match(range_header.strip())
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # "bytes=-500" : les 500 derniers octets
+        length = int(end)
+        if length == 0:
+            raise ValueError("plage vide")
+        return max(size - length, 0), size - 1
+    first = int(start)
+    last = min(int(end), size - 1) if end else size - 1
+    if first >= size or first > last:
+        raise ValueError("plage hors du fichier")
+    return first, last
+
+
+async def _iter_file_range(path: str, start: int, length: int):
+    async with await anyio.open_file(path, mode="rb") as f:
+        await f.seek(start)
+        remaining = length
+        while remaining > 0:
+            chunk = await f.read(min(STREAM_CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+@router.api_route("/{image_key:path}", methods=["GET", "HEAD"])
+async def serve_ticket_image(image_key: str, request: Request):
+    """
+    Sert une image de contravention avec :
+    - `Cache-Control: immutable` et un ETag fort (304 si `If-None-Match` correspond) ;
+    - les requêtes `Range` (206), avec `If-Range` ;
+    - la version d'affichage WebP si le client l'accepte et qu'elle existe.
+    """
+    storage = get_storage()
+    # Les fichiers temporaires et dossiers techniques (préfixés par ".") ne sont jamais servis
+    if not isinstance(storage, LocalStorage) or any(part.startswith(".") for part in image_key.split("/")):
+        raise HTTPException(status_code=404, detail="Image non trouvée.")
+    try:
+        requested_path = storage.path_for(image_key)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Image non trouvée.")
+
+    path = _negotiate(requested_path, request.headers.get("accept", ""))
+    try:
+        stat_result = await anyio.to_thread.run_sync(os.stat, path)
+    except (FileNotFoundError, NotADirectoryError):
+        raise HTTPException(status_code=404, detail="Image non trouvée.")
+    if not os.path.isfile(path):
+        raise HTTPException(status_code=404, detail="Image non trouvée.")
+
+    # Ex: "<sha>_display.webp" -> "display-webp"
+    variant = os.path.basename(path).split("_", 1)[1].replace(".", "-") if path != requested_path else ""
+    etag = await anyio.to_thread.run_sync(_strong_etag, path, stat_result, variant)
+    media_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    headers = {
+        "Cache-Control": IMMUTABLE_CACHE_CONTROL,
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+    }
+    if os.path.splitext(requested_path)[1].lower() in _NEGOTIABLE_EXTENSIONS:
+        # La représentation dépend de l'en-tête Accept (y compris pour 304, 206 et 416)
+        headers["Vary"] = "Accept"
+
+    # Revalidation : zéro octet transféré si le client a déjà cette version
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and (if_none_match.strip() == "*" or etag in [tag.strip() for tag in if_none_match.split(",")]):
+        return Response(status_code=304, headers=headers)
+
+    size = stat_result.st_size
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (if_range is None or if_range.strip() == etag):
+        try:
+            byte_range = _parse_range(range_header, size)
+        except ValueError:
+            return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{size}"})
+        if byte_range is not None:
+            start, end = byte_range
+            length = end - start + 1
+            headers.update({"Content-Range": f"bytes {start}-{end}/{size}", "Content-Length": str(length)})
+            if request.method == "HEAD":
+                return Response(status_code=206, headers=headers, media_type=media_type)
+            return StreamingResponse(
+                _iter_file_range(path, start, length), status_code=206, headers=headers, media_type=media_type
+            )
+
+    return FileResponse(path, headers=headers, media_type=media_type, stat_result=stat_result, method=request.method)
@@ -0,0 +1,396 @@
+import os
+import hmac
+import time
+import shutil
+import hashlib
+import tempfile
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Iterator, Optional
+from urllib.parse import urlencode
+
+
+# --- Configuration du stockage des images ---
+# "local" (disque du serveur, servi par /static) ou "s3" (S3, MinIO, R2...)
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local").lower()
+# Dossier racine des images en stockage local
+LOCAL_STORAGE_ROOT = os.getenv("LOCAL_STORAGE_ROOT", "static/images/tickets")
+# Préfixe des URLs publiques en stockage local
+LOCAL_STORAGE_URL_PREFIX = "/static/images/tickets"
+# Durée de validité d'une URL d'upload présignée
+STORAGE_PRESIGN_EXPIRES_SECONDS = int(os.getenv("STORAGE_PRESIGN_EXPIRES_SECONDS", "900"))
+# Secret de signature des URLs d'upload en stockage local
+STORAGE_SIGNING_SECRET = os.getenv("STORAGE_SIGNING_SECRET", "")
+
+# Configuration S3 (ou compatible S3 : MinIO en local, R2...)
+S3_BUCKET = os.getenv("S3_BUCKET", "")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None
+S3_REGION = os.getenv("S3_REGION", "us-east-1")
+S3_ACCESS_KEY_ID = os.getenv("S3_ACCESS_KEY_ID") or None
+S3_SECRET_ACCESS_KEY = os.getenv("S3_SECRET_ACCESS_KEY") or None
+# URL publique des objets (CDN ou bucket public) ; déduite de l'endpoint sinon
+S3_PUBLIC_BASE_URL = os.getenv("S3_PUBLIC_BASE_URL", "")
+
+# Préfixe des objets déposés directement par les clients via une URL présignée.
+# Sur S3, ces objets gardent leurs métadonnées (EXIF, GPS) jusqu'à leur
+# traitement : la politique du bucket ne doit pas les rendre publics, et la
+# copie nettoyée est publiée sous une nouvelle clé adressée par contenu.
+INCOMING_PREFIX = "incoming"
+# Les clés sont uniques et leur contenu ne change jamais : cache d'un an
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+# Objets `incoming/` du bucket : jamais mis en cache (remplacés après traitement)
+INCOMING_CACHE_CONTROL = "private, no-store"
+
+_storage = None
+
+
+@dataclass
+class StoredObjectInfo:
+    """Métadonnées d'un objet stocké."""
+    size: int
+    content_type: Optional[str]
+
+
+@dataclass
+class ListedObject:
+    """Objet renvoyé par `StorageBackend.iter_objects`."""
+    key: str
+    size: int
+    modified_at: datetime
+
+
+class StorageBackend(ABC):
+    """
+    Interface commune des backends de stockage des images.
+
+    Les objets sont identifiés par une clé relative (ex: ab/cd/<sha256>.jpg),
+    indépendante du backend ; seule l'URL publique en dépend.
+    """
+
+    @abstractmethod
+    def put_file(self, local_path: str, key: str, content_type: Optional[str] = None):
+        """Dépose un fichier local sous la clé donnée. Le fichier local est consommé."""
+
+    @abstractmethod
+    def exists(self, key: str) -> bool:
+        """Indique si un objet existe sous cette clé."""
+
+    @abstractmethod
+    def stat(self, key: str) -> Optional[StoredObjectInfo]:
+        """Taille et type d'un objet, ou None s'il n'existe pas."""
+
+    @abstractmethod
+    def read_prefix(self, key: str, length: int) -> bytes:
+        """Lit les premiers octets d'un objet (vérification du format réel)."""
+
+    @abstractmethod
+    def delete(self, key: str):
+        """Supprime un objet ; sans effet s'il n'existe pas."""
+
+    @abstractmethod
+    def move(self, source_key: str, target_key: str):
+        """Déplace un objet (mise en quarantaine, restauration)."""
+
+    @abstractmethod
+    def iter_objects(self, prefix: str = "", start_after: str = "") -> Iterator[ListedObject]:
+        """
+        Parcourt les objets par ordre lexicographique de clé, à partir de
+        `start_after` (exclu). Les clés dont un segment commence par "." sont
+        ignorées, sauf si `prefix` les désigne explicitement.
+        """
+
+    @abstractmethod
+    @contextmanager
+    def local_copy(self, key: str) -> Iterator[str]:
+        """Chemin local lisible de l'objet, le temps du bloc `with`."""
+
+    @abstractmethod
+    def public_url(self, key: str) -> str:
+        """URL publique d'un objet."""
+
+    @abstractmethod
+    def key_from_url(self, url: Optional[str]) -> Optional[str]:
+        """Clé d'un objet à partir de son URL publique, ou None si l'URL est externe."""
+
+    @abstractmethod
+    def presign_upload(self, key: str, content_type: str, max_bytes: int, expires_in: int) -> dict:
+        """
+        Prépare un upload direct par le client, sans passer par l'API.
+
+        Returns:
+            dict: method, url, fields (POST) ou headers (PUT) à utiliser
+        """
+
+
+# ============================================================
+# Stockage local (disque du serveur)
+# ============================================================
+
+def _sign_local_upload(key: str, content_type: str, max_bytes: int, expires: int) -> str:
+    message = f"{key}\n{content_type}\n{max_bytes}\n{expires}".encode()
+    return hmac.new(STORAGE_SIGNING_SECRET.encode(), message, hashlib.sha256).hexdigest()
+
+
+def verify_local_upload_signature(key: str, content_type: str, max_bytes: int, expires: int, signature: str) -> bool:
+    """Vérifie une URL d'upload locale (signature et date d'expiration)."""
+    if not STORAGE_SIGNING_SECRET or expires < int(time.time()):
+        return False
+    return hmac.compare_digest(_sign_local_upload(key, content_type, max_bytes, expires), signature)
+
+
+class LocalStorage(StorageBackend):
+    """
+    Images stockées sur le disque du serveur et servies par le montage /static.
+    Adapté au développement et aux déploiements à une seule instance.
+    """
+
+    def __init__(self, root: str = LOCAL_STORAGE_ROOT, url_prefix: str = LOCAL_STORAGE_URL_PREFIX):
+        # Sans secret, seuls les uploads présignés sont désactivés (l'envoi via POST /tickets reste possible)
+        if not STORAGE_SIGNING_SECRET:
+            print("⚠️  ATTENTION : STORAGE_SIGNING_SECRET n'est pas défini, les uploads présignés sont désactivés.")
+        self.root = root
+        self.url_prefix = url_prefix.rstrip("/")
+        os.makedirs(self.root, exist_ok=True)
+
+    def path_for(self, key: str) -> str:
+        """Chemin disque d'une clé ; refuse toute clé qui sortirait du dossier racine."""
+        path = os.path.normpath(os.path.join(self.root, key))
+        if not path.startswith(os.path.normpath(self.root) + os.sep):
+            raise ValueError(f"Clé de stockage invalide : {key}")
+        return path
+
+    def put_file(self, local_path: str, key: str, content_type: Optional[str] = None):
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Renommage atomique : le fichier n'est jamais visible à moitié écrit
+        shutil.move(local_path, path)
+
+    def exists(self, key: str) -> bool:
+        return os.path.isfile(self.path_for(key))
+
+    def stat(self, key: str) -> Optional[StoredObjectInfo]:
+        path = self.path_for(key)
+        if not os.path.isfile(path):
+            return None
+        return StoredObjectInfo(size=os.path.getsize(path), content_type=None)
+
+    def read_prefix(self, key: str, length: int) -> bytes:
+        with open(self.path_for(key), "rb") as f:
+            return f.read(length)
+
+    def delete(self, key: str):
+        path = self.path_for(key)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def move(self, source_key: str, target_key: str):
+        target_path = self.path_for(target_key)
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        os.replace(self.path_for(source_key), target_path)
+        # La date de modification marque le début de la quarantaine
+        os.utime(target_path)
+
+    def _walk_sorted(self, directory: str, key_prefix: str, start_after: str) -> Iterator[ListedObject]:
+        """Parcours récursif dans l'ordre des clés (un dossier "a" se trie comme "a/")."""
+        try:
+            entries = list(os.scandir(directory))
+        except FileNotFoundError:
+            return
+        entries.sort(key=lambda entry: entry.name + "/" if entry.is_dir(follow_symlinks=False) else entry.name)
+        for entry in entries:
+            if entry.name.startswith("."):
+                continue
+            key = f"{key_prefix}{entry.name}"
+            if entry.is_dir(follow_symlinks=False):
+                # Dossier entièrement avant le curseur : inutile d'y descendre
+                if key + "/" < start_after and not start_after.startswith(key + "/"):
+                    continue
+                yield from self._walk_sorted(entry.path, key + "/", start_after)
+            elif entry.is_file(follow_symlinks=False) and key > start_after:
+                stat_result = entry.stat(follow_symlinks=False)
+                yield ListedObject(
+                    key=key,
+                    size=stat_result.st_size,
+                    modified_at=datetime.fromtimestamp(stat_result.st_mtime, tz=timezone.utc),
+                )
+
+    def iter_objects(self, prefix: str = "", start_after: str = "") -> Iterator[ListedObject]:
+        prefix = prefix.strip("/")
+        directory = self.path_for(prefix) if prefix else self.root
+        key_prefix = f"{prefix}/" if prefix else ""
+        yield from self._walk_sorted(directory, key_prefix, start_after)
+
+    @contextmanager
+    def local_copy(self, key: str) -> Iterator[str]:
+        yield self.path_for(key)
+
+    def public_url(self, key: str) -> str:
+        return f"{self.url_prefix}/{key}"
+
+    def key_from_url(self, url: Optional[str]) -> Optional[str]:
+        if not url or not url.startswith(self.url_prefix + "/"):
+            return None
+        return url[len(self.url_prefix) + 1:]
+
+    def presign_upload(self, key: str, content_type: str, max_bytes: int, expires_in: int) -> dict:
+        """
+        URL signée vers l'endpoint PUT /storage/uploads/{key} de l'API :
+        même protocole qu'avec S3, pour que l'application cliente n'ait qu'un seul chemin.
+        """
+        if not STORAGE_SIGNING_SECRET:
+            raise RuntimeError("STORAGE_SIGNING_SECRET n'est pas défini.")
+        expires = int(time.time()) + expires_in
+        query = urlencode({
+            "content_type": content_type,
+            "max_bytes": max_bytes,
+            "expires": expires,
+            "signature": _sign_local_upload(key, content_type, max_bytes, expires),
+        })
+        return {
+            "method": "PUT",
+            "url": f"/storage/uploads/{key}?{query}",
+            "headers": {"Content-Type": content_type},
+            "fields": {},
+            "expires_at": expires,
+        }
+
+
+# ============================================================
+# Stockage S3 (ou compatible)
+# ============================================================
+
+class S3Storage(StorageBackend):
+    """
+    Images stockées dans un bucket S3 (ou compatible : MinIO, R2...).
+    Les clients déposent leurs photos directement dans le bucket via un POST présigné.
+    """
+
+    def __init__(self, bucket: str = S3_BUCKET):
+        # Import local : boto3 n'est nécessaire qu'avec STORAGE_BACKEND=s3
+        import boto3
+        from botocore.config import Config
+
+        if not bucket:
+            raise RuntimeError("S3_BUCKET n'est pas défini.")
+        self.bucket = bucket
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=S3_ENDPOINT_URL,
+            region_name=S3_REGION,
+            aws_access_key_id=S3_ACCESS_KEY_ID,
+            aws_secret_access_key=S3_SECRET_ACCESS_KEY,
+            config=Config(signature_version="s3v4", s3={"addressing_style": "path"}),
+        )
+        if S3_PUBLIC_BASE_URL:
+            self.public_base_url = S3_PUBLIC_BASE_URL.rstrip("/")
+        elif S3_ENDPOINT_URL:
+            self.public_base_url = f"{S3_ENDPOINT_URL.rstrip('/')}/{bucket}"
+        else:
+            self.public_base_url = f"https://{bucket}.s3.{S3_REGION}.amazonaws.com"
+
+    def _is_missing(self, error) -> bool:
+        return error.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound")
+
+    def put_file(self, local_path: str, key: str, content_type: Optional[str] = None):
+        extra_args = {"CacheControl": IMMUTABLE_CACHE_CONTROL}
+        if content_type:
+            extra_args["ContentType"] = content_type
+        self.client.upload_file(local_path, self.bucket, key, ExtraArgs=extra_args)
+        os.remove(local_path)
+
+    def exists(self, key: str) -> bool:
+        return self.stat(key) is not None
+
+    def stat(self, key: str) -> Optional[StoredObjectInfo]:
+        from botocore.exceptions import ClientError
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if self._is_missing(e):
+                return None
+            raise
+        return StoredObjectInfo(size=head["ContentLength"], content_type=head.get("ContentType"))
+
+    def read_prefix(self, key: str, length: int) -> bytes:
+        response = self.client.get_object(Bucket=self.bucket, Key=key, Range=f"bytes=0-{length - 1}")
+        return response["Body"].read()
+
+    def delete(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+    def move(self, source_key: str, target_key: str):
+        self.client.copy_object(
+            Bucket=self.bucket, Key=target_key,
+            CopySource={"Bucket": self.bucket, "Key": source_key},
+        )
+        self.client.delete_object(Bucket=self.bucket, Key=source_key)
+
+    def iter_objects(self, prefix: str = "", start_after: str = "") -> Iterator[ListedObject]:
+        prefix = prefix.strip("/")
+        params = {"Bucket": self.bucket, "Prefix": f"{prefix}/" if prefix else ""}
+        if start_after:
+            params["StartAfter"] = start_after
+        for page in self.client.get_paginator("list_objects_v2").paginate(**params):
+            for item in page.get("Contents", []):
+                relative_key = item["Key"][len(params["Prefix"]):]
+                if any(part.startswith(".") for part in relative_key.split("/")):
+                    continue
+                yield ListedObject(key=item["Key"], size=item["Size"], modified_at=item["LastModified"])
+
+    @contextmanager
+    def local_copy(self, key: str) -> Iterator[str]:
+        fd, temp_path = tempfile.mkstemp(suffix=os.path.splitext(key)[1])
+        os.close(fd)
+        try:
+            self.client.download_file(self.bucket, key, temp_path)
+            yield temp_path
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+    def public_url(self, key: str) -> str:
+        return f"{self.public_base_url}/{key}"
+
+    def key_from_url(self, url: Optional[str]) -> Optional[str]:
+        if not url or not url.startswith(self.public_base_url + "/"):
+            return None
+        return url[len(self.public_base_url) + 1:]
+
+    def presign_upload(self, key: str, content_type: str, max_bytes: int, expires_in: int) -> dict:
+        """
+        POST présigné : le bucket refuse lui-même un fichier trop gros ou d'un autre type.
+        L'objet déposé n'est pas mis en cache : il est remplacé par sa copie
+        sans métadonnées (`generate_ticket_image_variants`).
+        """
+        presigned = self.client.generate_presigned_post(
+            Bucket=self.bucket,
+            Key=key,
+            Fields={"Content-Type": content_type, "Cache-Control": INCOMING_CACHE_CONTROL},
+            Conditions=[
+                {"Content-Type": content_type},
+                {"Cache-Control": INCOMING_CACHE_CONTROL},
+                ["content-length-range", 1, max_bytes],
+            ],
+            ExpiresIn=expires_in,
+        )
+        return {
+            "method": "POST",
+            "url": presigned["url"],
+            "headers": {},
+            "fields": presigned["fields"],
+            "expires_at": int(time.time()) + expires_in,
+        }
+
+
+def get_storage() -> StorageBackend:
+    """Retourne le backend de stockage configuré (créé à la première utilisation)."""
+    global _storage
+    if _storage is None:
+        if STORAGE_BACKEND == "s3":
+            _storage = S3Storage()
+        else:
+            _storage = LocalStorage()
+        print(f"🗄️ Stockage des images : {type(_storage).__name__}")
+    return _storage
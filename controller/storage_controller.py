@@ -0,0 +1,117 @@
+import uuid
+
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from databaseone import get_db
+from models import models
+from schemas import storage_schema
+from .storage import (
+    get_storage, verify_local_upload_signature, LocalStorage,
+    INCOMING_PREFIX, STORAGE_PRESIGN_EXPIRES_SECONDS,
+)
+from .upload_service import save_upload_stream, strip_upload_metadata, UploadRejected, TICKET_IMAGE_MAX_BYTES
+
+router = APIRouter(
+    prefix="/storage",
+    tags=["Storage"]
+)
+
+_EXTENSIONS = {
+    "image/jpeg": ".jpg",
+    "image/png": ".png",
+    "image/gif": ".gif",
+    "image/webp": ".webp",
+    "image/heic": ".heic",
+}
+
+
+class _RequestBodyReader:
+    """Expose le corps d'une requête sous la forme `async read(n)` attendue par save_upload_stream."""
+
+    def __init__(self, request: Request):
+        self._stream = request.stream()
+        self._buffer = b""
+        self._done = False
+
+    async def read(self, size: int) -> bytes:
+        while len(self._buffer) < size and not self._done:
+            try:
+                self._buffer += await self._stream.__anext__()
+            except StopAsyncIteration:
+                self._done = True
+        chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
+
+
+@router.post("/presign", response_model=storage_schema.PresignedUploadResponse, summary="Obtenir une URL d'upload directe pour une image")
+def presign_image_upload(request_data: storage_schema.PresignedUploadRequest, db: Session = Depends(get_db)):
+    """
+    Prépare l'envoi d'une photo de contravention directement vers le stockage,
+    sans faire transiter les octets par l'API.
+
+    Le client envoie ensuite le fichier avec `method` sur `url` (avec `headers`
+    pour un PUT, ou les `fields` du formulaire suivis du champ `file` pour un
+    POST), puis crée la contravention avec `image_key`.
+    """
+    if request_data.size > TICKET_IMAGE_MAX_BYTES:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="L'image dépasse la taille maximale autorisée.")
+
+    user = db.query(models.User).filter(models.User.email == request_data.user_email).first()
+    if not user:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Utilisateur avec l'email {request_data.user_email} non trouvé.")
+
+    image_key = f"{INCOMING_PREFIX}/{user.id}/{uuid.uuid4().hex}{_EXTENSIONS[request_data.content_type]}"
+    try:
+        presigned = get_storage().presign_upload(
+            image_key, request_data.content_type, TICKET_IMAGE_MAX_BYTES, STORAGE_PRESIGN_EXPIRES_SECONDS
+        )
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=f"Stockage indisponible : {e}")
+
+    return storage_schema.PresignedUploadResponse(image_key=image_key, max_bytes=TICKET_IMAGE_MAX_BYTES, **presigned)
+
+
+@router.put("/uploads/{image_key:path}", status_code=status.HTTP_201_CREATED, summary="Recevoir un upload présigné (stockage local)")
+async def receive_local_upload(
+    image_key: str,
+    request: Request,
+    content_type: str,
+    max_bytes: int,
+    expires: int,
+    signature: str
+):
+    """
+    Cible des URLs présignées en stockage local (équivalent du PUT présigné S3).
+    En stockage S3, les clients envoient directement au bucket et cet endpoint n'est pas utilisé.
+    """
+    storage = get_storage()
+    if not isinstance(storage, LocalStorage):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Upload direct non disponible avec ce stockage.")
+    if not verify_local_upload_signature(image_key, content_type, max_bytes, expires, signature):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="URL d'upload invalide ou expirée.")
+    if request.headers.get("content-type", "").split(";")[0].strip() != content_type:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Le Content-Type ne correspond pas à l'URL d'upload.")
+
+    declared_length = request.headers.get("content-length", "")
+    if declared_length.isdigit() and int(declared_length) > max_bytes:
+        raise HTTPException(status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, detail="L'image dépasse la taille maximale autorisée.")
+
+    try:
+        stored = await save_upload_stream(_RequestBodyReader(request), storage.root, max_bytes)
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
+
+    try:
+        # L'image est servie publiquement dès son dépôt : retirer EXIF/GPS avant
+        await strip_upload_metadata(stored)
+        await run_in_threadpool(storage.put_file, stored.temp_path, image_key, stored.content_type)
+    except ValueError as e:
+        stored.discard()
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception:
+        stored.discard()
+        raise
+
+    return {"image_key": image_key, "size": stored.size, "sha256": stored.sha256}
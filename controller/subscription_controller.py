@@ -1,11 +1,13 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from sqlalchemy.orm import Session, joinedload
+from typing import List, Optional
+from decimal import Decimal
 from datetime import datetime, timedelta, timezone
 
 from databaseone import get_db
 from models import models
 from schemas import subscription_plan_schema
+from schemas.serialization import json_list_response
 
 router = APIRouter(
     prefix="/api",
@@ -24,7 +26,7 @@ def create_plan(plan: subscription_plan_schema.PlanCreate, db: Session = Depends
     - **price**: Prix en USD.
     - **duration_days**: Durée de validité en jours.
     """
-    db_plan = models.Plan(**plan.dict())
+    db_plan = models.Plan(**plan.model_dump())
     db.add(db_plan)
     db.commit()
     db.refresh(db_plan)
@@ -36,12 +38,15 @@ def get_all_plans(db: Session = Depends(get_db)):
     Retourne une liste de tous les plans de souscription actifs.
     """
     plans = db.query(models.Plan).filter(models.Plan.is_active == True).all()
-    return plans
+    return json_list_response(subscription_plan_schema.PlanListSerializer, plans)
 
-def _create_subscription_logic(user: models.User, plan: models.Plan, db: Session, auto_renew: bool = False) -> models.Subscription:
+def _create_subscription_logic(user: models.User, plan: models.Plan, db: Session, auto_renew: bool = False, amount_paid: Optional[Decimal] = None) -> models.Subscription:
     """
     Logique de service pour créer un abonnement.
     Cette fonction est réutilisable et n'est pas une route API.
+
+    `amount_paid` : montant encaissé (paiement Stripe) ; il est enregistré dans
+    `payments`, source du revenu des rollups analytiques.
     """
     if user.abonnement_finish and user.abonnement_finish > datetime.now(timezone.utc):
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="L'utilisateur a déjà un abonnement actif.")
@@ -60,6 +65,12 @@ def _create_subscription_logic(user: models.User, plan: models.Plan, db: Session
 
     user.abonnement_finish = end_date
 
+    if amount_paid is not None:
+        new_sub.payments.append(models.Payment(
+            amount_usd=amount_paid,
+            payment_status=models.PaymentStatus.completed,
+        ))
+
     db.add(new_sub)
     return new_sub
 
@@ -97,8 +108,15 @@ def get_user_subscriptions(user_email: str, db: Session = Depends(get_db)):
     user = db.query(models.User).filter(models.User.email == user_email).first()
     if not user:
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Utilisateur avec l'email {user_email} non trouvé.")
-    
-    return user.subscriptions
+
+    # Le plan de chaque abonnement est chargé dans la même requête
+    subscriptions = (
+        db.query(models.Subscription)
+        .filter(models.Subscription.user_id == user.id)
+        .options(joinedload(models.Subscription.plan))
+        .all()
+    )
+    return json_list_response(subscription_plan_schema.SubscriptionListSerializer, subscriptions)
 
 @router.get("/subscriptions/user/{user_email}/status", response_model=subscription_plan_schema.SubscriptionStatusResponse, summary="Vérifier le statut de l'abonnement d'un utilisateur")
 def check_user_subscription_status(user_email: str, db: Session = Depends(get_db)):
@@ -1,14 +1,28 @@
 import os
-import uuid
-import shutil
-from typing import List, Optional
+import io
+import csv
+import json
+import asyncio
+import tempfile
+from decimal import Decimal
+from typing import List, Optional, Iterator, Tuple
 from datetime import datetime
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile, File, Form
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, UploadFile, File, Form
+from fastapi.exceptions import RequestValidationError
+from pydantic import BaseModel, Field, ValidationError, field_validator
+from sqlalchemy import insert
+from sqlalchemy.exc import DBAPIError
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
-from databaseone import get_db
-from models.models import User, Ticket, TicketStatus
+from databaseone import get_db, SessionLocal
+from models.models import User, Ticket, TicketStatus, UserTicketSummary
+from schemas.ticket_schema import TicketResponse, TicketListSerializer, TicketSummaryResponse
+from schemas.serialization import json_list_response
+from .upload_service import parse_multipart_upload, strip_upload_metadata, sniff_image_type, lock_image_blob, StoredUpload, UploadRejected, TICKET_IMAGE_MAX_BYTES
+from .image_pipeline import get_image_executor, process_ticket_image, strip_image_metadata, variant_filenames
+from .storage import get_storage, LocalStorage, INCOMING_PREFIX, LOCAL_STORAGE_ROOT
 
 # Créer un router pour les tickets, ce qui nous permet de regrouper les routes
 router = APIRouter(
@@ -17,11 +31,97 @@ router = APIRouter(
     responses={404: {"description": "Non trouvé"}},
 )
 
-# Répertoire où seront stockées les images des contraventions.
+# Répertoire où sont écrites les images reçues avant leur dépôt dans le stockage
+# (static/images/tickets : le dépôt en stockage local est un simple renommage).
 # Il sera créé automatiquement s'il n'existe pas.
-UPLOAD_DIRECTORY = "static/images/tickets"
+UPLOAD_DIRECTORY = LOCAL_STORAGE_ROOT
 os.makedirs(UPLOAD_DIRECTORY, exist_ok=True)
 
+# --- Import en masse ---
+# Nombre de lignes envoyées à PostgreSQL par COPY / executemany
+IMPORT_BATCH_SIZE = int(os.getenv("TICKET_IMPORT_BATCH_SIZE", "1000"))
+# Nombre maximum de lignes acceptées par fichier
+IMPORT_MAX_ROWS = int(os.getenv("TICKET_IMPORT_MAX_ROWS", "50000"))
+# Nombre maximum d'erreurs détaillées renvoyées dans la réponse
+IMPORT_MAX_REPORTED_ERRORS = 500
+
+# Colonnes chargées par COPY, dans l'ordre du flux CSV envoyé à PostgreSQL
+IMPORT_COPY_COLUMNS = [
+    "user_id", "ticket_number", "description", "amount_usd", "due_date",
+    "dispute_url", "image_url", "payment_url", "status",
+]
+
+
+class TicketCreateForm(BaseModel):
+    """Champs texte du formulaire de création d'une contravention."""
+    email: str
+    ticket_number: str
+    amount_usd: float
+    description: Optional[str] = None
+    payment_url: Optional[str] = None
+    dispute_url: str
+    due_date: Optional[str] = None
+    image_key: Optional[str] = None
+
+
+# Description du formulaire pour la documentation OpenAPI : le corps est lu
+# directement depuis le flux de la requête (parse_multipart_upload)
+_CREATE_TICKET_REQUEST_BODY = {
+    "requestBody": {
+        "required": True,
+        "content": {
+            "multipart/form-data": {
+                "schema": {
+                    "type": "object",
+                    "required": ["email", "ticket_number", "amount_usd", "dispute_url"],
+                    "properties": {
+                        **{name: {"type": "string"} for name in (
+                            "email", "ticket_number", "description", "payment_url",
+                            "dispute_url", "due_date", "image_key",
+                        )},
+                        "amount_usd": {"type": "number"},
+                        "image": {"type": "string", "format": "binary"},
+                    },
+                }
+            }
+        },
+    }
+}
+
+
+class TicketImportRow(BaseModel):
+    """Schéma de validation d'une ligne du fichier d'import (CSV ou NDJSON)."""
+    ticket_number: str = Field(min_length=1, max_length=50)
+    amount_usd: Decimal = Field(ge=0, max_digits=10, decimal_places=2)
+    dispute_url: str = Field(min_length=1, max_length=255)
+    description: Optional[str] = None
+    payment_url: Optional[str] = Field(None, max_length=255)
+    due_date: Optional[datetime] = None
+    image_url: Optional[str] = Field(None, max_length=255)
+
+    @field_validator("ticket_number", "dispute_url", "description", "payment_url", "image_url")
+    @classmethod
+    def check_no_nul(cls, value: Optional[str]) -> Optional[str]:
+        """PostgreSQL refuse le caractère NUL dans un texte : le COPY du lot échouerait."""
+        if value is not None and "\x00" in value:
+            raise ValueError("caractère NUL interdit")
+        return value
+
+    @field_validator("image_url")
+    @classmethod
+    def check_image_reference(cls, value: Optional[str]) -> Optional[str]:
+        """
+        L'image doit être une URL externe ou une image du stockage. L'appartenance
+        et la présence d'une image du stockage sont vérifiées à l'import
+        (`_check_import_image`), qui connaît l'utilisateur.
+        """
+        if value is None or get_storage().key_from_url(value) is not None:
+            return value
+        if value.startswith(("http://", "https://")):
+            return value
+        raise ValueError("doit être une URL http(s) ou une image du stockage (/static/images/tickets/...)")
+
+
 # --- Fonction utilitaire pour éviter la répétition ---
 
 def get_user_by_email(email: str, db: Session) -> User:
@@ -33,107 +133,357 @@ def get_user_by_email(email: str, db: Session) -> User:
 
 # --- Endpoints de l'API pour les Tickets ---
 
-@router.post("/", status_code=201)
-def create_ticket(
-    db: Session = Depends(get_db),
-    email: str = Form(...),
-    ticket_number: str = Form(...),
-    amount_usd: float = Form(...),
-    description: Optional[str] = Form(None),
-    payment_url: Optional[str] = Form(None),
-    dispute_url: str = Form(...),
-    due_date: Optional[str] = Form(None),
-    image: UploadFile = File(...)
-):
+def _parse_due_date(due_date: Optional[str]) -> Optional[datetime]:
+    """Convertit le champ due_date (format ISO) ou renvoie une erreur 400."""
+    if not due_date:
+        return None
+    try:
+        return datetime.fromisoformat(due_date)
+    except Exception:
+        raise HTTPException(status_code=400, detail="Le champ 'due_date' doit être au format ISO (ex: 2025-12-31T23:59:59)")
+
+
+def _check_uploaded_image(image_key: str) -> str:
     """
-    Crée une nouvelle contravention pour un utilisateur et stocke l'image associée.
-    Les données sont envoyées en 'multipart/form-data'.
+    Vérifie une image déposée directement dans le stockage via une URL présignée :
+    clé émise par /storage/presign, objet présent, taille et format réel.
+    Exécutée dans le threadpool (appels au stockage bloquants).
+
+    Returns:
+        str: URL publique de l'image
     """
-    user = get_user_by_email(email, db)
+    if not image_key.startswith(f"{INCOMING_PREFIX}/") or ".." in image_key:
+        raise HTTPException(status_code=400, detail="Clé d'image invalide.")
+
+    storage = get_storage()
+    info = storage.stat(image_key)
+    if info is None:
+        raise HTTPException(status_code=400, detail="Image introuvable dans le stockage : l'upload est-il terminé ?")
+    if info.size > TICKET_IMAGE_MAX_BYTES:
+        raise HTTPException(status_code=413, detail="L'image dépasse la taille maximale autorisée.")
+    if sniff_image_type(storage.read_prefix(image_key, 16)) is None:
+        raise HTTPException(status_code=415, detail="Format d'image non supporté (JPEG, PNG, GIF, WebP ou HEIC attendu).")
+    return storage.public_url(image_key)
+
 
-    # Gérer le stockage de l'image sur le serveur
-    file_path = ""
+def _insert_ticket(email: str, ticket_data: dict, stored: Optional[StoredUpload] = None, image_key: Optional[str] = None) -> Ticket:
+    """
+    Crée la contravention en base de données.
+    Exécutée dans le threadpool : la session n'est ouverte qu'une fois l'image publiée.
+
+    L'image est publiée avant l'ouverture de la session : un envoi lent vers
+    le stockage ne garde ni connexion du pool ni verrou. Le verrou de l'URL
+    n'est pris que pour l'insertion de la référence : une suppression
+    concurrente de la même image (partagée par une autre contravention)
+    attend la fin de cette transaction. Si elle est passée entre la
+    publication et le verrou, l'image a disparu et la création est refusée (409).
+    Une image publiée dont l'insertion échoue est supprimée par le réconciliateur.
+    """
+    storage = get_storage()
+    if stored is not None:
+        stored.publish(storage)
+
+    db = SessionLocal()
     try:
-        # Générer un nom de fichier unique pour éviter les conflits
-        file_extension = os.path.splitext(image.filename)[1]
-        unique_filename = f"{uuid.uuid4()}{file_extension}"
-        file_path = os.path.join(UPLOAD_DIRECTORY, unique_filename)
+        user = get_user_by_email(email, db)
+        if image_key is not None and not image_key.startswith(f"{INCOMING_PREFIX}/{user.id}/"):
+            # Une clé présignée n'est utilisable que par l'utilisateur qui l'a demandée
+            raise HTTPException(status_code=403, detail="Cette image n'appartient pas à cet utilisateur.")
+        if stored is not None:
+            lock_image_blob(db, ticket_data["image_url"])
+            if not storage.exists(stored.filename):
+                raise HTTPException(status_code=409, detail="L'image a été supprimée pendant l'envoi : veuillez réessayer.")
+        new_ticket = Ticket(user_id=user.id, status=TicketStatus.en_cours, **ticket_data)
+        db.add(new_ticket)
+        db.commit()
+        db.refresh(new_ticket)
+        return new_ticket
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
 
-        # Sauvegarder le fichier sur le disque
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(image.file, buffer)
 
-        # Générer l'URL qui sera stockée en base de données et accessible par l'API
-        image_url = f"/static/images/tickets/{unique_filename}"
+def _release_image_blob(image_url: Optional[str], image_keys: List[str]):
+    """
+    Supprime les fichiers d'une image qui n'est plus référencée par aucune contravention.
+    Plusieurs contraventions peuvent partager la même image (stockage par empreinte).
+    """
+    if not image_url or not image_keys:
+        return
 
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Erreur lors du stockage de l'image : {e}")
+    storage = get_storage()
+    db = SessionLocal()
+    try:
+        lock_image_blob(db, image_url)
+        still_used = db.query(Ticket.id).filter(Ticket.image_url == image_url).first() is not None
+        if not still_used:
+            for key in image_keys:
+                storage.delete(key)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
     finally:
-        image.file.close()
+        db.close()
 
-    # Créer la contravention en base de données
+
+def _save_image_variant_urls(ticket_id: int, display_url: str, thumbnail_url: str):
+    """Enregistre les URLs des variantes d'image sur la contravention."""
+    db = SessionLocal()
     try:
-        # parser due_date si fourni (attend un ISO format)
-        parsed_due_date = None
-        if due_date:
-            try:
-                parsed_due_date = datetime.fromisoformat(due_date)
-            except Exception:
-                raise HTTPException(status_code=400, detail="Le champ 'due_date' doit être au format ISO (ex: 2025-12-31T23:59:59)")
-
-        new_ticket = Ticket(
-            user_id=user.id,
-            ticket_number=ticket_number,
-            amount_usd=amount_usd,
-            description=description,
-            payment_url=payment_url,
-            dispute_url=dispute_url,
-            due_date=parsed_due_date,
-            image_url=image_url,
-            status=TicketStatus.en_cours
+        db.query(Ticket).filter(Ticket.id == ticket_id).update(
+            {"image_display_url": display_url, "image_thumbnail_url": thumbnail_url},
+            synchronize_session=False
         )
-        db.add(new_ticket)
         db.commit()
-        db.refresh(new_ticket)
+    finally:
+        db.close()
+
+
+def _variant_keys(image_key: str) -> dict:
+    """Clés de stockage des variantes d'une image (à côté de l'original)."""
+    directory, filename = os.path.split(image_key)
+    names = variant_filenames(os.path.splitext(filename)[0])
+    return {name: f"{directory}/{variant}" if directory else variant for name, variant in names.items()}
+
+
+def _replace_incoming_image(incoming_key: str, stored: StoredUpload):
+    """
+    Publie la copie sans métadonnées d'une image déposée dans `incoming/` sous
+    sa clé adressée par contenu, repointe les contraventions qui la
+    référencent, puis supprime l'objet `incoming/`.
+
+    Les verrous des deux images sont pris avant la publication : ni une
+    libération concurrente de l'image publiée (partagée), ni une nouvelle
+    référence à l'objet `incoming/` ne peuvent s'intercaler. Une création qui
+    attendait ce verrou trouve l'objet supprimé et est refusée (409).
+    Exécutée dans le threadpool, depuis la tâche de fond.
+    """
+    storage = get_storage()
+    incoming_url = storage.public_url(incoming_key)
+    published_url = storage.public_url(stored.filename)
+    db = SessionLocal()
+    try:
+        for url in sorted((incoming_url, published_url)):
+            lock_image_blob(db, url)
+        stored.publish(storage)
+        db.query(Ticket).filter(Ticket.image_url == incoming_url).update(
+            {"image_url": published_url}, synchronize_session=False
+        )
+        storage.delete(incoming_key)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        stored.discard()
+        db.close()
+
+
+def _current_image_key(ticket_id: int) -> Optional[str]:
+    """Clé de stockage de l'image actuellement référencée par une contravention."""
+    db = SessionLocal()
+    try:
+        image_url = db.query(Ticket.image_url).filter(Ticket.id == ticket_id).scalar()
+    finally:
+        db.close()
+    return get_storage().key_from_url(image_url)
+
+
+async def _publish_incoming_image(ticket_id: int, image_key: str) -> Optional[str]:
+    """
+    Image déposée directement dans le bucket (URL présignée) : ses métadonnées
+    n'ont pas pu être retirées à la réception. Elles sont retirées ici et la
+    copie nettoyée est publiée sous une nouvelle clé : un objet servi comme
+    immuable n'est jamais réécrit sur place.
+
+    Returns:
+        Optional[str]: Clé publiée (celle déjà référencée si une tâche
+        précédente a traité le même dépôt), ou None si l'image a disparu
+    """
+    storage = get_storage()
+    info = await run_in_threadpool(storage.stat, image_key)
+    if info is None:
+        return await run_in_threadpool(_current_image_key, ticket_id)
+
+    with storage.local_copy(image_key) as source_path:
+        stored = StoredUpload(temp_path=source_path, filename=image_key, sha256="", size=0, content_type=info.content_type)
+        await asyncio.get_running_loop().run_in_executor(get_image_executor(), strip_image_metadata, source_path)
+        await run_in_threadpool(stored.refresh_digest)
+        await run_in_threadpool(_replace_incoming_image, image_key, stored)
+    return stored.filename
+
+
+async def generate_ticket_image_variants(ticket_id: int, image_key: str):
+    """
+    Tâche de fond lancée après la création d'une contravention : génère la
+    version d'affichage et la miniature dans le pool de processus dédié,
+    les dépose dans le stockage, puis enregistre leurs URLs.
+    Si la même image a déjà été traitée, les variantes existantes sont réutilisées.
+    Une image déposée dans le bucket est d'abord publiée sans métadonnées
+    (`_publish_incoming_image`).
+    """
+    storage = get_storage()
+    try:
+        if image_key.startswith(f"{INCOMING_PREFIX}/") and not isinstance(storage, LocalStorage):
+            image_key = await _publish_incoming_image(ticket_id, image_key)
+            if image_key is None:
+                return
+        variant_keys = _variant_keys(image_key)
+        already_generated = await run_in_threadpool(
+            lambda: all(storage.exists(key) for key in variant_keys.values())
+        )
+        if not already_generated:
+            with tempfile.TemporaryDirectory(dir=UPLOAD_DIRECTORY, prefix=".variants-") as output_dir:
+                with storage.local_copy(image_key) as source_path:
+                    loop = asyncio.get_running_loop()
+                    variants = await loop.run_in_executor(
+                        get_image_executor(), process_ticket_image, source_path, output_dir,
+                        os.path.splitext(os.path.basename(image_key))[0]
+                    )
+                if not variants:
+                    return
+                for name, key in variant_keys.items():
+                    await run_in_threadpool(storage.put_file, os.path.join(output_dir, variants[name]), key)
+        await run_in_threadpool(
+            _save_image_variant_urls,
+            ticket_id,
+            storage.public_url(variant_keys["display"]),
+            storage.public_url(variant_keys["thumbnail"]),
+        )
+    except Exception as e:
+        print(f"❌ Erreur lors du traitement de l'image de la contravention {ticket_id} : {e}")
+
+
+def _image_keys(ticket: Ticket) -> List[str]:
+    """Clés de stockage des fichiers image d'une contravention (original et variantes)."""
+    storage = get_storage()
+    urls = [ticket.image_url, ticket.image_display_url, ticket.image_thumbnail_url]
+    # Les images externes (URL http(s) importées) ne sont pas dans notre stockage
+    return [key for key in (storage.key_from_url(url) for url in urls) if key]
+
+
+@router.post("/", status_code=201, openapi_extra=_CREATE_TICKET_REQUEST_BODY)
+async def create_ticket(request: Request, background_tasks: BackgroundTasks):
+    """
+    Crée une nouvelle contravention pour un utilisateur et stocke l'image associée.
+    Les données sont envoyées en 'multipart/form-data'.
+
+    L'image est fournie de l'une des deux façons suivantes :
+    - `image_key` : clé obtenue par POST /storage/presign, après que le client a
+      déposé la photo directement dans le stockage (recommandé) ;
+    - `image` : fichier envoyé dans la requête. Le formulaire est lu
+      directement depuis le flux de la requête : l'image est écrite une seule
+      fois sur disque, et la requête est refusée dès que son format réel n'est
+      pas reconnu ou que sa taille dépasse TICKET_IMAGE_MAX_BYTES, sans
+      attendre la fin de l'envoi. Elle est stockée sous son empreinte
+      SHA-256 : une photo déjà envoyée n'est pas dupliquée.
+
+    La connexion à la base n'est prise qu'une fois l'image vérifiée.
+    Les variantes (affichage, miniature) sont générées en tâche de fond.
+    """
+    try:
+        fields, stored = await parse_multipart_upload(request, "image", UPLOAD_DIRECTORY, TICKET_IMAGE_MAX_BYTES)
+    except UploadRejected as e:
+        raise HTTPException(status_code=e.status_code, detail=e.detail)
 
-        return {
-            "message": "Contravention créée avec succès",
-            "ticket_id": new_ticket.id,
+    try:
+        form = TicketCreateForm.model_validate(fields)
+        if (stored is None) == (form.image_key is None):
+            raise HTTPException(status_code=400, detail="Fournissez soit 'image', soit 'image_key'.")
+        # Valider les champs simples avant de traiter l'image
+        parsed_due_date = _parse_due_date(form.due_date)
+    except ValidationError as e:
+        if stored is not None:
+            stored.discard()
+        raise RequestValidationError([{**error, "loc": ("body", *error["loc"])} for error in e.errors()])
+    except HTTPException:
+        if stored is not None:
+            stored.discard()
+        raise
+
+    if stored is None:
+        # Image déjà déposée dans le stockage par le client
+        image_key = form.image_key
+        image_url = await run_in_threadpool(_check_uploaded_image, image_key)
+    else:
+        # L'original est servi publiquement : retirer EXIF/GPS avant de le publier
+        try:
+            await strip_upload_metadata(stored)
+        except Exception as e:
+            stored.discard()
+            raise HTTPException(status_code=500, detail=f"Erreur lors du traitement de l'image : {e}")
+        # Générer l'URL qui sera stockée en base de données et accessible par l'API
+        image_key = stored.filename
+        image_url = get_storage().public_url(image_key)
+
+    # Créer la contravention en base de données
+    try:
+        new_ticket = await run_in_threadpool(_insert_ticket, form.email, {
+            "ticket_number": form.ticket_number,
+            "amount_usd": form.amount_usd,
+            "description": form.description,
+            "payment_url": form.payment_url,
+            "dispute_url": form.dispute_url,
+            "due_date": parsed_due_date,
             "image_url": image_url,
-            "payment_url": new_ticket.payment_url,
-            "dispute_url": new_ticket.dispute_url,
-            "due_date": new_ticket.due_date.isoformat() if new_ticket.due_date else None
-        }
+        }, stored, None if stored else image_key)
     except Exception as e:
-        db.rollback()
-        # En cas d'erreur avec la BDD, on supprime l'image qui a été uploadée
-        if os.path.exists(file_path):
-            os.remove(file_path)
+        # En cas d'erreur avec la BDD, on supprime le fichier temporaire.
+        # Une image déjà publiée (et peut-être partagée) est laissée en place.
+        if stored is not None:
+            stored.discard()
+        if isinstance(e, HTTPException):
+            raise
         raise HTTPException(status_code=500, detail=f"Erreur lors de la création de la contravention: {e}")
 
+    background_tasks.add_task(generate_ticket_image_variants, new_ticket.id, image_key)
+
+    return {
+        "message": "Contravention créée avec succès",
+        "ticket_id": new_ticket.id,
+        "image_url": image_url,
+        "image_sha256": stored.sha256 if stored else None,
+        "payment_url": new_ticket.payment_url,
+        "dispute_url": new_ticket.dispute_url,
+        "due_date": new_ticket.due_date.isoformat() if new_ticket.due_date else None
+    }
 
-@router.get("/user/{email}")
+
+@router.get("/user/{email}", response_model=List[TicketResponse])
 def get_user_tickets(email: str, db: Session = Depends(get_db)):
     """
     Récupère l'historique de toutes les contraventions pour un utilisateur.
     """
     user = get_user_by_email(email, db)
     tickets = db.query(Ticket).filter(Ticket.user_id == user.id).order_by(Ticket.created_at.desc()).all()
-    
-    return [
-        {
-            "id": t.id,
-            "ticket_number": t.ticket_number,
-            "description": t.description,
-            "amount_usd": float(t.amount_usd),
-            "payment_url": t.payment_url,
-            "dispute_url": t.dispute_url,
-            "due_date": t.due_date.isoformat() if t.due_date else None,
-            "image_url": t.image_url,
-            "status": t.status.value,
-            "created_at": t.created_at.isoformat()
-        } for t in tickets
-    ]
+
+    return json_list_response(TicketListSerializer, tickets)
+
+@router.get("/user/{email}/summary", response_model=TicketSummaryResponse)
+def get_user_ticket_summary(email: str, db: Session = Depends(get_db)):
+    """
+    Résumé pour l'écran d'accueil : nombre de contraventions en cours, montant
+    total restant dû, prochaine échéance et nombre de rappels actifs.
+    Lit une seule ligne de `user_ticket_summary`, tenue à jour par les triggers.
+    """
+    row = (
+        db.query(User.id, UserTicketSummary)
+        .outerjoin(UserTicketSummary, UserTicketSummary.user_id == User.id)
+        .filter(User.email == email)
+        .first()
+    )
+    if not row:
+        raise HTTPException(status_code=404, detail=f"Utilisateur avec l'email '{email}' non trouvé.")
+
+    summary = row[1]
+    if summary is None:
+        # Aucun ticket ni rappel enregistré pour cet utilisateur
+        return TicketSummaryResponse()
+    return TicketSummaryResponse.model_validate(summary)
+
 
 @router.put("/{ticket_id}")
 def update_ticket(
@@ -181,27 +531,319 @@ def update_ticket(
 @router.delete("/{ticket_id}")
 def delete_ticket(ticket_id: int, db: Session = Depends(get_db)):
     """
-    Supprime une contravention et son image associée du serveur.
+    Supprime une contravention, et son image associée du serveur si elle n'est
+    plus utilisée par aucune autre contravention.
     """
     ticket = db.query(Ticket).filter(Ticket.id == ticket_id).first()
     if not ticket:
         raise HTTPException(status_code=404, detail="Contravention non trouvée.")
 
-    image_path_to_delete = None
-    if ticket.image_url:
-        # L'URL est /static/..., on enlève le / au début pour avoir un chemin relatif
-        image_path_to_delete = ticket.image_url.lstrip('/')
+    image_url = ticket.image_url
+    image_keys_to_delete = _image_keys(ticket)
 
     try:
     
         db.delete(ticket)
         db.commit()
 
-        # On supprime le fichier image seulement si la transaction BDD a réussi
-        if image_path_to_delete and os.path.exists(image_path_to_delete):
-            os.remove(image_path_to_delete)
+        # On supprime les fichiers image seulement si la transaction BDD a réussi
+        _release_image_blob(image_url, image_keys_to_delete)
 
         return {"message": "Contravention supprimée avec succès."}
     except Exception as e:
         db.rollback()
-        raise HTTPException(status_code=500, detail=f"Erreur lors de la suppression : {e}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"Erreur lors de la suppression : {e}")
+
+
+# --- Import en masse de contraventions ---
+
+def _detect_import_format(upload: UploadFile, file_format: Optional[str]) -> str:
+    """Détermine le format du fichier d'import (csv ou ndjson)."""
+    if file_format:
+        file_format = file_format.lower()
+    else:
+        extension = os.path.splitext(upload.filename or "")[1].lower()
+        file_format = {".csv": "csv", ".ndjson": "ndjson", ".jsonl": "ndjson", ".json": "ndjson"}.get(extension)
+
+    if file_format not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="Format de fichier non supporté. Utilisez 'csv' ou 'ndjson'.")
+    return file_format
+
+
+def _iter_import_rows(text_stream, file_format: str) -> Iterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """
+    Lit le fichier ligne par ligne sans le charger entièrement en mémoire.
+    Produit des tuples (numéro de ligne, données brutes, erreur de lecture).
+    """
+    if file_format == "csv":
+        reader = csv.DictReader(text_stream)
+        # La ligne 1 est l'en-tête
+        for line_number, raw_row in enumerate(reader, start=2):
+            # Les cellules vides du CSV correspondent à des valeurs absentes
+            yield line_number, {k: (v if v != "" else None) for k, v in raw_row.items() if k}, None
+        return
+
+    for line_number, line in enumerate(text_stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            raw_row = json.loads(line)
+        except json.JSONDecodeError as e:
+            yield line_number, None, f"JSON invalide : {e.msg}"
+            continue
+        if not isinstance(raw_row, dict):
+            yield line_number, None, "Chaque ligne doit être un objet JSON"
+            continue
+        yield line_number, raw_row, None
+
+
+def _format_validation_error(error: ValidationError) -> str:
+    """Résume une erreur Pydantic en un message lisible par ligne."""
+    return "; ".join(
+        f"{'.'.join(str(loc) for loc in err['loc']) or 'ligne'}: {err['msg']}" for err in error.errors()
+    )
+
+
+def _load_ticket_batch(db: Session, rows: List[dict]):
+    """
+    Insère un lot de contraventions dans la transaction courante.
+    Utilise COPY sur PostgreSQL (un seul aller-retour par lot), executemany sinon.
+    """
+    connection = db.connection()
+    if connection.dialect.name != "postgresql":
+        db.execute(insert(Ticket), rows)
+        return
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        # En format CSV, une cellule vide non quotée est lue comme NULL par COPY
+        writer.writerow([
+            row[column].isoformat() if isinstance(row[column], datetime) else row[column]
+            for column in IMPORT_COPY_COLUMNS
+        ])
+    buffer.seek(0)
+
+    cursor = connection.connection.cursor()
+    try:
+        cursor.copy_expert(
+            f"COPY tickets ({', '.join(IMPORT_COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+            buffer
+        )
+    finally:
+        cursor.close()
+
+
+def _format_database_error(error: Exception) -> str:
+    """Première ligne du message d'erreur renvoyé par la base."""
+    message = str(getattr(error, "orig", None) or error).strip()
+    return message.splitlines()[0] if message else type(error).__name__
+
+
+def _load_ticket_batch_with_row_errors(db: Session, rows: List[dict], line_numbers: List[int]) -> List[dict]:
+    """
+    Charge un lot dans un point de sauvegarde. Si la base refuse le lot
+    (contrainte non couverte par la validation), il est rejoué ligne par ligne,
+    chacune dans son propre point de sauvegarde : les lignes refusées sont
+    ignorées, comme les lignes invalides, au lieu de faire échouer l'import.
+
+    Returns:
+        List[dict]: Erreurs des lignes refusées ({"row": ..., "error": ...})
+    """
+    # Le COPY passe par le curseur du pilote : ses erreurs ne sont pas enveloppées par SQLAlchemy
+    database_errors = (DBAPIError, db.get_bind().dialect.dbapi.Error)
+    try:
+        with db.begin_nested():
+            _load_ticket_batch(db, rows)
+        return []
+    except database_errors:
+        pass
+
+    rejected = []
+    for line_number, row in zip(line_numbers, rows):
+        try:
+            with db.begin_nested():
+                _load_ticket_batch(db, [row])
+        except database_errors as e:
+            rejected.append({"row": line_number, "error": _format_database_error(e)})
+    return rejected
+
+
+def _check_import_image(db: Session, user: User, image_url: str) -> Optional[str]:
+    """
+    Vérifie qu'une image du stockage référencée par une ligne d'import
+    appartient à l'utilisateur : image qu'il a lui-même déposée (clé présignée
+    `incoming/<user_id>/...`) ou déjà utilisée par l'une de ses contraventions.
+    Une image déposée par URL présignée passe les mêmes contrôles qu'à la
+    création (`_check_uploaded_image` : taille et format réel).
+
+    Le verrou de l'image est pris avant de vérifier sa présence et gardé
+    jusqu'à la fin de la transaction d'import : une suppression concurrente
+    (dernière contravention qui la référence) attend la fin de l'import.
+
+    Returns:
+        Optional[str]: Message d'erreur, ou None si l'image est utilisable
+    """
+    key = get_storage().key_from_url(image_url)
+    if key is None:
+        return None
+
+    owned = key.startswith(f"{INCOMING_PREFIX}/{user.id}/") or db.query(Ticket.id).filter(
+        Ticket.user_id == user.id,
+        Ticket.image_url == image_url,
+    ).first() is not None
+    if not owned:
+        return f"image_url: cette image n'appartient pas à cet utilisateur : {image_url}"
+
+    lock_image_blob(db, image_url)
+    if key.startswith(f"{INCOMING_PREFIX}/"):
+        try:
+            _check_uploaded_image(key)
+        except HTTPException as e:
+            return f"image_url: {e.detail} ({image_url})"
+        return None
+    try:
+        found = get_storage().exists(key)
+    except ValueError:
+        found = False
+    if not found:
+        return f"image_url: image introuvable dans le stockage : {image_url}"
+    return None
+
+
+def _enqueue_imported_image_variants(db: Session, user: User, image_urls: set, background_tasks: BackgroundTasks):
+    """
+    Lance la génération des variantes (affichage, miniature) des images du
+    stockage référencées par les contraventions importées, comme à la création.
+    COPY ne renvoie pas les identifiants : les contraventions sont retrouvées
+    par leur image, parmi celles de l'utilisateur encore sans variantes.
+    """
+    if not image_urls:
+        return
+    storage = get_storage()
+    tickets = db.query(Ticket.id, Ticket.image_url).filter(
+        Ticket.user_id == user.id,
+        Ticket.image_url.in_(image_urls),
+        Ticket.image_display_url.is_(None),
+    ).all()
+    for ticket_id, image_url in tickets:
+        background_tasks.add_task(generate_ticket_image_variants, ticket_id, storage.key_from_url(image_url))
+
+
+@router.post("/import", status_code=200)
+def import_tickets(
+    background_tasks: BackgroundTasks,
+    db: Session = Depends(get_db),
+    email: str = Form(...),
+    file: UploadFile = File(...),
+    file_format: Optional[str] = Form(None),
+    dry_run: bool = Form(False)
+):
+    """
+    Importe en masse des contraventions depuis un fichier CSV (avec en-tête) ou NDJSON.
+
+    Colonnes attendues : ticket_number, amount_usd, dispute_url et, en option,
+    description, payment_url, due_date (ISO) et image_url (URL http(s), ou image
+    du stockage déposée par l'utilisateur ou déjà utilisée par l'une de ses
+    contraventions).
+
+    Les lignes sont validées au fil de la lecture. Les lignes valides sont chargées
+    par lots (COPY) dans une seule transaction ; les lignes invalides, ou refusées
+    par la base, sont ignorées et renvoyées dans `errors` avec leur numéro de ligne.
+    Avec `dry_run=true`, le fichier est seulement validé.
+    Les variantes des images du stockage sont générées en tâche de fond.
+    """
+    user = get_user_by_email(email, db)
+    file_format = _detect_import_format(file, file_format)
+
+    total_rows = 0
+    imported = 0
+    failed = 0
+    errors = []
+    batch = []
+    batch_lines = []
+    # Résultat de la vérification de chaque image du stockage déjà rencontrée
+    checked_images = {}
+
+    def flush_batch():
+        nonlocal imported, failed
+        rejected = [] if dry_run else _load_ticket_batch_with_row_errors(db, batch, batch_lines)
+        imported += len(batch) - len(rejected)
+        failed += len(rejected)
+        errors.extend(rejected[:max(IMPORT_MAX_REPORTED_ERRORS - len(errors), 0)])
+        batch.clear()
+        batch_lines.clear()
+
+    try:
+        text_stream = io.TextIOWrapper(file.file, encoding="utf-8-sig", newline="")
+        for line_number, raw_row, read_error in _iter_import_rows(text_stream, file_format):
+            total_rows += 1
+            if total_rows > IMPORT_MAX_ROWS:
+                db.rollback()
+                raise HTTPException(status_code=413, detail=f"Le fichier dépasse la limite de {IMPORT_MAX_ROWS} lignes.")
+
+            error_message = read_error
+            if raw_row is not None:
+                try:
+                    row = TicketImportRow.model_validate(raw_row)
+                except ValidationError as e:
+                    error_message = _format_validation_error(e)
+                else:
+                    if row.image_url is not None:
+                        if row.image_url not in checked_images:
+                            checked_images[row.image_url] = _check_import_image(db, user, row.image_url)
+                        error_message = checked_images[row.image_url]
+
+            if error_message:
+                failed += 1
+                if len(errors) < IMPORT_MAX_REPORTED_ERRORS:
+                    errors.append({"row": line_number, "error": error_message})
+                continue
+
+            batch.append({
+                "user_id": user.id,
+                "ticket_number": row.ticket_number,
+                "description": row.description,
+                "amount_usd": row.amount_usd,
+                "due_date": row.due_date,
+                "dispute_url": row.dispute_url,
+                "image_url": row.image_url,
+                "payment_url": row.payment_url,
+                "status": TicketStatus.en_cours.value,
+            })
+            batch_lines.append(line_number)
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                flush_batch()
+
+        if batch:
+            flush_batch()
+
+        if dry_run:
+            db.rollback()
+        else:
+            db.commit()
+            stored_images = [url for url, error in checked_images.items() if error is None and get_storage().key_from_url(url)]
+            _enqueue_imported_image_variants(db, user, set(stored_images), background_tasks)
+    except HTTPException:
+        raise
+    except UnicodeDecodeError:
+        db.rollback()
+        raise HTTPException(status_code=400, detail="Le fichier doit être encodé en UTF-8.")
+    except Exception as e:
+        db.rollback()
+        raise HTTPException(status_code=500, detail=f"Erreur lors de l'import des contraventions : {e}")
+    finally:
+        file.file.close()
+
+    # Les lignes refusées par la base ne sont connues qu'au chargement du lot
+    errors.sort(key=lambda error: error["row"])
+    return {
+        "message": "Validation terminée" if dry_run else "Import terminé",
+        "format": file_format,
+        "dry_run": dry_run,
+        "total_rows": total_rows,
+        "imported": imported,
+        "failed": failed,
+        "errors": errors,
+        "errors_truncated": failed > len(errors)
+    }
@@ -0,0 +1,108 @@
+import os
+from datetime import datetime, timezone
+from typing import Optional
+
+from sqlalchemy import select, delete
+from sqlalchemy.orm import Session
+
+from databaseone import SessionLocal
+from models.models import PasswordResetToken, EmailVerificationCode
+
+
+# --- Configuration du nettoyage ---
+# Nombre maximum de lignes supprimées par transaction (évite les verrous longs)
+TOKEN_SWEEP_BATCH_SIZE = int(os.getenv("TOKEN_SWEEP_BATCH_SIZE", "1000"))
+# Nombre maximum de lots par exécution, pour borner la durée d'un passage
+TOKEN_SWEEP_MAX_BATCHES = int(os.getenv("TOKEN_SWEEP_MAX_BATCHES", "50"))
+# Intervalle entre deux passages du nettoyeur
+TOKEN_SWEEP_INTERVAL_SECONDS = int(os.getenv("TOKEN_SWEEP_INTERVAL_SECONDS", "600"))
+
+# Compteurs cumulés depuis le démarrage du processus
+SWEEPER_METRICS = {
+    "runs": 0,
+    "password_reset_tokens_deleted": 0,
+    "email_verification_codes_deleted": 0,
+    "last_run_at": None,
+    "last_run_deleted": 0,
+}
+
+
+def _delete_expired_batch(db: Session, model, now: datetime, batch_size: int) -> int:
+    """
+    Supprime un lot de lignes expirées et valide la transaction.
+
+    Les identifiants sont sélectionnés avec `FOR UPDATE SKIP LOCKED` : deux
+    workers qui nettoient en même temps ne se bloquent pas mutuellement.
+    """
+    expired_ids = (
+        select(model.id)
+        .where(model.expires_at < now)
+        .order_by(model.expires_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    result = db.execute(
+        delete(model)
+        .where(model.id.in_(expired_ids))
+        .execution_options(synchronize_session=False)
+    )
+    db.commit()
+    return result.rowcount or 0
+
+
+def _sweep_table(db: Session, model, now: datetime, batch_size: int, max_batches: int) -> int:
+    """Supprime les lignes expirées d'une table, lot par lot."""
+    total_deleted = 0
+    for _ in range(max_batches):
+        deleted = _delete_expired_batch(db, model, now, batch_size)
+        total_deleted += deleted
+        if deleted < batch_size:
+            break
+    return total_deleted
+
+
+def sweep_expired_tokens(
+    db: Optional[Session] = None,
+    batch_size: int = TOKEN_SWEEP_BATCH_SIZE,
+    max_batches: int = TOKEN_SWEEP_MAX_BATCHES,
+) -> dict:
+    """
+    Supprime les jetons de réinitialisation et les codes de vérification expirés.
+
+    Args:
+        db: Session optionnelle (une session dédiée est ouverte sinon)
+        batch_size: Nombre de lignes supprimées par transaction
+        max_batches: Nombre maximum de lots par table pour ce passage
+
+    Returns:
+        dict: Nombre de lignes supprimées par table pour ce passage
+    """
+    owns_session = db is None
+    if owns_session:
+        db = SessionLocal()
+
+    try:
+        now = datetime.now(timezone.utc)
+        reset_deleted = _sweep_table(db, PasswordResetToken, now, batch_size, max_batches)
+        codes_deleted = _sweep_table(db, EmailVerificationCode, now, batch_size, max_batches)
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        if owns_session:
+            db.close()
+
+    SWEEPER_METRICS["runs"] += 1
+    SWEEPER_METRICS["password_reset_tokens_deleted"] += reset_deleted
+    SWEEPER_METRICS["email_verification_codes_deleted"] += codes_deleted
+    SWEEPER_METRICS["last_run_at"] = now.isoformat()
+    SWEEPER_METRICS["last_run_deleted"] = reset_deleted + codes_deleted
+
+    if reset_deleted or codes_deleted:
+        print(f"🧹 Nettoyage : {reset_deleted} jeton(s) de réinitialisation et {codes_deleted} code(s) de vérification expirés supprimés.")
+
+    return {
+        "password_reset_tokens_deleted": reset_deleted,
+        "email_verification_codes_deleted": codes_deleted,
+    }
@@ -0,0 +1,419 @@
+import os
+import uuid
+import asyncio
+import hashlib
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+import anyio
+import multipart
+from multipart.multipart import parse_options_header
+from fastapi import Request, UploadFile
+from fastapi.responses import ORJSONResponse
+from starlette.datastructures import Headers
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from .storage import StorageBackend
+from .image_pipeline import get_image_executor, strip_image_metadata
+
+
+# --- Configuration des uploads d'images ---
+# Taille maximale d'une image de contravention (10 Mo par défaut)
+TICKET_IMAGE_MAX_BYTES = int(os.getenv("TICKET_IMAGE_MAX_BYTES", str(10 * 1024 * 1024)))
+# Taille des blocs lus puis écrits sur le disque
+UPLOAD_CHUNK_SIZE = 64 * 1024
+# Taille maximale des champs texte d'un formulaire multipart (marge ajoutée à la limite du corps)
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+
+class UploadRejected(Exception):
+    """Upload refusé (trop volumineux, type non supporté...)."""
+
+    def __init__(self, status_code: int, detail: str):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+
+
+@dataclass
+class StoredUpload:
+    """
+    Image reçue, écrite dans un fichier temporaire en attente de publication.
+
+    `filename` est la clé de stockage adressée par contenu (ex: ab/cd/abcd...jpg) :
+    deux uploads identiques aboutissent au même objet.
+    """
+    temp_path: str
+    filename: str
+    sha256: str
+    size: int
+    content_type: str
+
+    def publish(self, storage: StorageBackend) -> bool:
+        """
+        Dépose le fichier dans le stockage sous sa clé définitive.
+        Si une image identique existe déjà, le fichier temporaire est simplement supprimé.
+
+        Returns:
+            bool: True si l'image existait déjà (doublon)
+        """
+        if storage.exists(self.filename):
+            self.discard()
+            return True
+        storage.put_file(self.temp_path, self.filename, self.content_type)
+        return False
+
+    def discard(self):
+        """Supprime le fichier temporaire s'il existe encore."""
+        if os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+    def refresh_digest(self):
+        """Recalcule empreinte, taille et clé après réécriture du fichier temporaire."""
+        digest = hashlib.sha256()
+        with open(self.temp_path, "rb") as f:
+            for chunk in iter(lambda: f.read(UPLOAD_CHUNK_SIZE), b""):
+                digest.update(chunk)
+        self.sha256 = digest.hexdigest()
+        self.size = os.path.getsize(self.temp_path)
+        self.filename = content_addressed_name(self.sha256, os.path.splitext(self.filename)[1])
+
+
+async def strip_upload_metadata(stored: StoredUpload):
+    """
+    Retire les métadonnées (EXIF, GPS...) de l'image reçue avant sa publication,
+    dans le pool de processus des images. La clé adressée par contenu est
+    recalculée si le fichier a été réécrit.
+    """
+    loop = asyncio.get_running_loop()
+    if await loop.run_in_executor(get_image_executor(), strip_image_metadata, stored.temp_path):
+        await anyio.to_thread.run_sync(stored.refresh_digest)
+
+
+def content_addressed_name(sha256: str, extension: str) -> str:
+    """
+    Chemin relatif d'une image d'après son empreinte SHA-256, réparti sur deux
+    niveaux de sous-dossiers (ex: ab/cd/abcd....jpg) pour garder des dossiers courts.
+    """
+    return f"{sha256[:2]}/{sha256[2:4]}/{sha256}{extension}"
+
+
+def lock_image_blob(db: Session, image_url: str):
+    """
+    Verrou transactionnel (advisory lock PostgreSQL) sur une image partagée.
+
+    Pris à la création d'une contravention (vérification que le fichier publié
+    existe encore + insertion de la référence) et à la libération de l'image
+    (comptage des références + suppression) : une image ne peut pas être
+    supprimée pendant qu'un nouvel upload la réutilise.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text("SELECT pg_advisory_xact_lock(hashtext(:key))"), {"key": image_url})
+
+
+def sniff_image_type(header: bytes) -> Optional[Tuple[str, str]]:
+    """
+    Identifie le format d'une image à partir de ses premiers octets (magic bytes).
+    Le type annoncé par le client et l'extension du fichier ne sont pas fiables.
+
+    Returns:
+        (content_type, extension) ou None si le format n'est pas reconnu
+    """
+    if header.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg", ".jpg"
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png", ".png"
+    if header.startswith((b"GIF87a", b"GIF89a")):
+        return "image/gif", ".gif"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "image/webp", ".webp"
+    if header[4:8] == b"ftyp" and header[8:12] in (b"heic", b"heix", b"mif1", b"msf1", b"hevc"):
+        return "image/heic", ".heic"
+    return None
+
+
+def _fsync_and_close(file_obj):
+    """Force l'écriture sur disque avant de publier le fichier."""
+    file_obj.flush()
+    os.fsync(file_obj.fileno())
+    file_obj.close()
+
+
+class _ImageSink:
+    """
+    Reçoit une image bloc par bloc et l'écrit dans un fichier temporaire :
+    type vérifié dès les premiers octets (magic bytes), taille contrôlée au fil
+    de l'eau, SHA-256 calculé pendant l'écriture. Les écritures disque passent
+    par un thread pour ne pas bloquer la boucle d'événements.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hasher = hashlib.sha256()
+        self.size = 0
+        self.image_type: Optional[Tuple[str, str]] = None
+        self.temp_path: Optional[str] = None
+        self._temp_file = None
+        self._header = b""
+
+    async def write(self, chunk: bytes):
+        if not chunk:
+            return
+        self.size += len(chunk)
+        if self.size > self.max_bytes:
+            raise UploadRejected(413, f"L'image dépasse la taille maximale autorisée ({self.max_bytes // (1024 * 1024)} Mo).")
+        self.hasher.update(chunk)
+
+        if self.image_type is None:
+            # Rien n'est écrit sur disque tant que le format n'est pas reconnu
+            self._header += chunk
+            if len(self._header) < 16:
+                return
+            self._check_type()
+            chunk, self._header = self._header, b""
+
+        if self._temp_file is None:
+            self.temp_path = os.path.join(self.directory, f".{uuid.uuid4().hex}.part")
+            self._temp_file = await anyio.to_thread.run_sync(open, self.temp_path, "wb")
+        await anyio.to_thread.run_sync(self._temp_file.write, chunk)
+
+    def _check_type(self):
+        self.image_type = sniff_image_type(self._header[:16])
+        if self.image_type is None:
+            raise UploadRejected(415, "Format d'image non supporté (JPEG, PNG, GIF, WebP ou HEIC attendu).")
+
+    async def finish(self) -> StoredUpload:
+        """Termine l'écriture (fichier synchronisé sur disque) et retourne l'image reçue."""
+        if self.size == 0:
+            raise UploadRejected(400, "Le fichier image est vide.")
+        if self.image_type is None:
+            # Image de moins de 16 octets
+            self._check_type()
+            await self._flush_header()
+        await anyio.to_thread.run_sync(_fsync_and_close, self._temp_file)
+        self._temp_file = None
+
+        sha256 = self.hasher.hexdigest()
+        content_type, extension = self.image_type
+        return StoredUpload(
+            temp_path=self.temp_path,
+            filename=content_addressed_name(sha256, extension),
+            sha256=sha256,
+            size=self.size,
+            content_type=content_type,
+        )
+
+    async def _flush_header(self):
+        header, self._header = self._header, b""
+        self.temp_path = os.path.join(self.directory, f".{uuid.uuid4().hex}.part")
+        self._temp_file = await anyio.to_thread.run_sync(open, self.temp_path, "wb")
+        await anyio.to_thread.run_sync(self._temp_file.write, header)
+
+    async def abort(self):
+        """Abandonne l'upload : ferme et supprime le fichier temporaire."""
+        if self._temp_file is not None:
+            await anyio.to_thread.run_sync(self._temp_file.close)
+            self._temp_file = None
+        if self.temp_path and os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+
+async def save_upload_stream(upload: UploadFile, directory: str, max_bytes: int = TICKET_IMAGE_MAX_BYTES) -> StoredUpload:
+    """
+    Écrit une image uploadée sur le disque, bloc par bloc, sans bloquer la boucle d'événements.
+
+    - Le type est vérifié dès le premier bloc (magic bytes) : un fichier qui
+      n'est pas une image est refusé avant toute écriture.
+    - La taille est contrôlée au fil de l'eau : l'upload est interrompu dès
+      que `max_bytes` est dépassé.
+    - Le hash SHA-256 est calculé pendant la copie ; il donne le nom définitif.
+    - Le fichier est écrit sous un nom temporaire et synchronisé sur disque.
+      L'appelant le publie ensuite avec `StoredUpload.publish()` : il n'est
+      jamais visible à moitié écrit.
+
+    `upload` peut être un UploadFile ou tout objet exposant `async read(n)`.
+
+    Raises:
+        UploadRejected: Fichier vide, trop volumineux ou format non supporté
+    """
+    sink = _ImageSink(directory, max_bytes)
+    try:
+        chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+        while chunk:
+            await sink.write(chunk)
+            chunk = await upload.read(UPLOAD_CHUNK_SIZE)
+        return await sink.finish()
+    except BaseException:
+        await sink.abort()
+        raise
+
+
+async def parse_multipart_upload(
+    request: Request,
+    file_field: str,
+    directory: str,
+    max_bytes: int = TICKET_IMAGE_MAX_BYTES,
+    max_fields_bytes: int = MULTIPART_OVERHEAD_BYTES,
+) -> Tuple[Dict[str, str], Optional[StoredUpload]]:
+    """
+    Lit un formulaire multipart directement depuis le flux de la requête.
+
+    Contrairement à `request.form()` (qui reçoit tout le corps et le copie
+    dans des fichiers temporaires avant que la route ne s'exécute), l'image
+    du champ `file_field` est écrite directement dans son fichier temporaire
+    définitif (une seule copie), et la requête est refusée dès que le format
+    n'est pas reconnu ou que la taille dépasse `max_bytes`, sans lire la
+    suite du corps. Les champs texte sont limités à `max_fields_bytes` au total.
+
+    Returns:
+        (champs texte, image reçue ou None si le champ est absent ou vide)
+
+    Raises:
+        UploadRejected: Formulaire invalide, image refusée ou champs trop volumineux
+    """
+    _, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if not request.headers.get("content-type", "").startswith("multipart/form-data") or not boundary:
+        raise UploadRejected(400, "Le corps de la requête doit être au format multipart/form-data.")
+
+    fields: Dict[str, str] = {}
+    sink: Optional[_ImageSink] = None
+    # Événements du parseur (synchrone), traités après chaque bloc reçu
+    pending: List[Tuple[str, bytes]] = []
+    part = {"headers": {}, "name": None, "is_file": False, "data": b"", "header_name": b"", "header_value": b""}
+    fields_size = 0
+
+    def on_part_begin():
+        part.update(headers={}, name=None, is_file=False, data=b"")
+
+    def on_header_field(data, start, end):
+        part["header_name"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        part["header_value"] += data[start:end]
+
+    def on_header_end():
+        part["headers"][part["header_name"].lower()] = part["header_value"]
+        part["header_name"] = part["header_value"] = b""
+
+    def on_headers_finished():
+        _, options = parse_options_header(part["headers"].get(b"content-disposition", b""))
+        if b"name" not in options:
+            raise UploadRejected(400, "Formulaire invalide : champ sans nom.")
+        part["name"] = options[b"name"].decode("utf-8", "replace")
+        part["is_file"] = b"filename" in options
+        if part["is_file"]:
+            if part["name"] != file_field:
+                raise UploadRejected(400, f"Champ fichier inattendu : {part['name']}.")
+            pending.append(("file_start", b""))
+
+    def on_part_data(data, start, end):
+        nonlocal fields_size
+        if part["is_file"]:
+            pending.append(("file_data", data[start:end]))
+            return
+        fields_size += end - start
+        if fields_size > max_fields_bytes:
+            raise UploadRejected(413, "Les champs du formulaire sont trop volumineux.")
+        part["data"] += data[start:end]
+
+    def on_part_end():
+        if not part["is_file"]:
+            fields[part["name"]] = part["data"].decode("utf-8", "replace")
+
+    parser = multipart.MultipartParser(boundary, {
+        "on_part_begin": on_part_begin,
+        "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+        "on_header_field": on_header_field,
+        "on_header_value": on_header_value,
+        "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished,
+    })
+
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+            for event, data in pending:
+                if event == "file_start":
+                    if sink is not None:
+                        raise UploadRejected(400, f"Un seul fichier est accepté dans le champ {file_field}.")
+                    sink = _ImageSink(directory, max_bytes)
+                else:
+                    await sink.write(data)
+            pending.clear()
+        parser.finalize()
+
+        # Champ fichier vide (aucun fichier choisi) : équivalent à un champ absent
+        stored = await sink.finish() if sink is not None and sink.size else None
+        return fields, stored
+    except multipart.exceptions.MultipartParseError as e:
+        if sink is not None:
+            await sink.abort()
+        raise UploadRejected(400, f"Formulaire multipart invalide : {e}")
+    except BaseException:
+        if sink is not None:
+            await sink.abort()
+        raise
+
+
+class UploadSizeLimitMiddleware:
+    """
+    Limite la taille du corps des requêtes d'upload (middleware ASGI).
+
+    Un Content-Length trop grand est refusé (413) avant toute lecture. Sans
+    Content-Length (Transfer-Encoding: chunked), les octets sont comptés au
+    fil de la lecture du corps et la lecture s'arrête (413) dès que la
+    limite est dépassée.
+
+    `limits` associe (méthode, chemin) à la taille maximale du corps.
+    """
+
+    def __init__(self, app, limits: Dict[Tuple[str, str], int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        max_body_bytes = None
+        if scope["type"] == "http":
+            max_body_bytes = self.limits.get((scope["method"], scope["path"]))
+        if max_body_bytes is None:
+            await self.app(scope, receive, send)
+            return
+
+        too_large = ORJSONResponse(status_code=413, content={"detail": "L'image dépasse la taille maximale autorisée."})
+        declared_length = Headers(scope=scope).get("content-length", "")
+        if declared_length.isdigit() and int(declared_length) > max_body_bytes:
+            await too_large(scope, receive, send)
+            return
+
+        received = 0
+        response_started = False
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_body_bytes:
+                    raise _BodyTooLarge()
+            return message
+
+        async def tracking_send(message):
+            nonlocal response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, tracking_send)
+        except _BodyTooLarge:
+            if response_started:
+                raise
+            await too_large(scope, receive, send)
+
+
+class _BodyTooLarge(Exception):
+    """Levée par la lecture du corps quand la limite d'`UploadSizeLimitMiddleware` est dépassée."""
@@ -0,0 +1,12 @@
+-- ===========================================================
+-- Migration : index utilisés par le rafraîchissement des rollups analytiques
+-- Description : les tables daily_* sont créées par create_all au démarrage ;
+--               ces index permettent de ne relire que les derniers jours
+--               de subscriptions, payments et tickets à chaque rafraîchissement.
+-- ===========================================================
+
+CREATE INDEX IF NOT EXISTS ix_subscriptions_created_at ON subscriptions (created_at);
+CREATE INDEX IF NOT EXISTS ix_tickets_created_at ON tickets (created_at);
+CREATE INDEX IF NOT EXISTS ix_payments_created_at ON payments (created_at);
+-- Abonnements actifs sur la fenêtre : end_date > début de fenêtre est le critère sélectif
+CREATE INDEX IF NOT EXISTS ix_subscriptions_end_date_start_date ON subscriptions (end_date, start_date);
@@ -0,0 +1,37 @@
+-- ===========================================================
+-- Migration : archivage des sessions de chat fermées
+-- Description : les sessions fermées depuis plus de CHAT_ARCHIVE_AFTER_DAYS
+--               jours sont copiées ici par la tâche `chat_archiver`, puis
+--               supprimées de Firebase Realtime Database.
+-- ===========================================================
+
+CREATE TABLE IF NOT EXISTS chat_session_archives (
+    id             SERIAL PRIMARY KEY,
+    session_key    VARCHAR(255) NOT NULL,
+    user_email     VARCHAR(255) NOT NULL,
+    user_name      VARCHAR(255),
+    subject        VARCHAR(255),
+    admin_name     VARCHAR(255),
+    started_at     TIMESTAMPTZ,
+    closed_at      TIMESTAMPTZ,
+    message_count  INTEGER NOT NULL DEFAULT 0,
+    archived_at    TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS ix_chat_session_archives_id ON chat_session_archives (id);
+CREATE INDEX IF NOT EXISTS ix_chat_session_archives_user_email ON chat_session_archives (user_email);
+CREATE UNIQUE INDEX IF NOT EXISTS uq_chat_session_archives_session_key_closed_at
+    ON chat_session_archives (session_key, closed_at);
+
+CREATE TABLE IF NOT EXISTS chat_archived_messages (
+    id            SERIAL PRIMARY KEY,
+    archive_id    INTEGER NOT NULL REFERENCES chat_session_archives (id) ON DELETE CASCADE,
+    message_id    VARCHAR(64) COLLATE "C" NOT NULL,
+    sender        VARCHAR(50) NOT NULL,
+    sender_email  VARCHAR(255),
+    content       TEXT NOT NULL,
+    sent_at       VARCHAR(64)
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_chat_archived_messages_archive_id_message_id
+    ON chat_archived_messages (archive_id, message_id);
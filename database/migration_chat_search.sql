@@ -0,0 +1,28 @@
+-- ===========================================================
+-- Migration : recherche plein texte dans les conversations de chat
+-- Description : chaque message (session en cours ou archivée) est copié
+--               dans `chat_message_search` ; la colonne `search_vector`
+--               est calculée par PostgreSQL (colonne générée, PostgreSQL 12+)
+--               et indexée en GIN. Après la migration, la tâche
+--               `chat_search_indexer` indexe l'historique existant.
+-- ===========================================================
+
+CREATE TABLE IF NOT EXISTS chat_message_search (
+    id             SERIAL PRIMARY KEY,
+    session_key    VARCHAR(255) NOT NULL,
+    user_email     VARCHAR(255) NOT NULL,
+    message_id     VARCHAR(64) COLLATE "C" NOT NULL,
+    sender         VARCHAR(50) NOT NULL,
+    content        TEXT NOT NULL,
+    sent_at        VARCHAR(64),
+    archive_id     INTEGER REFERENCES chat_session_archives (id) ON DELETE CASCADE,
+    -- Même configuration que CHAT_SEARCH_TS_CONFIG (controller/chat_search.py)
+    search_vector  TSVECTOR GENERATED ALWAYS AS (to_tsvector('french', content)) STORED
+);
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_chat_message_search_session_key_message_id
+    ON chat_message_search (session_key, message_id);
+CREATE INDEX IF NOT EXISTS ix_chat_message_search_user_email ON chat_message_search (user_email);
+CREATE INDEX IF NOT EXISTS ix_chat_message_search_archive_id ON chat_message_search (archive_id);
+CREATE INDEX IF NOT EXISTS ix_chat_message_search_search_vector
+    ON chat_message_search USING GIN (search_vector);
@@ -0,0 +1,15 @@
+-- ===========================================================
+-- Migration : nettoyage des images orphelines
+-- Description : table des curseurs de reprise des tâches incrémentales et
+--               index permettant de vérifier par lots si une image (ou une
+--               de ses variantes) est encore référencée.
+-- ===========================================================
+
+CREATE TABLE IF NOT EXISTS job_watermarks (
+    job_name    VARCHAR(100) PRIMARY KEY,
+    cursor      TEXT NOT NULL DEFAULT '',
+    updated_at  TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_tickets_image_display_url ON tickets (image_display_url);
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_tickets_image_thumbnail_url ON tickets (image_thumbnail_url);
@@ -0,0 +1,72 @@
+-- ===========================================================
+-- Migration : partitionnement mensuel de la table notifications
+-- Description : convertit la table existante en table partitionnée par
+--               RANGE (created_at). Les partitions futures et la rétention
+--               sont ensuite gérées par controller/notification_partitions.py.
+-- À exécuter pendant une fenêtre de maintenance (copie de toute la table).
+-- ===========================================================
+
+BEGIN;
+
+-- 1. Mettre l'ancienne table de côté (nom, séquence, contraintes et index)
+ALTER TABLE notifications RENAME TO notifications_legacy;
+ALTER SEQUENCE IF EXISTS notifications_id_seq RENAME TO notifications_legacy_id_seq;
+ALTER TABLE notifications_legacy RENAME CONSTRAINT notifications_pkey TO notifications_legacy_pkey;
+ALTER INDEX IF EXISTS ix_notifications_id RENAME TO ix_notifications_legacy_id;
+ALTER INDEX IF EXISTS ix_notifications_user_id RENAME TO ix_notifications_legacy_user_id;
+ALTER INDEX IF EXISTS ix_notifications_ticket_id RENAME TO ix_notifications_legacy_ticket_id;
+ALTER INDEX IF EXISTS ix_notifications_reminder_id RENAME TO ix_notifications_legacy_reminder_id;
+
+-- 2. Nouvelle table partitionnée (la clé de partition fait partie de la clé primaire)
+CREATE TABLE notifications (
+    id SERIAL,
+    user_id INTEGER NOT NULL REFERENCES users(id) ON DELETE CASCADE,
+    ticket_id INTEGER REFERENCES tickets(id) ON DELETE SET NULL,
+    reminder_id INTEGER REFERENCES reminders(id) ON DELETE SET NULL,
+    channel notification_channel NOT NULL,
+    message TEXT NOT NULL,
+    subject VARCHAR(255),
+    status VARCHAR(20) NOT NULL DEFAULT 'pending',
+    error_message TEXT,
+    sent_at TIMESTAMP WITH TIME ZONE,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- Index déclarés sur la table parente : créés automatiquement sur chaque partition
+CREATE INDEX ix_notifications_user_id_created_at ON notifications (user_id, created_at);
+CREATE INDEX ix_notifications_ticket_id_created_at ON notifications (ticket_id, created_at);
+CREATE INDEX ix_notifications_reminder_id ON notifications (reminder_id);
+
+-- 3. Partitions mensuelles couvrant l'historique et les 3 prochains mois
+CREATE TABLE notifications_default PARTITION OF notifications DEFAULT;
+
+DO $$
+DECLARE
+    month_start DATE := date_trunc('month', COALESCE((SELECT min(created_at) FROM notifications_legacy), now()) AT TIME ZONE 'UTC')::date;
+    last_month DATE := (date_trunc('month', now() AT TIME ZONE 'UTC') + interval '3 months')::date;
+BEGIN
+    WHILE month_start <= last_month LOOP
+        EXECUTE format(
+            'CREATE TABLE IF NOT EXISTS %I PARTITION OF notifications FOR VALUES FROM (%L) TO (%L)',
+            'notifications_y' || to_char(month_start, 'YYYY') || 'm' || to_char(month_start, 'MM'),
+            month_start::text || ' 00:00:00+00',
+            (month_start + interval '1 month')::date::text || ' 00:00:00+00'
+        );
+        month_start := (month_start + interval '1 month')::date;
+    END LOOP;
+END $$;
+
+-- 4. Copier les données et recaler la séquence
+INSERT INTO notifications (id, user_id, ticket_id, reminder_id, channel, message, subject,
+                           status, error_message, sent_at, created_at)
+SELECT id, user_id, ticket_id, reminder_id, channel, message, subject,
+       COALESCE(status, 'pending'), error_message, sent_at, COALESCE(created_at, now())
+FROM notifications_legacy;
+
+SELECT setval(pg_get_serial_sequence('notifications', 'id'),
+              COALESCE((SELECT max(id) FROM notifications), 0) + 1, false);
+
+DROP TABLE notifications_legacy;
+
+COMMIT;
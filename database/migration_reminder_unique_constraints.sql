@@ -0,0 +1,30 @@
+-- ===========================================================
+-- Migration : contraintes d'unicité pour la configuration des rappels en masse
+-- Description : POST /reminders/bulk utilise INSERT ... ON CONFLICT, qui exige
+--               un index unique sur reminders.ticket_id et sur
+--               reminder_channels (reminder_id, channel).
+-- ===========================================================
+
+BEGIN;
+
+-- 1. Supprimer les doublons éventuels (on garde le rappel le plus ancien)
+DELETE FROM reminders r
+USING reminders r2
+WHERE r.ticket_id = r2.ticket_id
+  AND r.id > r2.id;
+
+DELETE FROM reminder_channels c
+USING reminder_channels c2
+WHERE c.reminder_id = c2.reminder_id
+  AND c.channel = c2.channel
+  AND c.id > c2.id;
+
+-- 2. Remplacer l'index simple par un index unique
+DROP INDEX IF EXISTS ix_reminders_ticket_id;
+DROP INDEX IF EXISTS idx_reminders_ticket_id;
+CREATE UNIQUE INDEX ix_reminders_ticket_id ON reminders (ticket_id);
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_reminder_channels_reminder_id_channel
+    ON reminder_channels (reminder_id, channel);
+
+COMMIT;
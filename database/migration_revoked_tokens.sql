@@ -0,0 +1,23 @@
+-- ===========================================================
+-- Migration : liste de révocation des jetons d'authentification
+-- Description : identifiants (jti) des jetons révoqués à la déconnexion ou
+--               lors de la rotation d'un jeton de rafraîchissement. Les lignes
+--               expirées sont supprimées par la tâche `token_revocations`.
+-- ===========================================================
+
+CREATE TABLE IF NOT EXISTS revoked_tokens (
+    jti         VARCHAR(64) PRIMARY KEY,
+    expires_at  TIMESTAMPTZ NOT NULL,
+    revoked_at  TIMESTAMPTZ NOT NULL DEFAULT now()
+);
+
+CREATE INDEX IF NOT EXISTS ix_revoked_tokens_expires_at ON revoked_tokens (expires_at);
+
+-- Type du jeton : les workers ne rechargent que les jetons d'accès révoqués,
+-- par ordre de révocation (synchronisation incrémentale)
+ALTER TABLE revoked_tokens ADD COLUMN IF NOT EXISTS token_type VARCHAR(16) NOT NULL DEFAULT 'access';
+CREATE INDEX IF NOT EXISTS ix_revoked_tokens_revoked_at ON revoked_tokens (revoked_at);
+
+-- Date avant laquelle les jetons de rafraîchissement d'un utilisateur sont
+-- refusés : mise à jour à chaque changement ou réinitialisation du mot de passe.
+ALTER TABLE users ADD COLUMN IF NOT EXISTS tokens_valid_after TIMESTAMPTZ;
@@ -0,0 +1,11 @@
+-- ===========================================================
+-- Migration : stockage des images par empreinte (SHA-256)
+-- Description : les nouvelles images sont stockées sous
+--               static/images/tickets/ab/cd/<sha256>.<ext> et peuvent être
+--               partagées par plusieurs contraventions. L'index permet de
+--               vérifier rapidement si une image est encore référencée avant
+--               de supprimer le fichier. Les images existantes (noms UUID)
+--               restent valides et ne sont pas déplacées.
+-- ===========================================================
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS ix_tickets_image_url ON tickets (image_url);
@@ -0,0 +1,8 @@
+-- ===========================================================
+-- Migration : URLs des variantes d'image des contraventions
+-- Description : colonnes remplies par le pipeline de traitement d'images
+--               (controller/image_pipeline.py) après chaque upload.
+-- ===========================================================
+
+ALTER TABLE tickets ADD COLUMN IF NOT EXISTS image_display_url VARCHAR(255);
+ALTER TABLE tickets ADD COLUMN IF NOT EXISTS image_thumbnail_url VARCHAR(255);
@@ -0,0 +1,16 @@
+-- ===========================================================
+-- Migration : index sur expires_at pour le nettoyeur de jetons
+-- Description : permet au nettoyeur périodique (controller/token_sweeper.py)
+--               de trouver les lignes expirées sans parcourir toute la table.
+-- ===========================================================
+
+-- Note : PostgreSQL interdit now() dans le prédicat d'un index partiel
+-- (fonction non IMMUTABLE). Un index B-tree complet sur expires_at est donc
+-- utilisé : le nettoyeur le parcourt dans l'ordre et s'arrête au premier
+-- jeton encore valide.
+
+CREATE INDEX IF NOT EXISTS ix_password_reset_tokens_expires_at
+    ON password_reset_tokens (expires_at);
+
+CREATE INDEX IF NOT EXISTS ix_email_verification_codes_expires_at
+    ON email_verification_codes (expires_at);
@@ -1,6 +1,7 @@
-from sqlalchemy import create_engine, event
+from datetime import date, datetime, timezone
+from sqlalchemy import create_engine, event, text
 from sqlalchemy.orm import sessionmaker
-from models.models import Base, NotificationChannel, DeviceType, SubscriptionStatus
+from models.models import Base, Notification, UserTicketSummary, NotificationChannel, DeviceType, SubscriptionStatus
 from sqlalchemy.dialects.postgresql import ENUM
 
 
@@ -44,6 +45,249 @@ def create_enums(target, connection, **kw):
     pg_enum_subscription.create(connection, checkfirst=True)
 
 
+# ---------------------------
+# Partitions mensuelles de la table notifications
+# ---------------------------
+
+def add_months(month_start: date, months: int) -> date:
+    """Retourne le premier jour du mois décalé de `months` mois."""
+    month_index = month_start.year * 12 + (month_start.month - 1) + months
+    return date(month_index // 12, month_index % 12 + 1, 1)
+
+
+def notification_partition_name(month_start: date) -> str:
+    """Nom de la partition d'un mois donné, ex: notifications_y2025m01."""
+    return f"notifications_y{month_start.year:04d}m{month_start.month:02d}"
+
+
+def create_notification_partitions(connection, first_month: date, months: int) -> list:
+    """
+    Crée (si besoin) les partitions mensuelles de `notifications` à partir de
+    `first_month`, ainsi que la partition par défaut qui reçoit les lignes hors plage.
+
+    PostgreSQL refuse de créer la partition d'un mois dont des lignes sont déjà
+    dans la partition par défaut : ces lignes sont d'abord mises de côté
+    (table temporaire), puis réinsérées une fois la partition créée, dans la
+    transaction de `connection`.
+
+    Returns:
+        list: Noms des partitions créées
+    """
+    created = []
+    connection.execute(text(
+        "CREATE TABLE IF NOT EXISTS notifications_default PARTITION OF notifications DEFAULT"
+    ))
+    for offset in range(months):
+        month_start = add_months(first_month, offset)
+        partition_name = notification_partition_name(month_start)
+        exists = connection.execute(text("SELECT to_regclass(:name)"), {"name": partition_name}).scalar()
+        if exists:
+            continue
+        next_month = add_months(month_start, 1)
+        bounds = {
+            "start": datetime(month_start.year, month_start.month, 1, tzinfo=timezone.utc),
+            "end": datetime(next_month.year, next_month.month, 1, tzinfo=timezone.utc),
+        }
+        has_default_rows = connection.execute(text(
+            "SELECT EXISTS (SELECT 1 FROM notifications_default WHERE created_at >= :start AND created_at < :end)"
+        ), bounds).scalar()
+        if has_default_rows:
+            connection.execute(text(
+                "CREATE TEMP TABLE IF NOT EXISTS notifications_pending "
+                "(LIKE notifications INCLUDING DEFAULTS) ON COMMIT DROP"
+            ))
+            connection.execute(text(
+                "WITH moved AS (DELETE FROM notifications_default "
+                "WHERE created_at >= :start AND created_at < :end RETURNING *) "
+                "INSERT INTO notifications_pending SELECT * FROM moved"
+            ), bounds)
+        connection.execute(text(
+            f"CREATE TABLE {partition_name} PARTITION OF notifications "
+            f"FOR VALUES FROM ('{month_start.isoformat()} 00:00:00+00') "
+            f"TO ('{next_month.isoformat()} 00:00:00+00')"
+        ))
+        if has_default_rows:
+            moved = connection.execute(text(
+                "WITH pending AS (DELETE FROM notifications_pending RETURNING *) "
+                "INSERT INTO notifications SELECT * FROM pending"
+            )).rowcount
+            print(f"🗂️ {moved} notification(s) déplacée(s) de la partition par défaut vers {partition_name}.")
+        created.append(partition_name)
+    return created
+
+
+@event.listens_for(Notification.__table__, "after_create")
+def create_initial_notification_partitions(target, connection, **kw):
+    """Crée les partitions du mois courant et des mois suivants à la création de la table."""
+    if connection.dialect.name != 'postgresql':
+        return
+    today = datetime.now(timezone.utc).date()
+    create_notification_partitions(connection, date(today.year, today.month, 1), months=4)
+
+
+# ---------------------------
+# Résumé par utilisateur (user_ticket_summary) maintenu par triggers
+# ---------------------------
+# Les triggers couvrent tous les chemins d'écriture (ORM, import COPY,
+# INSERT ... ON CONFLICT des rappels) : chaque écriture applique un delta
+# à la ligne de l'utilisateur au lieu de tout recalculer.
+
+USER_TICKET_SUMMARY_TRIGGERS_DDL = """
+CREATE INDEX IF NOT EXISTS ix_tickets_user_open_due_date
+    ON tickets (user_id, due_date) WHERE status = 'en_cours';
+
+CREATE OR REPLACE FUNCTION user_ticket_summary_ticket_change() RETURNS trigger AS $$
+BEGIN
+    -- Retirer la contribution de l'ancienne version de la contravention
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.status = 'en_cours' THEN
+        UPDATE user_ticket_summary
+        SET open_ticket_count = open_ticket_count - 1,
+            outstanding_amount_usd = outstanding_amount_usd - OLD.amount_usd,
+            updated_at = now()
+        WHERE user_id = OLD.user_id;
+    END IF;
+
+    -- Ajouter la contribution de la nouvelle version
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.status = 'en_cours' THEN
+        INSERT INTO user_ticket_summary AS s
+            (user_id, open_ticket_count, outstanding_amount_usd, next_due_date, active_reminder_count, updated_at)
+        VALUES (NEW.user_id, 1, NEW.amount_usd, NEW.due_date, 0, now())
+        ON CONFLICT (user_id) DO UPDATE
+        SET open_ticket_count = s.open_ticket_count + 1,
+            outstanding_amount_usd = s.outstanding_amount_usd + EXCLUDED.outstanding_amount_usd,
+            next_due_date = LEAST(s.next_due_date, EXCLUDED.next_due_date),
+            updated_at = now();
+    END IF;
+
+    -- Si l'échéance retirée était la plus proche, la recalculer (index partiel)
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.status = 'en_cours' AND OLD.due_date IS NOT NULL THEN
+        UPDATE user_ticket_summary
+        SET next_due_date = (
+            SELECT min(due_date) FROM tickets
+            WHERE user_id = OLD.user_id AND status = 'en_cours'
+        )
+        WHERE user_id = OLD.user_id AND next_due_date = OLD.due_date;
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Avant la suppression d'une contravention, retirer ses rappels actifs :
+-- la suppression en cascade des rappels ne retrouve plus la contravention.
+CREATE OR REPLACE FUNCTION user_ticket_summary_ticket_delete() RETURNS trigger AS $$
+BEGIN
+    UPDATE user_ticket_summary
+    SET active_reminder_count = active_reminder_count - (
+            SELECT count(*) FROM reminders WHERE ticket_id = OLD.id AND active
+        ),
+        updated_at = now()
+    WHERE user_id = OLD.user_id;
+    RETURN OLD;
+END;
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION user_ticket_summary_reminder_change() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP IN ('UPDATE', 'DELETE') AND OLD.active THEN
+        UPDATE user_ticket_summary
+        SET active_reminder_count = active_reminder_count - 1,
+            updated_at = now()
+        WHERE user_id = (SELECT user_id FROM tickets WHERE id = OLD.ticket_id);
+    END IF;
+
+    IF TG_OP IN ('INSERT', 'UPDATE') AND NEW.active THEN
+        INSERT INTO user_ticket_summary AS s (user_id, active_reminder_count, updated_at)
+        SELECT user_id, 1, now() FROM tickets WHERE id = NEW.ticket_id
+        ON CONFLICT (user_id) DO UPDATE
+        SET active_reminder_count = s.active_reminder_count + 1,
+            updated_at = now();
+    END IF;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_user_ticket_summary_ticket_write ON tickets;
+CREATE TRIGGER trg_user_ticket_summary_ticket_write
+    AFTER INSERT OR DELETE ON tickets
+    FOR EACH ROW EXECUTE FUNCTION user_ticket_summary_ticket_change();
+
+DROP TRIGGER IF EXISTS trg_user_ticket_summary_ticket_update ON tickets;
+CREATE TRIGGER trg_user_ticket_summary_ticket_update
+    AFTER UPDATE ON tickets
+    FOR EACH ROW
+    WHEN (OLD.status IS DISTINCT FROM NEW.status
+          OR OLD.amount_usd IS DISTINCT FROM NEW.amount_usd
+          OR OLD.due_date IS DISTINCT FROM NEW.due_date
+          OR OLD.user_id IS DISTINCT FROM NEW.user_id)
+    EXECUTE FUNCTION user_ticket_summary_ticket_change();
+
+DROP TRIGGER IF EXISTS trg_user_ticket_summary_ticket_delete ON tickets;
+CREATE TRIGGER trg_user_ticket_summary_ticket_delete
+    BEFORE DELETE ON tickets
+    FOR EACH ROW EXECUTE FUNCTION user_ticket_summary_ticket_delete();
+
+DROP TRIGGER IF EXISTS trg_user_ticket_summary_reminder ON reminders;
+CREATE TRIGGER trg_user_ticket_summary_reminder
+    AFTER INSERT OR DELETE OR UPDATE OF active, ticket_id ON reminders
+    FOR EACH ROW EXECUTE FUNCTION user_ticket_summary_reminder_change();
+"""
+
+REBUILD_USER_TICKET_SUMMARY_SQL = """
+INSERT INTO user_ticket_summary AS s
+    (user_id, open_ticket_count, outstanding_amount_usd, next_due_date, active_reminder_count, updated_at)
+SELECT u.id,
+       COALESCE(t.open_count, 0),
+       COALESCE(t.outstanding, 0),
+       t.next_due_date,
+       COALESCE(r.active_count, 0),
+       now()
+FROM users u
+LEFT JOIN (
+    SELECT user_id, count(*) AS open_count, sum(amount_usd) AS outstanding, min(due_date) AS next_due_date
+    FROM tickets WHERE status = 'en_cours' GROUP BY user_id
+) t ON t.user_id = u.id
+LEFT JOIN (
+    SELECT tk.user_id, count(*) AS active_count
+    FROM reminders rm JOIN tickets tk ON tk.id = rm.ticket_id
+    WHERE rm.active GROUP BY tk.user_id
+) r ON r.user_id = u.id
+ON CONFLICT (user_id) DO UPDATE
+SET open_ticket_count = EXCLUDED.open_ticket_count,
+    outstanding_amount_usd = EXCLUDED.outstanding_amount_usd,
+    next_due_date = EXCLUDED.next_due_date,
+    active_reminder_count = EXCLUDED.active_reminder_count,
+    updated_at = now()
+"""
+
+
+def rebuild_user_ticket_summary(connection):
+    """Recalcule entièrement user_ticket_summary (initialisation ou correction d'écart)."""
+    connection.exec_driver_sql(REBUILD_USER_TICKET_SUMMARY_SQL)
+
+
+@event.listens_for(UserTicketSummary.__table__, "after_create")
+def mark_user_ticket_summary_created(target, connection, **kw):
+    """Note que la table vient d'être créée : les triggers seront installés en fin de create_all."""
+    connection.info["user_ticket_summary_created"] = True
+
+
+@event.listens_for(Base.metadata, "after_create")
+def create_user_ticket_summary_triggers(target, connection, **kw):
+    """
+    Installe les triggers de mise à jour incrémentale puis remplit la table.
+    Exécuté une seule fois, quand user_ticket_summary vient d'être créée
+    (tickets et reminders existent alors forcément).
+    """
+    if connection.dialect.name != 'postgresql':
+        return
+    if not connection.info.pop("user_ticket_summary_created", False):
+        return
+    connection.exec_driver_sql(USER_TICKET_SUMMARY_TRIGGERS_DDL)
+    rebuild_user_ticket_summary(connection)
+
+
 def init_db():
     """Initialise la base de données en créant toutes les tables"""
     # The event listener above will be triggered automatically by create_all
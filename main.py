@@ -1,4 +1,5 @@
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from fastapi.staticfiles import StaticFiles
 
 from dotenv import load_dotenv # Importez load_dotenv
@@ -22,13 +23,31 @@ from controller.device_token_controller import router as device_token_router
 from controller.payment_controller import router as payment_router
 from controller.notification_controller import router as notification_router # Ajout du nouveau routeur
 from controller.session_chat import router as chat_router # Ajout du routeur de chat
+from controller.storage_controller import router as storage_router
+from controller.static_images_controller import router as static_images_router
 from controller.firebase_notifications import initialize_firebase
+from controller.background_jobs import register_periodic_job, start_background_jobs, stop_background_jobs
+from controller.token_sweeper import sweep_expired_tokens, TOKEN_SWEEP_INTERVAL_SECONDS
+from controller.notification_partitions import maintain_notification_partitions, NOTIFICATION_PARTITION_INTERVAL_SECONDS
+from controller.analytics_service import refresh_analytics_rollups, ANALYTICS_REFRESH_INTERVAL_SECONDS
+from controller.image_reconciler import reconcile_orphan_images, ORPHAN_IMAGE_INTERVAL_SECONDS
+from controller.auth_tokens import sync_revocation_list, REVOCATION_SYNC_INTERVAL_SECONDS
+from controller.chat_archiver import archive_closed_chat_sessions, CHAT_ARCHIVE_INTERVAL_SECONDS
+from controller.chat_search import backfill_chat_search_index, CHAT_SEARCH_BACKFILL_INTERVAL_SECONDS
+from controller.upload_service import TICKET_IMAGE_MAX_BYTES, MULTIPART_OVERHEAD_BYTES, UploadSizeLimitMiddleware
+from controller.storage import get_storage
+from controller.image_pipeline import shutdown_image_executor
+from controller.password_hasher import shutdown_password_executor
+from controller.rtdb_client import shutdown_rtdb_executor
+from controller.chat_hub import start_chat_hub, stop_chat_hub
+from controller.redis_client import close_redis
 from fastapi.middleware.cors import CORSMiddleware # 1. Importez le middleware
 
 app = FastAPI(
     title="Notofine API", 
     description="API de gestion des contraventions avec notifications",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse  # Sérialisation JSON via orjson
 )
 
 @app.on_event("startup")
@@ -37,9 +56,45 @@ def on_startup():
     Fonctions à exécuter une seule fois au démarrage de l'application.
     """
     print("🚀 Démarrage des services externes...")
+    # Crée le backend de stockage : une configuration incomplète est signalée dès le démarrage
+    get_storage()
     initialize_firebase()
 
-# Monter le répertoire statique pour servir les images uploadées
+    # Tâches de maintenance périodiques
+    register_periodic_job("token_sweeper", TOKEN_SWEEP_INTERVAL_SECONDS, sweep_expired_tokens, run_at_startup=True)
+    register_periodic_job("notification_partitions", NOTIFICATION_PARTITION_INTERVAL_SECONDS, maintain_notification_partitions, run_at_startup=True)
+    register_periodic_job("analytics_rollups", ANALYTICS_REFRESH_INTERVAL_SECONDS, refresh_analytics_rollups)
+    register_periodic_job("image_reconciler", ORPHAN_IMAGE_INTERVAL_SECONDS, reconcile_orphan_images)
+    register_periodic_job("token_revocations", REVOCATION_SYNC_INTERVAL_SECONDS, sync_revocation_list, run_at_startup=True)
+    register_periodic_job("chat_archiver", CHAT_ARCHIVE_INTERVAL_SECONDS, archive_closed_chat_sessions)
+    register_periodic_job("chat_search_indexer", CHAT_SEARCH_BACKFILL_INTERVAL_SECONDS, backfill_chat_search_index)
+    start_background_jobs()
+    start_chat_hub()
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    """
+    Arrêt propre des tâches de fond.
+    """
+    await stop_background_jobs()
+    await stop_chat_hub()
+    shutdown_image_executor()
+    shutdown_password_executor()
+    shutdown_rtdb_executor()
+    await close_redis()
+
+# Création de contravention : corps limité à la taille maximale d'image (plus
+# les champs texte), Content-Length déclaré ou octets comptés à la lecture (chunked)
+app.add_middleware(UploadSizeLimitMiddleware, limits={
+    ("POST", path): TICKET_IMAGE_MAX_BYTES + MULTIPART_OVERHEAD_BYTES for path in ("/tickets", "/tickets/")
+})
+
+# Images des contraventions : servies avec des en-têtes de cache longue durée,
+# ETag fort et support des Range. Ce router doit être inclus avant le montage
+# "/static", sinon le montage intercepte les requêtes.
+app.include_router(static_images_router)
+
+# Monter le répertoire statique pour servir les autres fichiers statiques
 # Les fichiers dans le dossier "static" seront accessibles via l'URL "/static"
 app.mount("/static", StaticFiles(directory="static"), name="static")
 
@@ -53,6 +108,7 @@ app.include_router(device_token_router)
 app.include_router(payment_router)
 app.include_router(notification_router) # Inclusion du nouveau routeur
 app.include_router(chat_router) # Inclusion du routeur de chat
+app.include_router(storage_router) # Uploads directs vers le stockage
 
 # 2. Définissez les "origines" autorisées (les adresses qui ont le droit de parler à votre API)
 origins = [
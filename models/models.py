@@ -7,6 +7,7 @@ from sqlalchemy import (
     Column,
     Integer,
     String,
+    Date,
     DateTime,
     ForeignKey,
     Boolean,
@@ -14,7 +15,10 @@ from sqlalchemy import (
     Float,
     Numeric,
     Index,
+    Computed,
+    text,
 )
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlalchemy.orm import relationship, declarative_base
 from sqlalchemy.sql import func
 from sqlalchemy import Enum as SAEnum
@@ -92,6 +96,8 @@ class User(Base):
     is_active = Column(Boolean, default=True, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     abonnement_finish = Column(DateTime(timezone=True), nullable=True)  # Date de fin de l'abonnement actif
+    # Les jetons de rafraîchissement émis avant cette date sont refusés (changement de mot de passe)
+    tokens_valid_after = Column(DateTime(timezone=True), nullable=True)
 
     # Relations existantes
     tickets = relationship("Ticket", back_populates="user", cascade="all, delete-orphan")
@@ -129,6 +135,10 @@ class Plan(Base):
 # ---------------------------
 class Subscription(Base):
     __tablename__ = "subscriptions"
+    __table_args__ = (
+        # Abonnements actifs sur une période (rollup daily_active_subscribers)
+        Index("ix_subscriptions_end_date_start_date", "end_date", "start_date"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
@@ -137,7 +147,7 @@ class Subscription(Base):
     start_date = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
     end_date = Column(DateTime(timezone=True), nullable=False)
     auto_renew = Column(Boolean, default=False, nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
 
     # Relations
     user = relationship("User", back_populates="subscriptions")
@@ -153,6 +163,10 @@ class Subscription(Base):
 # ---------------------------
 class Ticket(Base):
     __tablename__ = "tickets"
+    __table_args__ = (
+        # Recherche rapide de la prochaine échéance parmi les contraventions en cours
+        Index("ix_tickets_user_open_due_date", "user_id", "due_date", postgresql_where=text("status = 'en_cours'")),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
@@ -161,10 +175,12 @@ class Ticket(Base):
     amount_usd = Column(Numeric(10, 2), nullable=False)
     due_date = Column(DateTime(timezone=True), nullable=True)
     dispute_url = Column(String(255), nullable=False)
-    image_url = Column(String(255), nullable=True)
+    image_url = Column(String(255), nullable=True, index=True)
+    image_display_url = Column(String(255), nullable=True, index=True)  # Variante réduite, sans EXIF
+    image_thumbnail_url = Column(String(255), nullable=True, index=True)  # Miniature pour les listes
     payment_url = Column(String(255), nullable=True)
     status = Column(SAEnum(TicketStatus), default=TicketStatus.en_cours, nullable=False)
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
 
     # Relations
     user = relationship("User", back_populates="tickets")
@@ -188,7 +204,7 @@ class Payment(Base):
     amount_usd = Column(Numeric(10, 2), nullable=False)
     payment_status = Column(SAEnum(PaymentStatus), default=PaymentStatus.pending, nullable=False)
     payment_url = Column(String(255), nullable=True)
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
 
     # Relations
     ticket = relationship("Ticket", back_populates="payments")
@@ -206,7 +222,7 @@ class Reminder(Base):
     __tablename__ = "reminders"
 
     id = Column(Integer, primary_key=True, index=True)
-    ticket_id = Column(Integer, ForeignKey("tickets.id", ondelete="CASCADE"), nullable=False, index=True)
+    ticket_id = Column(Integer, ForeignKey("tickets.id", ondelete="CASCADE"), nullable=False, unique=True, index=True)  # Un seul rappel par ticket
     frequency_days = Column(Integer, default=7, nullable=False)  # ex: 7 = hebdomadaire
     active = Column(Boolean, default=True, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
@@ -224,6 +240,10 @@ class Reminder(Base):
 # ---------------------------
 class ReminderChannel(Base):
     __tablename__ = "reminder_channels"
+    __table_args__ = (
+        # Un canal donné n'apparaît qu'une fois par rappel (cible des INSERT ... ON CONFLICT)
+        Index("uq_reminder_channels_reminder_id_channel", "reminder_id", "channel", unique=True),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     reminder_id = Column(Integer, ForeignKey("reminders.id", ondelete="CASCADE"), nullable=False, index=True)
@@ -243,10 +263,19 @@ class ReminderChannel(Base):
 # ---------------------------
 class Notification(Base):
     __tablename__ = "notifications"
-
-    id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
-    ticket_id = Column(Integer, ForeignKey("tickets.id", ondelete="SET NULL"), nullable=True, index=True)
+    __table_args__ = (
+        # Index créés sur chaque partition mensuelle : les recherches par
+        # utilisateur / ticket restent locales à la partition visée.
+        Index("ix_notifications_user_id_created_at", "user_id", "created_at"),
+        Index("ix_notifications_ticket_id_created_at", "ticket_id", "created_at"),
+        # Table partitionnée par mois (partitions gérées par controller/notification_partitions.py)
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+    # La clé de partitionnement (created_at) doit faire partie de la clé primaire
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    ticket_id = Column(Integer, ForeignKey("tickets.id", ondelete="SET NULL"), nullable=True)
     reminder_id = Column(Integer, ForeignKey("reminders.id", ondelete="SET NULL"), nullable=True, index=True)
     channel = Column(SAEnum(NotificationChannel, name="notification_channel"), nullable=False)
     message = Column(Text, nullable=False)
@@ -254,7 +283,7 @@ class Notification(Base):
     status = Column(String(20), default="pending", nullable=False)  # pending, sent, failed
     error_message = Column(Text, nullable=True)  # En cas d'échec
     sent_at = Column(DateTime(timezone=True), nullable=True)  # NULL si pas encore envoyé
-    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, primary_key=True)
 
     # Relations
     user = relationship("User", back_populates="notifications")
@@ -299,7 +328,7 @@ class PasswordResetToken(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False, index=True)
     token = Column(String(255), unique=True, nullable=False, index=True)
-    expires_at = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)  # Utilisé par le nettoyeur périodique
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
     # Relation
@@ -309,6 +338,23 @@ class PasswordResetToken(Base):
         return f"<PasswordResetToken user_id={self.user_id} expires_at={self.expires_at}>"
 
 
+# ---------------------------
+# REVOKED AUTH TOKENS
+# ---------------------------
+class RevokedToken(Base):
+    """Jetons d'accès / de rafraîchissement révoqués (déconnexion), conservés jusqu'à leur expiration."""
+    __tablename__ = "revoked_tokens"
+
+    jti = Column(String(64), primary_key=True)
+    # "access" ou "refresh" : seuls les jetons d'accès sont rechargés en mémoire
+    token_type = Column(String(16), nullable=False, server_default="access")
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)
+    revoked_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False, index=True)
+
+    def __repr__(self) -> str:
+        return f"<RevokedToken jti={self.jti} expires_at={self.expires_at}>"
+
+
 # ---------------------------
 # EMAIL VERIFICATION CODES (pour les inscriptions et autres vérifications)
 # ---------------------------
@@ -318,13 +364,168 @@ class EmailVerificationCode(Base):
     id = Column(Integer, primary_key=True, index=True)
     email = Column(String(100), nullable=False, index=True)
     code = Column(String(6), nullable=False)
-    expires_at = Column(DateTime(timezone=True), nullable=False)
+    expires_at = Column(DateTime(timezone=True), nullable=False, index=True)  # Utilisé par le nettoyeur périodique
     created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
     def __repr__(self) -> str:
         return f"<EmailVerificationCode email={self.email} expires_at={self.expires_at}>"
 
 
+# ---------------------------
+# USER TICKET SUMMARY (tableau de bord, maintenu par triggers)
+# ---------------------------
+class UserTicketSummary(Base):
+    __tablename__ = "user_ticket_summary"
+
+    # Une ligne par utilisateur, mise à jour de façon incrémentale par les triggers
+    # PostgreSQL sur tickets et reminders (voir databaseone.py)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    open_ticket_count = Column(Integer, default=0, server_default="0", nullable=False)
+    outstanding_amount_usd = Column(Numeric(12, 2), default=0, server_default="0", nullable=False)
+    next_due_date = Column(DateTime(timezone=True), nullable=True)
+    active_reminder_count = Column(Integer, default=0, server_default="0", nullable=False)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<UserTicketSummary user_id={self.user_id} open={self.open_ticket_count}>"
+
+
+# ---------------------------
+# ROLLUPS ANALYTIQUES (agrégats quotidiens pour l'admin)
+# ---------------------------
+# Tables recalculées périodiquement par controller/analytics_service.py :
+# les tableaux de bord lisent ces agrégats au lieu des tables brutes.
+
+class DailyPlanRevenue(Base):
+    __tablename__ = "daily_plan_revenue"
+
+    day = Column(Date, primary_key=True)
+    plan_id = Column(Integer, primary_key=True)
+    new_subscriptions = Column(Integer, default=0, nullable=False)
+    revenue_usd = Column(Numeric(12, 2), default=0, nullable=False)
+    refreshed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<DailyPlanRevenue day={self.day} plan_id={self.plan_id} revenue={self.revenue_usd}>"
+
+
+class DailyActiveSubscribers(Base):
+    __tablename__ = "daily_active_subscribers"
+
+    day = Column(Date, primary_key=True)
+    active_subscribers = Column(Integer, default=0, nullable=False)
+    refreshed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<DailyActiveSubscribers day={self.day} active={self.active_subscribers}>"
+
+
+class DailyTicketStats(Base):
+    __tablename__ = "daily_ticket_stats"
+
+    day = Column(Date, primary_key=True)
+    state_id = Column(Integer, primary_key=True)  # 0 = utilisateur sans état
+    ticket_count = Column(Integer, default=0, nullable=False)
+    amount_usd = Column(Numeric(14, 2), default=0, nullable=False)
+    refreshed_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<DailyTicketStats day={self.day} state_id={self.state_id} count={self.ticket_count}>"
+
+
+class JobWatermark(Base):
+    """Position de reprise d'une tâche de fond incrémentale (ex: dernière clé d'image examinée)."""
+    __tablename__ = "job_watermarks"
+
+    job_name = Column(String(100), primary_key=True)
+    cursor = Column(Text, nullable=False, default="")
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now(), nullable=False)
+
+    def __repr__(self) -> str:
+        return f"<JobWatermark {self.job_name} cursor={self.cursor!r}>"
+
+
+# ---------------------------
+# CHAT ARCHIVES (sessions fermées sorties de Firebase Realtime Database)
+# ---------------------------
+class ChatSessionArchive(Base):
+    __tablename__ = "chat_session_archives"
+    __table_args__ = (
+        # Une session fermée n'est archivée qu'une fois (reprise après interruption)
+        Index("uq_chat_session_archives_session_key_closed_at", "session_key", "closed_at", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    session_key = Column(String(255), nullable=False)  # Clé Firebase (email nettoyé)
+    user_email = Column(String(255), nullable=False, index=True)
+    user_name = Column(String(255), nullable=True)
+    subject = Column(String(255), nullable=True)
+    admin_name = Column(String(255), nullable=True)
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    closed_at = Column(DateTime(timezone=True), nullable=True)
+    message_count = Column(Integer, default=0, nullable=False)
+    archived_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+
+    # Relations
+    messages = relationship("ChatArchivedMessage", back_populates="archive", cascade="all, delete-orphan")
+
+    def __repr__(self) -> str:
+        return f"<ChatSessionArchive id={self.id} user_email={self.user_email} messages={self.message_count}>"
+
+
+class ChatArchivedMessage(Base):
+    __tablename__ = "chat_archived_messages"
+    __table_args__ = (
+        # Lecture paginée d'une transcription par identifiant de message
+        Index("uq_chat_archived_messages_archive_id_message_id", "archive_id", "message_id", unique=True),
+    )
+
+    id = Column(Integer, primary_key=True)
+    archive_id = Column(Integer, ForeignKey("chat_session_archives.id", ondelete="CASCADE"), nullable=False)
+    # Clé Firebase d'origine ; collation "C" : même ordre que Firebase (octet par octet)
+    message_id = Column(String(64, collation="C"), nullable=False)
+    sender = Column(String(50), nullable=False)
+    sender_email = Column(String(255), nullable=True)
+    content = Column(Text, nullable=False)
+    sent_at = Column(String(64), nullable=True)  # Horodatage d'origine (ISO 8601)
+
+    # Relations
+    archive = relationship("ChatSessionArchive", back_populates="messages")
+
+    def __repr__(self) -> str:
+        return f"<ChatArchivedMessage archive_id={self.archive_id} message_id={self.message_id}>"
+
+
+class ChatMessageSearch(Base):
+    """
+    Index de recherche plein texte des messages de chat, sessions en cours
+    (Firebase) et archivées confondues. Alimenté à l'envoi de chaque message,
+    à l'archivage d'une session et par la tâche `chat_search_indexer`.
+    """
+    __tablename__ = "chat_message_search"
+    __table_args__ = (
+        # Un message n'est indexé qu'une fois (réindexation idempotente)
+        Index("uq_chat_message_search_session_key_message_id", "session_key", "message_id", unique=True),
+        Index("ix_chat_message_search_search_vector", "search_vector", postgresql_using="gin"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    session_key = Column(String(255), nullable=False)  # Clé Firebase (email nettoyé)
+    user_email = Column(String(255), nullable=False, index=True)
+    # Collation "C" : même ordre que Firebase (octet par octet)
+    message_id = Column(String(64, collation="C"), nullable=False)
+    sender = Column(String(50), nullable=False)
+    content = Column(Text, nullable=False)
+    sent_at = Column(String(64), nullable=True)  # Horodatage d'origine (ISO 8601)
+    # Renseigné une fois la session archivée (NULL : session encore dans Firebase)
+    archive_id = Column(Integer, ForeignKey("chat_session_archives.id", ondelete="CASCADE"), nullable=True, index=True)
+    # Calculé par PostgreSQL ; la configuration doit rester celle de CHAT_SEARCH_TS_CONFIG
+    search_vector = Column(TSVECTOR, Computed("to_tsvector('french', content)", persisted=True))
+
+    def __repr__(self) -> str:
+        return f"<ChatMessageSearch session_key={self.session_key} message_id={self.message_id}>"
+
+
 # If you want composite indexes or additional tuning, add them here:
 # Example: Index('ix_ticket_user_ticketnum', Ticket.user_id, Ticket.ticket_number)
 
@@ -3,8 +3,10 @@
 Script de démarrage pour l'API Notofine
 """
 import uvicorn
-from main import app
 #Gombo
+# L'application est chargée par uvicorn ("main:app") et non importée ici : les
+# processus "spawn" des pools (images, mots de passe) réimportent ce script et
+# ne doivent ni créer les tables ni initialiser Firebase.
 if __name__ == "__main__":
     print("🚀 Démarrage de l'API Notofine...")
     print("📖 Documentation disponible sur: http://localhost:8000/docs")
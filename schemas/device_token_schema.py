@@ -1,6 +1,7 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from models.models import DeviceType
 from datetime import datetime
+from schemas.serialization import ListSerializer
 
 # =================================
 # Device Token Schemas
@@ -14,9 +15,12 @@ class DeviceTokenCreate(DeviceTokenBase):
     user_email: str
 
 class DeviceToken(DeviceTokenBase):
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     user_id: int
     created_at: datetime
 
-    class Config:
-        orm_mode = True
\ No newline at end of file
+
+# Sérialiseur précompilé pour les listes de tokens
+DeviceTokenListSerializer = ListSerializer(DeviceToken)
@@ -0,0 +1,27 @@
+from pydantic import BaseModel, ConfigDict
+from typing import Optional, List
+from datetime import datetime
+
+from models.models import NotificationChannel
+from schemas.serialization import ListSerializer
+
+# =================================
+# Notification Schemas
+# =================================
+
+class NotificationResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    ticket_id: Optional[int] = None
+    reminder_id: Optional[int] = None
+    channel: NotificationChannel
+    subject: Optional[str] = None
+    message: str
+    status: str
+    sent_at: Optional[datetime] = None
+    created_at: datetime
+
+
+# Sérialiseur précompilé pour les listes de notifications
+NotificationListSerializer = ListSerializer(NotificationResponse)
@@ -0,0 +1,30 @@
+from pydantic import BaseModel, ConfigDict, Field
+from typing import List
+
+from models.models import NotificationChannel
+from schemas.serialization import ListSerializer
+
+# =================================
+# Reminder Schemas
+# =================================
+
+class ReminderChannelResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    channel: NotificationChannel
+    enabled: bool
+
+
+class ReminderResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    frequency_days: int
+    ticket_id: int
+    active: bool
+    # Lu depuis la relation Reminder.notification_channels
+    channels: List[ReminderChannelResponse] = Field(validation_alias="notification_channels")
+
+
+# Sérialiseur précompilé pour les listes de rappels
+ReminderListSerializer = ListSerializer(ReminderResponse)
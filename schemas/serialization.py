@@ -0,0 +1,67 @@
+import types
+import typing
+from typing import Any, Callable, Iterable, List, Tuple, Type
+
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+# =================================
+# Sérialisation rapide des listes
+# =================================
+# Un ListSerializer est construit une seule fois au chargement des modules de
+# schémas : il compile, à partir des champs du schéma pydantic, la liste des
+# attributs à lire et des conversions à appliquer (Numeric -> float, schémas
+# imbriqués). Les objets ORM sont alors lus en un seul passage, en
+# dictionnaires simples, puis encodés par orjson (datetime -> ISO 8601 avec
+# décalage `+00:00`, Enum -> valeur), sans validation pydantic.
+
+
+def _field_converter(annotation: Any) -> Callable[[Any], Any]:
+    """Conversion d'une valeur lue sur l'objet ORM, d'après le type du champ."""
+    origin = typing.get_origin(annotation)
+    if origin in (typing.Union, types.UnionType):
+        # Optional[X] : None est conservé tel quel
+        (inner,) = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+        convert = _field_converter(inner)
+        return lambda value: None if value is None else convert(value)
+    if origin in (list, List):
+        convert = _field_converter(typing.get_args(annotation)[0])
+        return lambda values: [convert(value) for value in values]
+    if isinstance(annotation, type) and issubclass(annotation, BaseModel):
+        return ListSerializer(annotation).to_dict
+    if annotation is float:
+        # Numeric (Decimal) n'est pas encodé par orjson
+        return float
+    return lambda value: value
+
+
+class ListSerializer:
+    """Lecture en un seul passage d'objets ORM selon un schéma pydantic."""
+
+    def __init__(self, model: Type[BaseModel]):
+        self.model = model
+        # (clé JSON, attribut ORM, conversion) pour chaque champ du schéma
+        self.fields: List[Tuple[str, str, Callable[[Any], Any]]] = [
+            (
+                name,
+                field.validation_alias if isinstance(field.validation_alias, str) else name,
+                _field_converter(field.annotation),
+            )
+            for name, field in model.model_fields.items()
+        ]
+
+    def to_dict(self, obj: Any) -> dict:
+        return {key: convert(getattr(obj, attribute)) for key, attribute, convert in self.fields}
+
+    def to_list(self, items: Iterable[Any]) -> List[dict]:
+        return [self.to_dict(obj) for obj in items]
+
+
+def json_list_response(serializer: ListSerializer, items: Iterable[Any], status_code: int = 200) -> ORJSONResponse:
+    """
+    Construit une réponse JSON à partir d'une liste d'objets ORM.
+
+    Les objets sont lus par attributs en dictionnaires simples (un seul
+    passage), puis encodés en octets JSON par orjson.
+    """
+    return ORJSONResponse(content=serializer.to_list(items), status_code=status_code)
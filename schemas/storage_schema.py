@@ -0,0 +1,22 @@
+from pydantic import BaseModel, Field
+from typing import Dict, Literal
+
+# =================================
+# Storage Schemas (uploads présignés)
+# =================================
+
+class PresignedUploadRequest(BaseModel):
+    user_email: str
+    content_type: Literal["image/jpeg", "image/png", "image/gif", "image/webp", "image/heic"]
+    size: int = Field(gt=0)
+
+class PresignedUploadResponse(BaseModel):
+    # Clé à renvoyer dans le champ `image_key` de POST /tickets/
+    image_key: str
+    # "PUT" (corps brut) ou "POST" (formulaire multipart : `fields` puis `file`)
+    method: Literal["PUT", "POST"]
+    url: str
+    headers: Dict[str, str] = {}
+    fields: Dict[str, str] = {}
+    max_bytes: int
+    expires_at: int
@@ -1,8 +1,9 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict
 from typing import Optional, List
 from datetime import datetime
 
 from models.models import SubscriptionStatus
+from schemas.serialization import ListSerializer
 
 # =================================
 # Plan Schemas
@@ -19,10 +20,9 @@ class PlanCreate(PlanBase):
     pass
 
 class Plan(PlanBase):
-    id: int
+    model_config = ConfigDict(from_attributes=True)
 
-    class Config:
-        orm_mode = True
+    id: int
 
 class PlanUpdate(BaseModel):
     price: Optional[float] = None
@@ -40,6 +40,8 @@ class SubscriptionCreate(BaseModel):
     auto_renew: bool = False
 
 class Subscription(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
     id: int
     user_id: int
     payment_status: SubscriptionStatus
@@ -48,12 +50,14 @@ class Subscription(BaseModel):
     auto_renew: bool
     plan: Plan # Affiche les détails du plan imbriqué
 
-    class Config:
-        orm_mode = True
-
 class SubscriptionStatusResponse(BaseModel):
     is_subscribed: bool
     is_active: bool
     subscription_id: Optional[int] = None
     end_date: Optional[datetime] = None
-    plan_name: Optional[str] = None
\ No newline at end of file
+    plan_name: Optional[str] = None
+
+
+# Sérialiseurs précompilés pour les listes
+PlanListSerializer = ListSerializer(Plan)
+SubscriptionListSerializer = ListSerializer(Subscription)
@@ -0,0 +1,39 @@
+from pydantic import BaseModel, ConfigDict
+from typing import Optional, List
+from datetime import datetime
+
+from models.models import TicketStatus
+from schemas.serialization import ListSerializer
+
+# =================================
+# Ticket Schemas
+# =================================
+
+class TicketResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    ticket_number: str
+    description: Optional[str] = None
+    amount_usd: float
+    payment_url: Optional[str] = None
+    dispute_url: str
+    due_date: Optional[datetime] = None
+    image_url: Optional[str] = None
+    image_display_url: Optional[str] = None
+    image_thumbnail_url: Optional[str] = None
+    status: TicketStatus
+    created_at: datetime
+
+
+# Sérialiseur précompilé pour les listes de contraventions
+TicketListSerializer = ListSerializer(TicketResponse)
+
+
+class TicketSummaryResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    open_ticket_count: int = 0
+    outstanding_amount_usd: float = 0
+    next_due_date: Optional[datetime] = None
+    active_reminder_count: int = 0
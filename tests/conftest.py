@@ -0,0 +1,91 @@
+"""
+Fixtures communes des tests : base SQLite en mémoire (aucun serveur
+PostgreSQL nécessaire) et application FastAPI minimale par router.
+
+Lancer depuis la racine du dépôt :
+    pip install -r requirements-dev.txt
+    python -m pytest
+"""
+import os
+
+# Configuration lue à l'import des modules : à définir avant tout import de l'application
+os.environ.setdefault("AUTH_TOKEN_SECRET", "test-secret")
+os.environ.setdefault("STORAGE_SIGNING_SECRET", "test-secret")
+os.environ.setdefault("FIREBASE_CREDENTIALS_JSON", "")
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from databaseone import get_db
+from models.models import Base, User
+
+
+@compiles(TSVECTOR, "sqlite")
+def _compile_tsvector_sqlite(type_, compiler, **kw):
+    return "TEXT"
+
+
+def _register_sqlite_functions(dbapi_connection, connection_record):
+    """Équivalents SQLite de la collation "C" et de to_tsvector utilisés par le schéma."""
+    dbapi_connection.create_collation("C", lambda a, b: (a > b) - (a < b))
+    dbapi_connection.create_function("to_tsvector", 2, lambda config, value: (value or "").lower(), deterministic=True)
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    event.listen(engine, "connect", _register_sqlite_functions)
+    # `notifications` est partitionnée sous PostgreSQL : non utilisée par ces tests
+    Base.metadata.create_all(engine, tables=[
+        table for name, table in Base.metadata.tables.items() if name != "notifications"
+    ])
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def session_factory(engine):
+    return sessionmaker(bind=engine)
+
+
+@pytest.fixture
+def db(session_factory):
+    session = session_factory()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def user(db):
+    user = User(full_name="Alice", email="alice@example.com", password_hash="x")
+    db.add(user)
+    db.commit()
+    return user
+
+
+@pytest.fixture
+def make_client(session_factory):
+    """Client de test pour une application limitée aux routers donnés."""
+    def factory(*routers) -> TestClient:
+        app = FastAPI(default_response_class=ORJSONResponse)
+        for router in routers:
+            app.include_router(router)
+
+        def override_get_db():
+            session = session_factory()
+            try:
+                yield session
+            finally:
+                session.close()
+
+        app.dependency_overrides[get_db] = override_get_db
+        return TestClient(app)
+    return factory
@@ -0,0 +1,136 @@
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from controller import auth_tokens
+from controller.auth_controller import router as auth_router
+from controller.auth_tokens import TokenError, create_token_pair, verify_token
+from models.models import RevokedToken
+
+
+@pytest.fixture(autouse=True)
+def reset_revocation_state(monkeypatch):
+    """Liste de révocation et cache propres à chaque test."""
+    monkeypatch.setattr(auth_tokens, "_revoked", {})
+    monkeypatch.setattr(auth_tokens, "_last_revoked_at", None)
+    auth_tokens._claims_cache.clear()
+
+
+@pytest.fixture
+def client(make_client):
+    return make_client(auth_router)
+
+
+def _bearer(token: str) -> dict:
+    return {"Authorization": f"Bearer {token}"}
+
+
+def test_access_token_roundtrip(user):
+    tokens = create_token_pair(user.id, user.email)
+    claims = verify_token(tokens["access_token"], "access")
+    assert claims.user_id == user.id
+    assert claims.email == user.email
+    assert claims.token_type == "access"
+
+
+def test_token_type_is_enforced(user):
+    tokens = create_token_pair(user.id, user.email)
+    with pytest.raises(TokenError):
+        verify_token(tokens["refresh_token"], "access")
+    with pytest.raises(TokenError):
+        verify_token(tokens["access_token"], "refresh")
+
+
+def test_tampered_signature_is_rejected(user):
+    token = create_token_pair(user.id, user.email)["access_token"]
+    header, payload, signature = token.split(".")
+    forged = f"{header}.{payload}.{'A' if signature[0] != 'A' else 'B'}{signature[1:]}"
+    with pytest.raises(TokenError):
+        verify_token(forged)
+
+
+def test_expired_token_is_rejected(user, monkeypatch):
+    token = create_token_pair(user.id, user.email)["access_token"]
+    expires_at = verify_token(token).expires_at
+    monkeypatch.setattr(auth_tokens.time, "time", lambda: expires_at + 1)
+    with pytest.raises(TokenError):
+        verify_token(token)
+
+
+def test_refresh_token_is_single_use(client, user):
+    refresh_token = create_token_pair(user.id, user.email)["refresh_token"]
+
+    first = client.post("/auth/refresh", json={"refresh_token": refresh_token})
+    assert first.status_code == 200
+    assert first.json()["refresh_token"] != refresh_token
+
+    reused = client.post("/auth/refresh", json={"refresh_token": refresh_token})
+    assert reused.status_code == 401
+
+
+def test_refresh_token_issued_before_password_change_is_rejected(client, user, db):
+    refresh_token = create_token_pair(user.id, user.email)["refresh_token"]
+    issued_at = verify_token(refresh_token, "refresh").issued_at
+    user.tokens_valid_after = datetime.fromtimestamp(issued_at + 1, tz=timezone.utc)
+    db.commit()
+
+    response = client.post("/auth/refresh", json={"refresh_token": refresh_token})
+    assert response.status_code == 401
+
+
+def test_logout_revokes_access_and_refresh_tokens(client, user):
+    tokens = create_token_pair(user.id, user.email)
+    assert client.get("/auth/me", headers=_bearer(tokens["access_token"])).status_code == 200
+
+    response = client.post(
+        "/auth/logout", json={"refresh_token": tokens["refresh_token"]}, headers=_bearer(tokens["access_token"])
+    )
+    assert response.status_code == 200
+
+    assert client.get("/auth/me", headers=_bearer(tokens["access_token"])).status_code == 401
+    assert client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]}).status_code == 401
+
+
+def test_claimed_refresh_tokens_stay_out_of_memory(client, user, db):
+    refresh_token = create_token_pair(user.id, user.email)["refresh_token"]
+    assert client.post("/auth/refresh", json={"refresh_token": refresh_token}).status_code == 200
+
+    jti = verify_token(refresh_token, "refresh").jti
+    assert db.get(RevokedToken, jti).token_type == "refresh"
+    auth_tokens.sync_revocation_list(db)
+    assert not auth_tokens.is_revoked(jti)
+
+
+def test_sync_loads_revocations_from_other_workers(user, db):
+    claims = verify_token(create_token_pair(user.id, user.email)["access_token"])
+    # Révocation enregistrée par un autre worker : seulement en base
+    db.add(RevokedToken(
+        jti=claims.jti,
+        token_type="access",
+        expires_at=datetime.fromtimestamp(claims.expires_at, tz=timezone.utc),
+    ))
+    db.commit()
+
+    result = auth_tokens.sync_revocation_list(db)
+    assert result["loaded"] == 1
+    assert auth_tokens.is_revoked(claims.jti)
+
+
+def test_sync_is_incremental_and_prunes_expired_entries(user, db, monkeypatch):
+    now = datetime.now(timezone.utc)
+    for jti, revoked_at in (("older", now - timedelta(hours=2)), ("latest", now - timedelta(hours=1))):
+        db.add(RevokedToken(
+            jti=jti, token_type="access", expires_at=now + timedelta(minutes=10), revoked_at=revoked_at,
+        ))
+    db.commit()
+    assert auth_tokens.sync_revocation_list(db)["loaded"] == 2
+
+    # Seules les révocations proches de la dernière déjà chargée sont relues
+    monkeypatch.setattr(auth_tokens, "_revoked", {"expired-jti": int(time.time()) - 1})
+    result = auth_tokens.sync_revocation_list(db)
+    assert result["loaded"] == 1
+    assert auth_tokens.is_revoked("latest")
+    assert not auth_tokens.is_revoked("older")
+    # Les entrées expirées sont retirées de la mémoire
+    assert not auth_tokens.is_revoked("expired-jti")
@@ -0,0 +1,87 @@
+from datetime import datetime
+
+import pytest
+
+from controller import session_chat
+from controller.session_chat import generate_message_id, router as chat_router
+from models.models import ChatArchivedMessage, ChatSessionArchive
+
+
+def test_message_ids_are_unique_and_ordered():
+    ids = [generate_message_id() for _ in range(2000)]
+    assert len(set(ids)) == len(ids)
+    assert ids == sorted(ids)
+
+
+def test_message_ids_stay_ordered_within_the_same_millisecond(monkeypatch):
+    class _FrozenDatetime:
+        @staticmethod
+        def now():
+            return datetime(2025, 1, 1, 12, 0, 0)
+
+    monkeypatch.setattr(session_chat, "datetime", _FrozenDatetime)
+    monkeypatch.setattr(session_chat, "_last_message_ms", 0)
+
+    ids = [generate_message_id() for _ in range(500)]
+    # Le suffixe peut contenir "_" : seul le préfixe msg_<millisecondes> est comparé
+    assert len({message_id.split("_")[1] for message_id in ids}) == 1
+    assert len(set(ids)) == len(ids)
+    assert ids == sorted(ids)
+
+
+@pytest.fixture
+def archive(db):
+    archive = ChatSessionArchive(
+        session_key="alice_at_example_com", user_email="alice@example.com", message_count=5,
+    )
+    db.add(archive)
+    db.flush()
+    for index in range(5):
+        db.add(ChatArchivedMessage(
+            archive_id=archive.id, message_id=f"msg_{1000 + index}_a", sender="user", content=f"m{index}",
+        ))
+    db.commit()
+    return archive
+
+
+@pytest.fixture
+def client(make_client):
+    return make_client(chat_router)
+
+
+def _page(client, archive, **params):
+    response = client.get(f"/chat/archives/alice@example.com/{archive.id}", params=params)
+    assert response.status_code == 200
+    return response.json()
+
+
+def test_archive_pages_walk_back_without_gaps_or_duplicates(client, archive):
+    first = _page(client, archive, limit=2)
+    assert [m["content"] for m in first["messages"]] == ["m3", "m4"]
+    assert first["has_more"] is True
+
+    second = _page(client, archive, limit=2, before=first["next_cursor"])
+    assert [m["content"] for m in second["messages"]] == ["m1", "m2"]
+    assert second["has_more"] is True
+
+    last = _page(client, archive, limit=2, before=second["next_cursor"])
+    assert [m["content"] for m in last["messages"]] == ["m0"]
+    assert last["has_more"] is False
+    assert last["next_cursor"] is None
+
+
+def test_archive_page_exactly_filling_the_limit_has_no_next_page(client, archive):
+    page = _page(client, archive, limit=5)
+    assert len(page["messages"]) == 5
+    assert page["has_more"] is False
+    assert page["next_cursor"] is None
+
+
+def test_archive_cursor_is_exclusive(client, archive):
+    page = _page(client, archive, limit=10, before="msg_1002_a")
+    assert [m["content"] for m in page["messages"]] == ["m0", "m1"]
+
+
+def test_archive_of_another_user_is_not_found(client, archive):
+    response = client.get(f"/chat/archives/bob@example.com/{archive.id}")
+    assert response.status_code == 404
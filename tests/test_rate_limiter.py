@@ -0,0 +1,122 @@
+import asyncio
+
+import pytest
+from fastapi import APIRouter, Depends
+
+from controller import rate_limiter
+from controller.rate_limiter import MemoryRateLimitBackend, RateLimit, parse_limit
+
+
+class _Clock:
+    """Horloge monotone contrôlée par le test."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = _Clock()
+    monkeypatch.setattr(rate_limiter.time, "monotonic", clock)
+    return clock
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    backend = MemoryRateLimitBackend()
+    monkeypatch.setattr(rate_limiter, "_backend", backend)
+    monkeypatch.setattr(rate_limiter, "RATE_LIMIT_ENABLED", True)
+    return backend
+
+
+def _hit(backend, key="k", limit=2, window=60) -> float:
+    return asyncio.run(backend.hit(key, limit, window))
+
+
+def test_parse_limit():
+    assert parse_limit("5/60") == (5, 60)
+
+
+def test_limit_is_enforced_within_the_window(backend, clock):
+    assert _hit(backend) == 0
+    clock.now += 10
+    assert _hit(backend) == 0
+    clock.now += 10
+    # Place libérée à l'expiration de la première requête (t=0 + 60 s)
+    assert _hit(backend) == pytest.approx(40)
+
+
+def test_window_slides(backend, clock):
+    _hit(backend)
+    clock.now += 30
+    _hit(backend)
+    clock.now += 30
+    # La première requête sort de la fenêtre exactement à 60 s
+    assert _hit(backend) == 0
+    assert _hit(backend) == pytest.approx(30)
+
+
+def test_refused_requests_are_not_counted(backend, clock):
+    _hit(backend, limit=1)
+    for _ in range(5):
+        clock.now += 10
+        assert _hit(backend, limit=1) > 0
+    clock.now = 1000.0 + 60
+    assert _hit(backend, limit=1) == 0
+
+
+def test_keys_are_independent(backend, clock):
+    assert _hit(backend, key="a", limit=1) == 0
+    assert _hit(backend, key="b", limit=1) == 0
+    assert _hit(backend, key="a", limit=1) > 0
+
+
+def test_least_recently_used_keys_are_evicted(backend, clock, monkeypatch):
+    monkeypatch.setattr(rate_limiter, "RATE_LIMIT_MAX_KEYS", 2)
+    _hit(backend, key="a", limit=1)
+    _hit(backend, key="b", limit=1)
+    _hit(backend, key="a", limit=1)  # "a" redevient la plus récente
+    _hit(backend, key="c", limit=1)  # "b" est oubliée
+    assert _hit(backend, key="b", limit=1) == 0
+    assert _hit(backend, key="a", limit=1) == 0  # "a" oubliée à l'arrivée de "b"
+
+
+@pytest.fixture
+def client(make_client, backend, clock):
+    router = APIRouter()
+
+    @router.post("/login", dependencies=[Depends(RateLimit("test_login", per_ip="4/60", per_email="2/60"))])
+    def login():
+        return {"ok": True}
+
+    return make_client(router)
+
+
+def test_dependency_limits_by_email_with_retry_after(client, clock):
+    for _ in range(2):
+        assert client.post("/login", json={"email": "Alice@Example.com"}).status_code == 200
+    clock.now += 15
+
+    response = client.post("/login", json={"email": " alice@example.com "})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "45"
+    # Un autre email n'est limité que par l'IP (la requête refusée a compté pour l'IP)
+    assert client.post("/login", json={"email": "bob@example.com"}).status_code == 200
+
+
+def test_dependency_limits_by_ip(client):
+    for index in range(4):
+        assert client.post("/login", json={"email": f"user{index}@example.com"}).status_code == 200
+    assert client.post("/login", json={"email": "other@example.com"}).status_code == 429
+
+
+def test_backend_errors_let_requests_through(client, monkeypatch):
+    async def failing_hit(key, limit, window_seconds):
+        raise ConnectionError("redis down")
+
+    monkeypatch.setattr(rate_limiter._backend, "hit", failing_hit)
+    for _ in range(5):
+        assert client.post("/login", json={"email": "alice@example.com"}).status_code == 200
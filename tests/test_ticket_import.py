@@ -0,0 +1,146 @@
+import json
+import os
+
+import pytest
+from sqlalchemy import text
+
+from controller import storage as storage_module
+from controller import ticket_controller
+from controller.storage import LocalStorage
+from models.models import Ticket
+
+JPEG_HEADER = b"\xff\xd8\xff\xe0" + b"\x00" * 16
+HEADER = "ticket_number,amount_usd,dispute_url,image_url\n"
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    storage = LocalStorage(root=str(tmp_path))
+    monkeypatch.setattr(storage_module, "_storage", storage)
+    return storage
+
+
+@pytest.fixture
+def enqueued_variants(monkeypatch):
+    """Tâches de génération des variantes lancées par l'import (non exécutées)."""
+    calls = []
+
+    async def record(ticket_id, image_key):
+        calls.append((ticket_id, image_key))
+
+    monkeypatch.setattr(ticket_controller, "generate_ticket_image_variants", record)
+    return calls
+
+
+@pytest.fixture
+def client(make_client, storage, enqueued_variants):
+    return make_client(ticket_controller.router)
+
+
+def _import(client, content: str, filename: str = "tickets.csv", **form):
+    response = client.post(
+        "/tickets/import",
+        data={"email": "alice@example.com", **form},
+        files={"file": (filename, content.encode(), "text/plain")},
+    )
+    return response
+
+
+def _put_incoming(storage: LocalStorage, key: str, content: bytes) -> str:
+    path = storage.path_for(key)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(content)
+    return storage.public_url(key)
+
+
+def test_invalid_rows_are_reported_with_their_line_number(client, user, db):
+    content = HEADER + "T1,10.50,https://d/1,\n" + ",10,https://d/2,\n" + "T3,-1,https://d/3,\n" + "T4,5,https://d/4,\n"
+    body = _import(client, content).json()
+
+    assert body["imported"] == 2
+    assert body["failed"] == 2
+    assert [error["row"] for error in body["errors"]] == [3, 4]
+    assert sorted(number for (number,) in db.query(Ticket.ticket_number)) == ["T1", "T4"]
+
+
+def test_ndjson_reports_malformed_lines(client, user, db):
+    content = "\n".join([
+        json.dumps({"ticket_number": "N1", "amount_usd": 3, "dispute_url": "https://d"}),
+        "{not json",
+        json.dumps(["not", "an", "object"]),
+        "",
+        json.dumps({"ticket_number": "N2", "amount_usd": "4.25", "dispute_url": "https://d"}),
+    ])
+    body = _import(client, content, filename="tickets.ndjson").json()
+
+    assert body["format"] == "ndjson"
+    assert body["imported"] == 2
+    assert [error["row"] for error in body["errors"]] == [2, 3]
+
+
+def test_dry_run_validates_without_inserting(client, user, db):
+    body = _import(client, HEADER + "T1,1,https://d,\n", dry_run="true").json()
+    assert body["dry_run"] is True
+    assert body["imported"] == 1
+    assert db.query(Ticket).count() == 0
+
+
+def test_too_many_rows_rejects_the_whole_file(client, user, db, monkeypatch):
+    monkeypatch.setattr(ticket_controller, "IMPORT_MAX_ROWS", 2)
+    response = _import(client, HEADER + "".join(f"T{i},1,https://d,\n" for i in range(3)))
+    assert response.status_code == 413
+    assert db.query(Ticket).count() == 0
+
+
+def test_nul_characters_are_rejected_before_loading(client, user, db):
+    body = _import(client, HEADER + "T1,1,https://d/\x00x,\n").json()
+    assert body["imported"] == 0
+    assert body["errors"][0]["row"] == 2
+
+
+def test_rows_refused_by_the_database_become_row_errors(client, user, db, engine, monkeypatch):
+    monkeypatch.setattr(ticket_controller, "IMPORT_BATCH_SIZE", 2)
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TRIGGER reject_boom BEFORE INSERT ON tickets WHEN NEW.ticket_number = 'BOOM' "
+            "BEGIN SELECT RAISE(ABORT, 'ticket refusé'); END"
+        ))
+    content = HEADER + "T1,1,https://d,\n" + "T2,1,https://d,\n" + "BOOM,1,https://d,\n" + "T4,1,https://d,\n" + "T5,1,https://d,\n"
+    response = _import(client, content)
+
+    assert response.status_code == 200
+    body = response.json()
+    assert body["imported"] == 4
+    assert body["failed"] == 1
+    assert body["errors"][0]["row"] == 4
+    assert "ticket refusé" in body["errors"][0]["error"]
+    assert sorted(number for (number,) in db.query(Ticket.ticket_number)) == ["T1", "T2", "T4", "T5"]
+
+
+def test_presigned_images_are_checked_like_create_ticket(client, user, db, storage, monkeypatch):
+    monkeypatch.setattr(ticket_controller, "TICKET_IMAGE_MAX_BYTES", 64)
+    valid = _put_incoming(storage, f"incoming/{user.id}/valid.jpg", JPEG_HEADER)
+    not_an_image = _put_incoming(storage, f"incoming/{user.id}/fake.jpg", b"#!/bin/sh\necho not an image\n")
+    too_large = _put_incoming(storage, f"incoming/{user.id}/large.jpg", JPEG_HEADER + b"\x00" * 100)
+    other_user = _put_incoming(storage, f"incoming/{user.id + 1}/other.jpg", JPEG_HEADER)
+
+    content = HEADER + "".join(
+        f"T{index},1,https://d,{url}\n" for index, url in enumerate([valid, not_an_image, too_large, other_user])
+    )
+    body = _import(client, content).json()
+
+    assert body["imported"] == 1
+    assert [error["row"] for error in body["errors"]] == [3, 4, 5]
+    assert "Format d'image" in body["errors"][0]["error"]
+    assert "taille" in body["errors"][1]["error"]
+    assert "n'appartient pas" in body["errors"][2]["error"]
+
+
+def test_imported_images_get_their_variants_generated(client, user, db, storage, enqueued_variants):
+    image_url = _put_incoming(storage, f"incoming/{user.id}/photo.jpg", JPEG_HEADER)
+    body = _import(client, HEADER + f"T1,1,https://d,{image_url}\nT2,1,https://d,https://example.com/x.jpg\n").json()
+
+    assert body["imported"] == 2
+    ticket_id = db.query(Ticket.id).filter(Ticket.ticket_number == "T1").scalar()
+    assert enqueued_variants == [(ticket_id, f"incoming/{user.id}/photo.jpg")]